@@ -154,13 +154,13 @@ def mocked_vidhub_telnet_device(monkeypatch, vidhub_telnet_responses):
             'smartscope':SMARTSCOPE_PORT,
         }
         def __init__(self, host=None, port=None, timeout=None, loop=None):
+            from vidhubcontrol.aiotelnetlib import TelnetStreamParser
             self.host = host
             self.port = port
             self.loop = loop
             self.rx_bfr = b''
-            self.tx_bfr = b''
-            self.read_ready_event = asyncio.Event()
-            self.tx_lock = asyncio.Lock()
+            self.stream_parser = TelnetStreamParser()
+            self.block_queue = asyncio.Queue()
         @property
         def port(self):
             return getattr(self, '_port', None)
@@ -188,15 +188,14 @@ def mocked_vidhub_telnet_device(monkeypatch, vidhub_telnet_responses):
                 raise OSError(errno.EHOSTUNREACH, (self.host, self.port))
             if not loop and not self.loop:
                 loop = self.loop = asyncio.get_event_loop()
-            async with self.tx_lock:
-                self.tx_bfr = PREAMBLES[self.preamble]
-                self.read_ready_event.set()
+            self.send_to_backend(PREAMBLES[self.preamble])
+        def send_to_backend(self, data):
+            for block in self.stream_parser.feed(data):
+                self.block_queue.put_nowait(block)
         def close(self):
-            self.read_ready_event.set()
+            self.block_queue.put_nowait(b'')
         async def close_async(self):
             self.close()
-        async def wait_for_data(self):
-            await self.read_ready_event.wait()
         async def write(self, bfr):
             if self.port in Telnet.disabled_ports:
                 raise OSError(errno.ECONNREFUSED, (self.host, self.port))
@@ -206,22 +205,16 @@ def mocked_vidhub_telnet_device(monkeypatch, vidhub_telnet_responses):
                 self.rx_bfr = b''
                 await self.process_command(bfr)
         async def process_command(self, bfr):
-            async with self.tx_lock:
-                if self.preamble == 'vidhub':
-                    tx_bfr = b''.join([vidhub_telnet_responses['ack'], bfr])
-                else:
-                    tx_bfr = vidhub_telnet_responses['ack']
-                self.tx_bfr = b''.join([self.tx_bfr, tx_bfr])
-                if len(self.tx_bfr):
-                    self.read_ready_event.set()
-        async def read_very_eager(self):
+            if self.preamble == 'vidhub':
+                tx_bfr = b''.join([vidhub_telnet_responses['ack'], bfr])
+            else:
+                tx_bfr = vidhub_telnet_responses['ack']
+            self.send_to_backend(tx_bfr)
+        async def read_block(self):
+            bfr = await self.block_queue.get()
             if self.port in Telnet.disabled_ports:
                 raise OSError(errno.ECONNREFUSED, (self.host, self.port))
-            async with self.tx_lock:
-                bfr = self.tx_bfr
-                self.tx_bfr = b''
-                self.read_ready_event.clear()
-                return bfr
+            return bfr
 
     monkeypatch.setattr('vidhubcontrol.aiotelnetlib._Telnet', Telnet)
     monkeypatch.setattr('vidhubcontrol.backends.telnet.aiotelnetlib._Telnet', Telnet)
@@ -297,3 +290,12 @@ def unused_udp_port_factory():
 @pytest.fixture
 def unused_udp_port(unused_udp_port_factory):
     return unused_udp_port_factory()
+
+def _unused_tcp_port():
+    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def unused_tcp_port():
+    return _unused_tcp_port()
@@ -41,6 +41,7 @@ async def test_config_basic(tempconfig, missing_netifaces):
         'crosspoints':{0:12},
     }
 
+    await config.flush_save()
     config2 = await Config.load_async(str(tempconfig))
     await config2.start()
 
@@ -209,6 +210,7 @@ async def test_config_devices(tempconfig, missing_netifaces):
     for smartscope in config.smartscopes.values():
         assert isinstance(smartscope.backend, SmartScopeDummyBackend)
 
+    await config.flush_save()
     config2 = await Config.load_async(str(tempconfig))
     await config2.start()
 
@@ -225,3 +227,213 @@ async def test_config_devices(tempconfig, missing_netifaces):
 
     await config.stop()
     await config2.stop()
+
+@pytest.mark.asyncio
+async def test_config_salvos(tempconfig):
+    from vidhubcontrol.backends import DummyBackend
+
+    config = await Config.load_async(str(tempconfig))
+    await config.start()
+
+    vidhubs = []
+    for i in range(3):
+        vidhub = await DummyBackend.create_async(device_id=f'vidhub-{i}')
+        await config.add_vidhub(vidhub)
+        vidhubs.append(vidhub)
+
+    crosspoints = []
+    for i, vidhub in enumerate(vidhubs):
+        for out_idx in range(vidhub.num_outputs):
+            crosspoints.append((vidhub.device_id, out_idx, (out_idx + i + 1) % vidhub.num_inputs))
+    crosspoints.append(('missing', 0, 1))
+    salvo = config.add_salvo('salvo1', crosspoints)
+    assert config.salvos['salvo1'] is salvo
+    assert set(salvo.get_device_crosspoints().keys()) == {
+        'vidhub-0', 'vidhub-1', 'vidhub-2', 'missing',
+    }
+
+    result = await config.recall_salvo('salvo1')
+    assert not result.success
+    assert not result.devices['missing'].success
+    assert result.devices['missing'].elapsed is None
+    for i, vidhub in enumerate(vidhubs):
+        r = result.devices[vidhub.device_id]
+        assert r.success
+        assert 0 <= r.elapsed <= result.elapsed
+        expected = [(out_idx + i + 1) % vidhub.num_inputs for out_idx in range(vidhub.num_outputs)]
+        assert vidhub.crosspoints == expected
+    assert 0 <= result.skew <= result.elapsed
+
+    await config.flush_save()
+    config2 = await Config.load_async(str(tempconfig))
+    await config2.start()
+    salvo2 = config2.salvos['salvo1']
+    assert salvo2.name == 'salvo1'
+    assert salvo2.crosspoints == crosspoints
+
+    config.remove_salvo('salvo1')
+    assert 'salvo1' not in config.salvos
+
+    await config.stop()
+    await config2.stop()
+
+@pytest.mark.asyncio
+async def test_config_save_scheduler(tempconfig):
+    import os
+    import json
+    from vidhubcontrol.backends import DummyBackend
+
+    config = Config(filename=str(tempconfig), save_delay=.2, save_max_delay=.3)
+    vidhub = await DummyBackend.create_async(device_id='dummy1')
+    await config.add_vidhub(vidhub)
+    await config.flush_save()
+    assert config.save_metrics['saves'] == 1
+
+    # Changes within the save_delay should be merged into one save
+    for i in range(10):
+        config.schedule_save()
+    assert config.save_metrics['saves'] == 1
+    await asyncio.sleep(.4)
+    assert config.save_metrics['saves'] == 2
+    assert config.save_metrics['coalesced'] == 9
+
+    # Continuous changes should not delay the save past save_max_delay
+    for i in range(8):
+        config.schedule_save()
+        await asyncio.sleep(.05)
+    assert config.save_metrics['saves'] == 3
+    await config.flush_save()
+    assert config.save_metrics['saves'] == 4
+    assert config.save_metrics['max_latency'] >= config.save_metrics['last_latency'] > 0
+
+    with open(str(tempconfig), 'r') as f:
+        data = json.loads(f.read())
+    assert data['vidhubs']['dummy1']['device_id'] == 'dummy1'
+    assert os.listdir(os.path.dirname(str(tempconfig))) == [os.path.basename(str(tempconfig))]
+
+    # Requests from other threads are armed on the loop and file
+    # permissions are kept
+    os.chmod(str(tempconfig), 0o640)
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, config.schedule_save)
+    await asyncio.sleep(0)
+    assert config._save_handle is not None
+    await config.flush_save()
+    assert config.save_metrics['saves'] == 5
+    assert os.stat(str(tempconfig)).st_mode & 0o777 == 0o640
+
+    # New files use the umask default (not mkstemp's 0600)
+    from vidhubcontrol.utils import atomic_write, _UMASK
+    new_filename = os.path.join(os.path.dirname(str(tempconfig)), 'new.json')
+    atomic_write(new_filename, '{}')
+    assert os.stat(new_filename).st_mode & 0o777 == 0o666 & ~_UMASK
+    os.unlink(new_filename)
+
+    await vidhub.disconnect()
+
+@pytest.mark.asyncio
+async def test_config_background_connect(tempconfig, missing_netifaces, monkeypatch):
+    import json
+    from vidhubcontrol.backends import DummyBackend
+
+    connect_evt = asyncio.Event()
+    num_connecting = 0
+    max_connecting = 0
+    orig_do_connect = DummyBackend.do_connect
+
+    async def do_connect(self):
+        nonlocal num_connecting, max_connecting
+        num_connecting += 1
+        max_connecting = max(max_connecting, num_connecting)
+        await connect_evt.wait()
+        num_connecting -= 1
+        return await orig_do_connect(self)
+    monkeypatch.setattr(DummyBackend, 'do_connect', do_connect)
+
+    device_ids = ['dummy{}'.format(i) for i in range(6)]
+    conf_data = {'vidhubs':{
+        device_id:{'device_id':device_id, 'backend_name':'DummyBackend'}
+        for device_id in device_ids
+    }}
+    with open(str(tempconfig), 'w') as f:
+        f.write(json.dumps(conf_data))
+
+    config = await Config.load_async(
+        str(tempconfig), max_concurrent_connects=2, connect_timeout=10,
+    )
+
+    # start() returns before the devices have connected
+    assert set(config.vidhubs.keys()) == set(device_ids)
+    assert not await config.wait_for_devices(1, timeout=.1)
+    assert max_connecting == num_connecting == 2
+    assert config.vidhubs['dummy0'].backend.connect_timeout == 10
+
+    connect_evt.set()
+    assert await config.wait_for_devices(timeout=2)
+    assert max_connecting == 2
+    for obj in config.vidhubs.values():
+        assert obj.connection_state.is_connected
+        assert obj.backend.num_outputs == 12
+
+    await config.stop()
+
+@pytest.mark.asyncio
+async def test_discovery_cache(tempconfig,
+                               vidhub_zeroconf_info,
+                               smartview_zeroconf_info,
+                               mocked_vidhub_telnet_device):
+    import json
+    import time
+    from vidhubcontrol.discovery import DiscoveryCache, ServiceInfo, convert_bytes_dict
+
+    cache_filename = DiscoveryCache.filename_for(str(tempconfig))
+    assert cache_filename == str(tempconfig).replace('.json', '.discovery.json')
+
+    def build_entry(zc_data, device_type, last_seen):
+        kw = zc_data['info_kwargs']
+        return {
+            'id':zc_data['device_id'], 'device_type':device_type,
+            'type':kw['type_'], 'name':kw['name'], 'address':'127.0.0.1',
+            'port':kw['port'], 'properties':convert_bytes_dict(kw['properties']),
+            'last_seen':last_seen,
+        }
+
+    start_ts = time.time()
+    with open(cache_filename, 'w') as f:
+        f.write(json.dumps({'devices':[
+            build_entry(vidhub_zeroconf_info, 'vidhub', start_ts - 60),
+            # Expired entries are ignored
+            build_entry(smartview_zeroconf_info, 'smartview', start_ts - 90000),
+        ]}))
+
+    # Cached devices are connected without waiting for announcements
+    config = await Config.load_async(str(tempconfig))
+    device_id = vidhub_zeroconf_info['device_id']
+    assert list(config.discovery_cache.entries.keys()) == [device_id]
+    for i in range(50):
+        if device_id in config.vidhubs:
+            break
+        await asyncio.sleep(.02)
+    obj = config.vidhubs[device_id]
+    async with obj.connection_manager as mgr:
+        await mgr.wait_for('connected', 2)
+    assert time.time() - start_ts < 2
+    assert not len(config.smartviews)
+
+    # Live announcements update the cache
+    listener = config.discovery_listener
+    kw = vidhub_zeroconf_info['info_kwargs']
+    info = ServiceInfo(
+        type_=kw['type_'], name=kw['name'], port=kw['port'], addresses=['127.0.0.1'],
+        properties=convert_bytes_dict(kw['properties']),
+    )
+    await listener.add_service_info(info)
+    await asyncio.sleep(listener.settle_window + .1)
+    assert config.discovery_cache.entries[device_id]['last_seen'] > start_ts
+
+    await config.stop()
+
+    with open(cache_filename, 'r') as f:
+        data = json.loads(f.read())
+    assert [entry['id'] for entry in data['devices']] == [device_id]
+    assert data['devices'][0]['last_seen'] > start_ts
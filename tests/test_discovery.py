@@ -0,0 +1,204 @@
+import asyncio
+import time
+import pytest
+
+@pytest.mark.asyncio
+async def test_concurrent_resolve():
+    import zeroconf
+    from vidhubcontrol.discovery import Listener
+
+    loop = asyncio.get_event_loop()
+    type_ = '_blackmagic._tcp.local.'
+
+    class FakeAsyncZeroconf(object):
+        def __init__(self):
+            self.requests = []
+            self.in_flight = 0
+            self.max_in_flight = 0
+        async def async_get_service_info(self, type_, name, timeout):
+            self.requests.append(name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.in_flight, self.max_in_flight)
+            try:
+                await asyncio.sleep(.1)
+            finally:
+                self.in_flight -= 1
+            return zeroconf.ServiceInfo(
+                type_, name, port=9990, server='host.local.',
+                addresses=[b'\x7f\x00\x00\x01'], properties={'unique id':name},
+            )
+
+    listener = Listener(loop, type_, max_concurrent_resolve=8)
+    fake_zc = listener.async_zeroconf = FakeAsyncZeroconf()
+    listener.running = True
+    listener.run_future = asyncio.ensure_future(listener.run())
+
+    names = ['device{}.{}'.format(i, type_) for i in range(24)]
+
+    # Browser callbacks are made from another thread
+    def browse():
+        for name in names:
+            listener.add_service(None, type_, name)
+    start_ts = time.monotonic()
+    await loop.run_in_executor(None, browse)
+    while len(listener.services) < len(names):
+        assert time.monotonic() - start_ts < 2
+        await asyncio.sleep(.01)
+
+    # 24 services at 8 per round trip
+    assert time.monotonic() - start_ts < 1
+    assert fake_zc.max_in_flight == 8
+    assert set(listener.services.keys()) == {(type_, name) for name in names}
+    assert set(listener.resolve_cache.keys()) == set(listener.services.keys())
+
+    # Cached records are used without another request
+    fake_zc.requests.clear()
+    info = await listener.resolve_service(type_, names[0], use_cache=True)
+    assert info.port == 9990
+    assert fake_zc.requests == []
+
+    # Removal cancels a resolution in progress
+    late_name = 'late.{}'.format(type_)
+    listener.schedule_resolve(type_, late_name)
+    await asyncio.sleep(0)
+    listener.remove_service(None, type_, names[0])
+    listener.remove_service(None, type_, late_name)
+    await asyncio.sleep(.3)
+    await listener.message_queue.join()
+    assert fake_zc.requests == [late_name]
+    assert (type_, late_name) not in listener.services
+    assert (type_, names[0]) not in listener.services
+    assert (type_, names[0]) not in listener.resolve_cache
+
+    await listener.stop()
+
+@pytest.mark.asyncio
+async def test_bmd_event_coalescing():
+    import ipaddress
+    from vidhubcontrol.discovery import BMDDiscovery, ServiceInfo
+
+    loop = asyncio.get_event_loop()
+    type_ = '_blackmagic._tcp.local.'
+    listener = BMDDiscovery(loop, settle_window=.1)
+
+    events = []
+    def on_bmd_service_added(info, **kwargs):
+        events.append(('added', str(info.address), kwargs['id']))
+    def on_bmd_service_updated(info, **kwargs):
+        events.append(('updated', str(info.address), kwargs['id']))
+    listener.bind(
+        bmd_service_added=on_bmd_service_added,
+        bmd_service_updated=on_bmd_service_updated,
+    )
+
+    def build_info(addr):
+        return ServiceInfo(
+            type_=type_, name='Videohub-a0b2c3.{}'.format(type_), port=9990,
+            addresses=[ipaddress.ip_address(addr)],
+            properties={'class':'Videohub', 'unique id':'a0b2c3', 'name':'Videohub'},
+        )
+
+    async def settle():
+        await asyncio.sleep(.25)
+
+    # A burst of changes is merged into a single "added" event
+    await listener.add_service_info(build_info('127.0.0.1'))
+    await listener.update_service_info(build_info('127.0.0.2'))
+    await listener.update_service_info(build_info('127.0.0.3'))
+    await settle()
+    assert events == [('added', '127.0.0.3', 'A0B2C3')]
+
+    # Repeated announcements of an unchanged service are dropped
+    events.clear()
+    for i in range(5):
+        await listener.update_service_info(build_info('127.0.0.3'))
+    await settle()
+    assert events == []
+    assert listener.discovery_counters['duplicates'] == 5
+
+    events.clear()
+    for addr in ['127.0.0.4', '127.0.0.5', '127.0.0.4']:
+        await listener.update_service_info(build_info(addr))
+    await settle()
+    assert events == [('updated', '127.0.0.4', 'A0B2C3')]
+    assert str(listener.vidhubs['A0B2C3'].address) == '127.0.0.4'
+
+@pytest.mark.asyncio
+async def test_subnet_sweep(unused_tcp_port_factory):
+    from conftest import (
+        VIDHUB_PREAMBLE, SMARTSCOPE_PREAMBLE, VIDHUB_DEVICE_ID, SMARTSCOPE_DEVICE_ID,
+    )
+    from vidhubcontrol.discovery import BMDDiscovery, SubnetSweeper
+
+    loop = asyncio.get_event_loop()
+    ports = [unused_tcp_port_factory() for i in range(5)]
+
+    def build_handler(data):
+        async def handle(reader, writer):
+            writer.write(data)
+            try:
+                await writer.drain()
+                await reader.read()
+            except ConnectionError:
+                pass
+            writer.close()
+        return handle
+
+    # A Videohub, a SmartScope, two unrelated services (one sending binary
+    # data with no line endings) and a closed port
+    servers = []
+    preambles = [
+        VIDHUB_PREAMBLE, SMARTSCOPE_PREAMBLE, b'SSH-2.0-OpenSSH\r\n', b'\xff' * 100000,
+    ]
+    for port, data in zip(ports[:2] + ports[3:], preambles):
+        servers.append(await asyncio.start_server(build_handler(data), '127.0.0.1', port))
+
+    listener = BMDDiscovery(loop, settle_window=.05)
+    added = []
+    def on_bmd_service_added(info, **kwargs):
+        added.append((kwargs['device_type'], kwargs['id'], info.port))
+    listener.bind(bmd_service_added=on_bmd_service_added)
+
+    sweeper = SubnetSweeper(
+        loop, listener, ['127.0.0.0/30'], ports=ports,
+        max_concurrent=4, rate=200, read_timeout=.5,
+    )
+    results = await sweeper.sweep()
+    await asyncio.sleep(.1)
+
+    assert len(results) == 2
+    assert sweeper.counters['probes'] == 10
+    assert sweeper.counters['open'] == 4
+    assert sweeper.counters['found'] == 2
+    assert sorted(added) == sorted([
+        ('vidhub', VIDHUB_DEVICE_ID.upper(), ports[0]),
+        ('smartscope', SMARTSCOPE_DEVICE_ID.upper(), ports[1]),
+    ])
+    assert str(listener.vidhubs[VIDHUB_DEVICE_ID.upper()].address) == '127.0.0.1'
+    assert await sweeper.probe('127.0.0.1', ports[4]) is None
+
+    # Repeated sweeps don't produce new events
+    added.clear()
+    await sweeper.sweep()
+    await asyncio.sleep(.1)
+    assert added == []
+    assert listener.discovery_counters['duplicates'] == 2
+
+    # Periodic sweeps continue after an unexpected error
+    sweeps = []
+    async def failing_sweep():
+        sweeps.append(True)
+        if len(sweeps) == 1:
+            raise RuntimeError('sweep failed')
+        return []
+    sweeper.sweep = failing_sweep
+    sweeper.interval = .05
+    await sweeper.start()
+    await asyncio.sleep(.2)
+    assert len(sweeps) > 1
+    assert not sweeper._run_task.done()
+    await sweeper.stop()
+
+    for server in servers:
+        server.close()
+        await server.wait_closed()
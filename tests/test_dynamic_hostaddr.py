@@ -100,8 +100,13 @@ async def test_hostaddr_change(tempconfig,
     smartview = config2.smartviews[smartview_id]
     smartscope = config2.smartscopes[smartscope_id]
 
+    # Devices connect in the background after start
+    async def wait_for_failure(obj):
+        async with obj.connection_manager as mgr:
+            await mgr.wait_for('failure', 7)
+
     state = ConnectionState.failure | ConnectionState.not_connected
-    coros = [obj.connection_manager.wait_for('not_connected|failure', 7) for obj in [vidhub, smartview, smartscope]]
+    coros = [wait_for_failure(obj) for obj in [vidhub, smartview, smartscope]]
     await asyncio.gather(*coros)
     assert vidhub.connection_state == smartview.connection_state == smartscope.connection_state == state
 
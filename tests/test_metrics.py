@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+
+@pytest.fixture
+def metrics_enabled():
+    from vidhubcontrol import metrics
+    metrics.REGISTRY.reset()
+    metrics.REGISTRY.enabled = True
+    yield metrics.REGISTRY
+    metrics.REGISTRY.enabled = False
+    metrics.REGISTRY.reset()
+
+def test_registry_exposition():
+    from vidhubcontrol.metrics import Registry
+
+    registry = Registry()
+    counter = registry.counter('test_total', 'A counter', ['device'])
+    hist = registry.histogram('test_seconds', 'A histogram', buckets=[.1, 1])
+    gauge = registry.gauge('test_depth', 'A gauge', ['queue'])
+
+    # Nothing is collected while disabled
+    counter.inc(device='a')
+    hist.observe(.5)
+    gauge.set(3, queue='tx')
+    assert counter.get(device='a') == 0
+    assert hist.get() == (0, 0)
+    assert gauge.get(queue='tx') == 0
+
+    registry.enabled = True
+    counter.inc(device='a')
+    counter.inc(2, device='a')
+    counter.inc(device='b"c')
+    for value in [.05, .5, 5]:
+        hist.observe(value)
+    gauge.set_function(lambda: 7, queue='tx')
+    assert registry.counter('test_total', 'A counter', ['device']) is counter
+    with pytest.raises(ValueError):
+        registry.gauge('test_total', 'A gauge')
+
+    lines = registry.exposition().splitlines()
+    assert '# TYPE test_total counter' in lines
+    assert 'test_total{device="a"} 3' in lines
+    assert 'test_total{device="b\\"c"} 1' in lines
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'test_seconds_sum 5.55' in lines
+    assert 'test_seconds_count 3' in lines
+    assert 'test_depth{queue="tx"} 7' in lines
+
+    registry.reset()
+    assert counter.get(device='a') == 0
+    assert 'test_seconds_count 3' not in registry.exposition().splitlines()
+
+@pytest.mark.asyncio
+async def test_metrics_server(unused_tcp_port):
+    from vidhubcontrol.metrics import Registry, MetricsServer
+
+    registry = Registry(enabled=True)
+    registry.counter('test_total', 'A counter').inc(4)
+    server = MetricsServer('127.0.0.1', unused_tcp_port, registry)
+    await server.start()
+
+    async def request(line):
+        reader, writer = await asyncio.open_connection('127.0.0.1', unused_tcp_port)
+        writer.write(line + b'\r\nHost: localhost\r\n\r\n')
+        resp = await reader.read()
+        writer.close()
+        headers, _, body = resp.partition(b'\r\n\r\n')
+        return headers.split(b'\r\n')[0], body.decode('UTF-8')
+
+    status, body = await request(b'GET /metrics HTTP/1.1')
+    assert status == b'HTTP/1.0 200 OK'
+    assert body == registry.exposition()
+    assert 'test_total 4' in body.splitlines()
+
+    status, body = await request(b'GET /foo HTTP/1.1')
+    assert status == b'HTTP/1.0 404 Not Found'
+    status, body = await request(b'POST /metrics HTTP/1.1')
+    assert status == b'HTTP/1.0 405 Method Not Allowed'
+
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_backend_metrics(metrics_enabled, mocked_vidhub_telnet_device):
+    from vidhubcontrol.backends.telnet import TelnetBackend, COMMAND_LATENCY, ROUTES_APPLIED, PARSE_TIME
+
+    backend = await TelnetBackend.create_async(hostaddr=True)
+    label = backend.metrics_label
+
+    await backend.set_crosspoints(*((i, 0) for i in range(backend.num_outputs)))
+    await backend.set_crosspoint(0, 1)
+
+    assert ROUTES_APPLIED.get(device=label) == backend.num_outputs + 1
+    total, count = COMMAND_LATENCY.get(device=label)
+    assert count == 2
+    assert total > 0
+    assert PARSE_TIME.get(section='VIDEO OUTPUT ROUTING')[1] > 0
+
+    await backend.disconnect()
@@ -580,3 +580,657 @@ async def test_interface_config(tempconfig, missing_netifaces):
 
     await interface.stop()
     await config.stop()
+
+@pytest.mark.asyncio
+async def test_bundle_splitting(unused_udp_port_factory):
+    from pythonosc import osc_bundle
+    from pythonosc.osc_message_builder import OscMessageBuilder
+    from vidhubcontrol.interfaces.osc import OSCUDPServer, OscDispatcher
+    from vidhubcontrol.interfaces.osc.server import build_bundles
+
+    loop = asyncio.get_event_loop()
+    server_port, client_port = unused_udp_port_factory(), unused_udp_port_factory()
+
+    messages = []
+    for i in range(288):
+        builder = OscMessageBuilder(address='/labels/{}'.format(i))
+        builder.add_arg('Output Label {}'.format(i))
+        messages.append(builder.build())
+
+    bundles = list(build_bundles(0, messages, 512))
+    assert len(bundles) > 1
+    assert all(bundle.size <= 512 for bundle in bundles)
+    assert [msg.dgram for bundle in bundles for msg in bundle] == [msg.dgram for msg in messages]
+
+    class Protocol(asyncio.DatagramProtocol):
+        def __init__(self):
+            self.queue = asyncio.Queue()
+        def datagram_received(self, data, addr):
+            self.queue.put_nowait(data)
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        Protocol, local_addr=('127.0.0.1', client_port),
+    )
+    server = OSCUDPServer(('127.0.0.1', server_port), OscDispatcher())
+    await server.start()
+
+    for msg in messages:
+        await server.sendto(msg, ('127.0.0.1', client_port))
+
+    received = []
+    while len(received) < len(messages):
+        data = await asyncio.wait_for(protocol.queue.get(), timeout=5)
+        assert len(data) <= server.max_datagram_size
+        received.extend(osc_bundle.OscBundle(data))
+    assert [msg.address for msg in received] == [msg.address for msg in messages]
+    assert [msg.params for msg in received] == [msg.params for msg in messages]
+
+    await server.stop()
+    transport.close()
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch(unused_udp_port_factory):
+    from pythonosc.osc_message_builder import OscMessageBuilder
+    from vidhubcontrol.interfaces.osc import OSCUDPServer, OscDispatcher
+
+    loop = asyncio.get_event_loop()
+    server_port = unused_udp_port_factory()
+    client_ports = [unused_udp_port_factory(), unused_udp_port_factory()]
+
+    dispatcher = OscDispatcher()
+    server = OSCUDPServer(('127.0.0.1', server_port), dispatcher, max_client_queue=4)
+    await server.start()
+
+    slow_evt = asyncio.Event()
+    handled = []
+    handled_evt = asyncio.Event()
+    async def on_message(address, client_address, *args):
+        if address == '/slow':
+            await slow_evt.wait()
+        handled.append((client_address[1], address, args))
+        handled_evt.set()
+    dispatcher.map('/slow', on_message)
+    dispatcher.map('/fast', on_message)
+
+    transports = []
+    for port in client_ports:
+        transport, protocol = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, local_addr=('127.0.0.1', port),
+        )
+        transports.append(transport)
+
+    def send(transport, address, *args):
+        builder = OscMessageBuilder(address=address)
+        for arg in args:
+            builder.add_arg(arg)
+        transport.sendto(builder.build().dgram, ('127.0.0.1', server_port))
+
+    # The first client is blocked by its slow handler
+    send(transports[0], '/slow', 0)
+    send(transports[0], '/fast', 1)
+    await asyncio.sleep(.1)
+
+    # Messages from the second client should be handled in the meantime
+    send(transports[1], '/fast', 2)
+    await asyncio.wait_for(handled_evt.wait(), timeout=5)
+    assert handled == [(client_ports[1], '/fast', (2,))]
+
+    # The first client's queue is full after 4 packets
+    for i in range(3, 8):
+        send(transports[0], '/fast', i)
+    await asyncio.sleep(.1)
+    assert server.dispatch_counters['dropped'] == 2
+    assert server.dispatch_queue_size() == 4
+
+    slow_evt.set()
+    await asyncio.sleep(.1)
+    client0 = [args[0] for port, address, args in handled if port == client_ports[0]]
+    assert client0 == [0, 1, 3, 4, 5]
+    assert server.dispatch_counters['received'] == 8
+    assert not len(server.client_workers)
+
+    await server.stop()
+    for transport in transports:
+        transport.close()
+
+def test_osc_router():
+    from vidhubcontrol.interfaces.osc import OscDispatcher
+    from vidhubcontrol.interfaces.osc.server import compile_osc_pattern
+
+    dispatcher = OscDispatcher()
+    handlers = {}
+    for i in range(20):
+        for name in ['crosspoints', 'labels']:
+            addr = '/vidhub/{}/{}'.format(name, i)
+            handlers[addr] = dispatcher.map(addr, print)
+    handlers['/vidhub'] = dispatcher.map('/vidhub', print)
+
+    def get_addrs(pattern):
+        matched = list(dispatcher.handlers_for_address(pattern))
+        return {k for k, v in handlers.items() if any(v is h for h in matched)}
+
+    assert get_addrs('/vidhub/labels/3') == {'/vidhub/labels/3'}
+    assert get_addrs('/vidhub/labels/99') == set()
+    assert get_addrs('/vidhub') == {'/vidhub'}
+    assert get_addrs('/vidhub/*/3') == {'/vidhub/labels/3', '/vidhub/crosspoints/3'}
+    assert get_addrs('/vidhub/labels/1?') == {'/vidhub/labels/{}'.format(i) for i in range(10, 20)}
+    assert get_addrs('/vidhub/labels/[1-3]') == {'/vidhub/labels/{}'.format(i) for i in range(1, 4)}
+    assert get_addrs('/vidhub/labels/[!0-8]') == {'/vidhub/labels/9'}
+    assert get_addrs('/vidhub/{labels,crosspoints}/0') == {'/vidhub/labels/0', '/vidhub/crosspoints/0'}
+    assert get_addrs('/*') == {'/vidhub'}
+
+    # Compiled patterns are cached
+    compile_osc_pattern.cache_clear()
+    get_addrs('/vidhub/*/3')
+    get_addrs('/vidhub/*/3')
+    assert compile_osc_pattern.cache_info().hits >= 1
+
+    # Addresses mapped with wildcards
+    handlers['/vidhub/presets/*'] = dispatcher.map('/vidhub/presets/*', print)
+    assert get_addrs('/vidhub/presets/4') == {'/vidhub/presets/*'}
+
+    # Unmapped routes are pruned
+    for i in range(20):
+        dispatcher.unmap('/vidhub/labels/{}'.format(i), handlers.pop('/vidhub/labels/{}'.format(i)))
+    assert get_addrs('/vidhub/labels/3') == set()
+    assert 'labels' not in dispatcher._route_root.children[''].children['vidhub'].children
+    assert get_addrs('/vidhub/crosspoints/3') == {'/vidhub/crosspoints/3'}
+
+@pytest.mark.asyncio
+async def test_lazy_nodes():
+    from vidhubcontrol.interfaces.osc import OscNode, OscDispatcher
+    from vidhubcontrol.interfaces.osc.interface import VidhubNode
+    from vidhubcontrol.backends import DummyBackend
+
+    vidhub = await DummyBackend.create_async(device_id='dummy1')
+    dispatcher = OscDispatcher()
+    root = OscNode('vidhubcontrol', osc_dispatcher=dispatcher)
+    vidhub_node = VidhubNode(vidhub)
+    root.add_child('', vidhub_node)
+    vidhub_node.osc_dispatcher = dispatcher
+
+    xpt_node = vidhub_node.find('crosspoints')
+    label_node = vidhub_node.find('labels/input')
+    xpt_node.lazy_node_ttl = .1
+    assert set(xpt_node.children.keys()) == {'_subscribe', '_query', '_list'}
+    assert set(label_node.children.keys()) == {'_subscribe', '_query', '_list'}
+    base_addr = '/vidhubcontrol/dummy1'
+
+    # Nodes are built when the dispatcher looks up their address
+    handlers = list(dispatcher.handlers_for_address(base_addr + '/crosspoints/5'))
+    assert len(handlers) == 1
+    assert set(xpt_node.children.keys()) - {'_subscribe', '_query', '_list'} == {'5'}
+    assert xpt_node.children['5'].value == vidhub.crosspoints[5]
+
+    handlers = list(dispatcher.handlers_for_address(base_addr + '/labels/input/1?'))
+    assert len(handlers) == 2
+    assert set(label_node.children.keys()) - {'_subscribe', '_query', '_list'} == {'10', '11'}
+    assert list(dispatcher.handlers_for_address(base_addr + '/crosspoints/99')) == []
+
+    # Local lookups build them as well
+    assert vidhub_node.find('crosspoints/6/_subscribe') is not None
+    xpt_node.children['6'].subscribers.add(('127.0.0.1', 9999))
+
+    await vidhub.set_crosspoint(5, 3)
+    assert xpt_node.children['5'].value == 3
+
+    # Unused nodes without subscribers are released after the ttl
+    await asyncio.sleep(.3)
+    assert '5' not in xpt_node.children
+    assert '6' in xpt_node.children
+    assert base_addr + '/crosspoints/5' not in dispatcher._map
+    assert base_addr + '/crosspoints/5/_subscribe' not in dispatcher._map
+
+    # and rebuilt on the next access
+    handlers = list(dispatcher.handlers_for_address(base_addr + '/crosspoints/5'))
+    assert len(handlers) == 1
+    assert xpt_node.children['5'].value == 3
+
+    await vidhub.disconnect()
+
+@pytest.mark.asyncio
+async def test_shared_feedback_listener():
+    from vidhubcontrol.interfaces.osc import OscNode, OscDispatcher
+    from vidhubcontrol.interfaces.osc.interface import VidhubNode, VidhubFeedbackListener
+    from vidhubcontrol.backends import DummyBackend
+
+    vidhub = await DummyBackend.create_async(device_id='dummy1', device_name='dummy-name')
+    dispatcher = OscDispatcher()
+    root = OscNode('vidhubcontrol', osc_dispatcher=dispatcher)
+    vidhub_nodes = []
+    for use_device_id in [True, False]:
+        node = VidhubNode(vidhub, use_device_id=use_device_id)
+        root.add_child('', node)
+        node.osc_dispatcher = dispatcher
+        vidhub_nodes.append(node)
+
+    xpt_nodes = [node.find('crosspoints/3') for node in vidhub_nodes]
+    other_xpt_node = vidhub_nodes[0].find('crosspoints/4')
+    lbl_nodes = [node.find('labels/output/3') for node in vidhub_nodes]
+
+    listener = VidhubFeedbackListener.get(vidhub)
+    assert listener.nodes['crosspoints'][3] == set(xpt_nodes)
+    assert listener.nodes['output_labels'][3] == set(lbl_nodes)
+    assert 'input_labels' not in listener.nodes
+
+    value_changes = []
+    def on_value(instance, value, **kwargs):
+        value_changes.append((instance.index, value))
+    for node in xpt_nodes + [other_xpt_node]:
+        node.bind(value=on_value)
+
+    await vidhub.set_crosspoint(3, 7)
+    assert [node.value for node in xpt_nodes] == [7, 7]
+    assert value_changes == [(3, 7), (3, 7)]
+
+    # Writing an unchanged value does not update the nodes
+    value_changes.clear()
+    await vidhub.set_crosspoints((3, 7), (5, 1))
+    assert value_changes == []
+
+    await vidhub.set_output_label(3, 'Shared')
+    assert [node.value for node in lbl_nodes] == ['Shared', 'Shared']
+
+    vidhub_nodes[0].find('crosspoints').remove_child('3')
+    assert listener.nodes['crosspoints'][3] == {xpt_nodes[1]}
+
+    await vidhub.disconnect()
+
+@pytest.mark.asyncio
+async def test_delta_subscription():
+    from pydispatch import Dispatcher
+    from pydispatch.properties import ListProperty
+    from vidhubcontrol.interfaces.osc import PubSubOscNode, OscDispatcher
+
+    class Recorder(OscDispatcher):
+        def __init__(self):
+            super().__init__()
+            self.sent = []
+        async def send_message(self, node, client_address, *args, **kwargs):
+            self.sent.append((node.osc_address, client_address, list(args)))
+        async def send_message_multi(self, node, client_addresses, *args, **kwargs):
+            for client_address in client_addresses:
+                await self.send_message(node, client_address, *args, **kwargs)
+
+    class Publisher(Dispatcher):
+        values = ListProperty()
+
+    publisher = Publisher()
+    publisher.values = list(range(200))
+    recorder = Recorder()
+    node = PubSubOscNode(
+        'xpts', osc_dispatcher=recorder, delta_window=.05,
+        published_property=(publisher, 'values'),
+    )
+    full_client, delta_client = ('127.0.0.1', 1000), ('127.0.0.1', 1001)
+    subscribe_node = node.find('_subscribe')
+    await node.on_subscribe_node_message(subscribe_node, full_client)
+    await node.on_subscribe_node_message(subscribe_node, delta_client, 'delta')
+    assert node.subscribers == {full_client}
+    assert node.delta_subscribers == {delta_client}
+
+    # Delta subscribers get a snapshot after the acknowledgement
+    assert recorder.sent[-2:] == [
+        ('/xpts/_subscribe', delta_client, []),
+        ('/xpts', delta_client, list(range(200))),
+    ]
+    recorder.sent.clear()
+
+    # Changes within the window are combined
+    publisher.values[3] = 100
+    publisher.values[7] = 101
+    publisher.values[3] = 102
+    await asyncio.sleep(.1)
+    full_msgs = [args for addr, client, args in recorder.sent if client == full_client]
+    delta_msgs = [(addr, args) for addr, client, args in recorder.sent if client == delta_client]
+    assert len(full_msgs) == 3
+    assert full_msgs[-1] == publisher.values
+    assert delta_msgs == [('/xpts/_delta', [3, 102, 7, 101])]
+    recorder.sent.clear()
+
+    # Large changes are split into chunks of max_delta_pairs
+    publisher.values = [i + 1 for i in range(200)]
+    await asyncio.sleep(.1)
+    delta_msgs = [args for addr, client, args in recorder.sent if client == delta_client]
+    assert [len(args) // 2 for args in delta_msgs] == [64, 64, 64, 8]
+    pairs = [v for args in delta_msgs for v in args]
+    assert dict(zip(pairs[::2], pairs[1::2])) == {i:i + 1 for i in range(200)}
+
+    # Unsubscribe
+    await node.on_subscribe_node_message(subscribe_node, delta_client, False)
+    assert not len(node.delta_subscribers)
+    recorder.sent.clear()
+    publisher.values[0] = 5
+    await asyncio.sleep(.1)
+    assert all(client == full_client for addr, client, args in recorder.sent)
+
+@pytest.mark.asyncio
+async def test_subscriber_leases(missing_netifaces, unused_udp_port_factory):
+    from pydispatch import Dispatcher, Property
+    from vidhubcontrol.interfaces.osc import PubSubOscNode, OscInterface
+
+    class Publisher(Dispatcher):
+        value = Property()
+
+    interface = OscInterface(hostport=unused_udp_port_factory())
+    dispatcher = interface.osc_dispatcher
+    registry = interface.subscriber_registry
+    sent = []
+    class Server(object):
+        async def sendto_multi(self, msg, client_addresses, when=None):
+            for client_address in client_addresses:
+                sent.append((msg.address, client_address, msg.params))
+    dispatcher.server = Server()
+
+    publisher = Publisher()
+    node = interface.root_node.add_child(
+        'pub', cls=PubSubOscNode, published_property=(publisher, 'value'),
+        subscription_ttl=.2, max_subscribers=2,
+    )
+    clients = [('127.0.0.1', 1000 + i) for i in range(3)]
+    subscribe_node = node.find('_subscribe')
+    await node.on_subscribe_node_message(subscribe_node, clients[0])
+    await asyncio.sleep(.05)
+    await node.on_subscribe_node_message(subscribe_node, clients[1])
+    assert node.subscribers == set(clients[:2])
+
+    # The subscriber set is bounded; the lease closest to expiring is dropped
+    await node.on_subscribe_node_message(subscribe_node, clients[2])
+    assert node.subscribers == set(clients[1:])
+    assert len(registry.clients[clients[0]].subscriptions) == 0
+    assert set(registry.clients[clients[1]].subscriptions) == {node}
+
+    # Renew the lease for clients[2] only
+    await asyncio.sleep(.1)
+    await node.on_subscribe_node_message(subscribe_node, clients[2])
+    await asyncio.sleep(.12)
+    sent.clear()
+    publisher.value = 'foo'
+    await asyncio.sleep(.01)
+    assert sent == [('/vidhubcontrol/pub', clients[2], ['foo'])]
+    assert node.subscribers == {clients[2]}
+
+    # Expired leases are also removed by the registry sweep
+    await asyncio.sleep(.25)
+    registry.sweep()
+    assert not len(node.subscribers)
+    assert registry.clients[clients[2]].message_rate > 0
+
+    # Client traffic is reported through the "_clients" node
+    sent.clear()
+    clients_node = interface.root_node.find('_clients')
+    await interface.on_clients_node_message(clients_node, clients[0])
+    assert len(sent) == 1
+    address, client_address, args = sent[0]
+    assert address == '/vidhubcontrol/_clients'
+    info = {args[i]:args[i+1:i+4] for i in range(0, len(args), 4)}
+    assert info['127.0.0.1:1002'][0] == 0
+    assert info['127.0.0.1:1002'][1] > 0
+
+    registry.sweep()
+    registry.sweep()
+    assert clients[2] not in registry.clients
+
+@pytest.mark.asyncio
+async def test_send_message_multi(unused_udp_port_factory):
+    from pythonosc import osc_bundle
+    from vidhubcontrol.interfaces.osc import OSCUDPServer, OscDispatcher, OscNode
+
+    loop = asyncio.get_event_loop()
+    server_port = unused_udp_port_factory()
+    client_ports = [unused_udp_port_factory() for i in range(3)]
+
+    class Protocol(asyncio.DatagramProtocol):
+        def __init__(self):
+            self.queue = asyncio.Queue()
+        def datagram_received(self, data, addr):
+            self.queue.put_nowait(data)
+
+    endpoints = []
+    for port in client_ports:
+        endpoints.append(await loop.create_datagram_endpoint(
+            Protocol, local_addr=('127.0.0.1', port),
+        ))
+
+    class Dispatcher(OscDispatcher):
+        built = 0
+        def build_message(self, node, *args):
+            self.built += 1
+            return super().build_message(node, *args)
+
+    dispatcher = Dispatcher()
+    server = OSCUDPServer(('127.0.0.1', server_port), dispatcher)
+    await server.start()
+    node = OscNode('foo', osc_dispatcher=dispatcher)
+    client_addrs = [('127.0.0.1', port) for port in client_ports]
+
+    await node.send_message_multi(client_addrs, 1, 'a')
+    assert dispatcher.built == 1
+
+    for transport, protocol in endpoints:
+        data = await asyncio.wait_for(protocol.queue.get(), timeout=5)
+        msgs = list(osc_bundle.OscBundle(data))
+        assert [(msg.address, msg.params) for msg in msgs] == [('/foo', [1, 'a'])]
+
+    for client_addr in client_addrs:
+        stats = dispatcher.subscriber_registry.clients[client_addr]
+        assert stats.messages == 1
+        assert stats.bytes > 0
+
+    await server.stop()
+    for transport, protocol in endpoints:
+        transport.close()
+
+def test_slip_framing():
+    from vidhubcontrol.interfaces.osc.server import slip_encode, SlipDecoder
+
+    packets = [b'\xc0abc\xdb', b'\xdb\xdc\xdb\xdd', b'plain', bytes(range(256))]
+    stream = b''.join(slip_encode(p) for p in packets)
+    assert stream.count(b'\xc0') == len(packets) * 2
+
+    # Feed the stream in small pieces to split frames and escape sequences
+    decoder = SlipDecoder()
+    decoded = []
+    for i in range(0, len(stream), 3):
+        decoded.extend(decoder.feed(stream[i:i+3]))
+    assert decoded == packets
+
+    # Oversized frames are discarded without affecting those after
+    decoder = SlipDecoder(max_packet_size=16)
+    stream = slip_encode(b'x' * 64) + slip_encode(b'ok')
+    assert decoder.feed(stream[:20]) == []
+    assert decoder.feed(stream[20:]) == [b'ok']
+
+@pytest.mark.asyncio
+async def test_tcp_server(unused_udp_port_factory, unused_tcp_port_factory):
+    from pydispatch import Dispatcher, Property
+    from pythonosc import osc_packet
+    from pythonosc.osc_message_builder import OscMessageBuilder
+    from vidhubcontrol.interfaces.osc import (
+        OSCUDPServer, OSCTCPServer, OscDispatcher, PubSubOscNode,
+    )
+    from vidhubcontrol.interfaces.osc.server import slip_encode, SlipDecoder
+
+    class Publisher(Dispatcher):
+        value = Property()
+
+    udp_port, tcp_port = unused_udp_port_factory(), unused_tcp_port_factory()
+    dispatcher = OscDispatcher()
+    udp_server = OSCUDPServer(('127.0.0.1', udp_port), dispatcher, max_datagram_size=512)
+    tcp_server = OSCTCPServer(('127.0.0.1', tcp_port), dispatcher)
+    await udp_server.start()
+    await tcp_server.start()
+
+    publisher = Publisher()
+    node = PubSubOscNode(
+        'pub', osc_dispatcher=dispatcher, published_property=(publisher, 'value'),
+    )
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', tcp_port)
+    decoder = SlipDecoder()
+    async def get_messages(count):
+        messages = []
+        while len(messages) < count:
+            data = await asyncio.wait_for(reader.read(65536), timeout=5)
+            assert data
+            for packet in decoder.feed(data):
+                messages.extend(
+                    (m.message.address, m.message.params)
+                    for m in osc_packet.OscPacket(packet).messages
+                )
+        return messages
+
+    builder = OscMessageBuilder(address='/pub/_subscribe')
+    writer.write(slip_encode(builder.build().dgram))
+    assert await get_messages(1) == [('/pub/_subscribe', [])]
+    assert len(tcp_server.connections) == 1
+    client_address = list(tcp_server.connections.keys())[0]
+    assert node.subscribers == {client_address}
+
+    # Messages larger than a datagram are sent whole over the stream
+    value = 'x' * 4096
+    publisher.value = value
+    assert await get_messages(1) == [('/pub', [value])]
+
+    writer.close()
+    for i in range(50):
+        if not len(tcp_server.connections):
+            break
+        await asyncio.sleep(.1)
+    assert not len(tcp_server.connections)
+    assert client_address not in dispatcher.connections
+
+    # Open connections are closed when the server stops
+    reader, writer = await asyncio.open_connection('127.0.0.1', tcp_port)
+    while not len(tcp_server.connections):
+        await asyncio.sleep(.01)
+    await tcp_server.stop()
+    assert not len(tcp_server.connections)
+    assert await asyncio.wait_for(reader.read(), timeout=5) == b''
+    writer.close()
+    await udp_server.stop()
+
+@pytest.mark.asyncio
+async def test_tcp_stalled_client(unused_udp_port_factory, unused_tcp_port_factory):
+    from pydispatch import Dispatcher, Property
+    from pythonosc import osc_packet
+    from pythonosc.osc_message_builder import OscMessageBuilder
+    from vidhubcontrol.interfaces.osc import (
+        OSCUDPServer, OSCTCPServer, OscDispatcher, PubSubOscNode,
+    )
+    from vidhubcontrol.interfaces.osc.server import slip_encode
+
+    class Publisher(Dispatcher):
+        value = Property()
+
+    loop = asyncio.get_event_loop()
+    udp_port, tcp_port = unused_udp_port_factory(), unused_tcp_port_factory()
+    dispatcher = OscDispatcher()
+    udp_server = OSCUDPServer(('127.0.0.1', udp_port), dispatcher)
+    tcp_server = OSCTCPServer(('127.0.0.1', tcp_port), dispatcher, max_write_queue=2)
+    await udp_server.start()
+    await tcp_server.start()
+
+    publisher = Publisher()
+    node = PubSubOscNode(
+        'pub', osc_dispatcher=dispatcher, published_property=(publisher, 'value'),
+    )
+    subscribe = OscMessageBuilder(address='/pub/_subscribe').build().dgram
+
+    # A TCP client that never reads (its transport never drains)
+    reader, writer = await asyncio.open_connection('127.0.0.1', tcp_port)
+    while not len(tcp_server.connections):
+        await asyncio.sleep(.01)
+    conn = list(tcp_server.connections.values())[0]
+    stalled = asyncio.Event()
+    async def drain():
+        await stalled.wait()
+    conn.writer.drain = drain
+    writer.write(slip_encode(subscribe))
+
+    udp_queue = asyncio.Queue()
+    class Protocol(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            for m in osc_packet.OscPacket(data).messages:
+                udp_queue.put_nowait((m.message.address, m.message.params))
+    transport, protocol = await loop.create_datagram_endpoint(
+        Protocol, local_addr=('127.0.0.1', unused_udp_port_factory()),
+    )
+    transport.sendto(subscribe, ('127.0.0.1', udp_port))
+    assert await asyncio.wait_for(udp_queue.get(), timeout=5) == ('/pub/_subscribe', [])
+    while len(node.subscribers) < 2:
+        await asyncio.sleep(.01)
+
+    # The UDP subscriber gets every update while the stalled connection
+    # overflows and is aborted
+    for i in range(8):
+        publisher.value = i
+        assert await asyncio.wait_for(udp_queue.get(), timeout=5) == ('/pub', [i])
+    for i in range(50):
+        if not len(tcp_server.connections):
+            break
+        await asyncio.sleep(.1)
+    assert not len(tcp_server.connections)
+    assert conn.closing
+
+    await asyncio.wait_for(tcp_server.stop(), timeout=5)
+    writer.close()
+    transport.close()
+    await udp_server.stop()
+
+@pytest.mark.asyncio
+async def test_timed_salvo(missing_netifaces, unused_udp_port_factory):
+    import time
+    from pythonosc.osc_bundle_builder import OscBundleBuilder
+    from pythonosc.osc_message_builder import OscMessageBuilder
+    from vidhubcontrol.interfaces.osc import OscInterface
+    from vidhubcontrol.backends import DummyBackend
+
+    loop = asyncio.get_event_loop()
+    interface = OscInterface(hostport=unused_udp_port_factory())
+    vidhub = DummyBackend(device_name='dummy-name')
+    await vidhub.connect()
+    await vidhub.set_crosspoints(*((i, 0) for i in range(vidhub.num_outputs)))
+    await interface.add_vidhub(vidhub)
+    await interface.start()
+    server_addr = interface.server._server_address
+    scheduler = interface.osc_dispatcher.scheduler
+
+    calls = []
+    set_crosspoints = vidhub.set_crosspoints
+    async def record_set_crosspoints(*args):
+        calls.append(args)
+        return await set_crosspoints(*args)
+    vidhub.set_crosspoints = record_set_crosspoints
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, local_addr=(server_addr[0], unused_udp_port_factory()),
+    )
+
+    # Two bundles sharing a timetag are released as one batch
+    when = time.time() + .3
+    addr = '/vidhubcontrol/vidhubs/by-id/dummy/crosspoints/{}'
+    for outputs in [range(0, 6), range(6, vidhub.num_outputs)]:
+        builder = OscBundleBuilder(when)
+        for i in outputs:
+            msg = OscMessageBuilder(address=addr.format(i))
+            msg.add_arg(i)
+            builder.add_content(msg.build())
+        transport.sendto(builder.build().dgram, server_addr)
+
+    while scheduler.counters['scheduled'] < vidhub.num_outputs:
+        await asyncio.sleep(.01)
+    assert len(scheduler._batches) == 1
+    assert vidhub.crosspoints == [0] * vidhub.num_outputs
+    assert not len(calls)
+
+    while time.time() < when + .2:
+        await asyncio.sleep(.05)
+    assert scheduler.counters['released'] == 1
+    assert vidhub.crosspoints == list(range(vidhub.num_outputs))
+    assert len(calls) == 1
+    assert sorted(calls[0]) == [(i, i) for i in range(vidhub.num_outputs)]
+
+    transport.close()
+    await interface.stop()
+    await vidhub.disconnect()
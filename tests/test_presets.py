@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+
+@pytest.mark.asyncio
+async def test_preset_active_tracking():
+    from vidhubcontrol.backends import DummyBackend
+
+    vidhub = await DummyBackend.create_async()
+    await vidhub.set_crosspoints(*((i, 0) for i in range(vidhub.num_outputs)))
+
+    active_events = []
+    def on_preset_active(*args, **kwargs):
+        active_events.append((kwargs['preset'].index, kwargs['value']))
+    vidhub.bind(on_preset_active=on_preset_active)
+
+    # Each preset stores a single output routed to input 1
+    presets = []
+    for out_idx in range(vidhub.num_outputs):
+        preset = await vidhub.add_preset()
+        preset.crosspoints = {out_idx:1}
+        assert not preset.active
+        presets.append(preset)
+    assert active_events == []
+    assert vidhub._preset_index[3] == {presets[3]}
+
+    await vidhub.set_crosspoint(3, 1)
+    assert [p.index for p in presets if p.active] == [3]
+    assert active_events == [(3, True)]
+
+    # Changes to outputs not stored in a preset should not affect it
+    active_events.clear()
+    await vidhub.set_crosspoints((0, 2), (1, 2))
+    assert presets[3].active
+    assert active_events == []
+
+    await vidhub.set_crosspoint(3, 2)
+    assert not presets[3].active
+    assert active_events == [(3, False)]
+
+    # Reindex after a preset's outputs change
+    active_events.clear()
+    presets[3].crosspoints = {3:2, 4:0}
+    assert presets[3].active
+    assert vidhub._preset_index[4] == {presets[3], presets[4]}
+    await vidhub.set_crosspoint(4, 5)
+    assert not presets[3].active
+
+    presets[3].crosspoints = {5:0}
+    assert 3 not in vidhub._preset_index
+    assert vidhub._preset_index[4] == {presets[4]}
+    assert presets[3].active
+
+    # Full list assignment rechecks all presets
+    vidhub.crosspoints = [1] * vidhub.num_outputs
+    assert [p.index for p in presets if p.active] == [i for i in range(vidhub.num_outputs) if i != 3]
+
+    vidhub.unbind(on_preset_active)
+    await vidhub.disconnect()
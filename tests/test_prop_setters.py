@@ -73,6 +73,50 @@ async def test_prop_setters():
 
     await vidhub.disconnect()
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('coalesce_window', [0, .005])
+async def test_coalesced_writes(coalesce_window):
+    from vidhubcontrol.backends import DummyBackend
+
+    vidhub = await DummyBackend.create_async(coalesce_window=coalesce_window)
+    await vidhub.set_crosspoints(*((i, 0) for i in range(vidhub.num_outputs)))
+
+    calls = []
+    set_crosspoints = vidhub.set_crosspoints
+    async def patched_set_crosspoints(*args):
+        calls.append(args)
+        return await set_crosspoints(*args)
+    vidhub.set_crosspoints = patched_set_crosspoints
+
+    waiter = AsyncEventWaiter(vidhub)
+    waiter.bind('crosspoints')
+
+    for out_idx in range(vidhub.num_outputs):
+        vidhub.crosspoint_control[out_idx] = 1
+    for out_idx in range(4):
+        vidhub.crosspoint_control[out_idx] = 2
+    await waiter.wait()
+
+    expected = [2] * 4 + [1] * (vidhub.num_outputs - 4)
+    assert vidhub.crosspoints == expected
+    assert len(calls) == 1
+    assert dict(calls[0]) == {i:v for i, v in enumerate(expected)}
+    assert vidhub.write_counters == {
+        'writes':vidhub.num_outputs + 4,
+        'merged':4,
+        'flushes':1,
+    }
+
+    fut1 = vidhub.queue_writes('crosspoints', [(5, 3)])
+    fut2 = vidhub.queue_writes('crosspoints', [(6, 3)])
+    assert fut1 is fut2
+    await fut1
+    assert len(calls) == 2
+    assert vidhub.crosspoints[5:7] == [3, 3]
+
+    waiter.unbind()
+    await vidhub.disconnect()
+
 @pytest.mark.asyncio
 async def test_smartscope_prop_setters():
     from vidhubcontrol.backends import SmartScopeDummyBackend
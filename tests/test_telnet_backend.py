@@ -32,6 +32,294 @@ async def test_telnet_vidhub(mocked_vidhub_telnet_device, vidhub_telnet_response
 
     await backend.disconnect()
 
+def test_telnet_stream_parser():
+    from vidhubcontrol.aiotelnetlib import TelnetStreamParser, IAC, DO, WILL, WONT, DONT, SB, SE
+    from conftest import VIDHUB_PREAMBLE
+
+    parser = TelnetStreamParser()
+    blocks = []
+    for i in range(0, len(VIDHUB_PREAMBLE), 7):
+        blocks.extend(parser.feed(VIDHUB_PREAMBLE[i:i+7]))
+    assert b''.join(blocks) == VIDHUB_PREAMBLE
+    assert blocks[0] == b'PROTOCOL PREAMBLE:\nVersion: 2.7\n\n'
+    assert blocks[-1] == b'END PRELUDE:\n'
+    assert not len(parser.buffer)
+
+    # Option requests should be refused and stripped along with subnegotiation
+    data = b''.join([
+        bytes([IAC, DO, 1]), b'ACK\n', bytes([IAC, WILL, 3]),
+        b'\n', bytes([IAC, SB, 24, 1, IAC, SE]), b'INPUT LABELS:\n0 a', bytes([IAC, IAC]),
+    ])
+    for i in range(len(data)):
+        blocks = parser.feed(data[i:i+1])
+        if i < len(data) - 1:
+            assert blocks == [] or blocks == [b'ACK\n\n']
+    assert parser.take_replies() == bytes([IAC, WONT, 1, IAC, DONT, 3])
+    assert parser.take_replies() == b''
+    assert parser.feed(b'\n\n') == [b'INPUT LABELS:\n0 a\xff\n\n']
+
+def test_split_blocks_end_prelude():
+    from vidhubcontrol.aiotelnetlib import TelnetStreamParser, split_blocks
+    from conftest import VIDHUB_PREAMBLE
+
+    bfr = bytearray(b'END PRELUDE:\nVIDEO OUTPUT ROUTING:\n0 5\n\n')
+    assert split_blocks(bfr) == [b'END PRELUDE:\n', b'VIDEO OUTPUT ROUTING:\n0 5\n\n']
+    assert not len(bfr)
+
+    # The prelude and the next section arriving in a single read
+    routing = b'VIDEO OUTPUT ROUTING:\n0 5\n1 6\n\n'
+    parser = TelnetStreamParser()
+    blocks = parser.feed(VIDHUB_PREAMBLE + routing)
+    assert b''.join(blocks) == VIDHUB_PREAMBLE + routing
+    assert blocks[-2:] == [b'END PRELUDE:\n', routing]
+    assert not len(parser.buffer)
+
+@pytest.mark.asyncio
+async def test_telnet_fragmented_blocks(mocked_vidhub_telnet_device):
+    backend = await TelnetBackend.create_async(hostaddr=True)
+    assert backend.prelude_parsed
+
+    num_outputs = backend.num_outputs
+    xpts = [(i + 1) % backend.num_inputs for i in range(num_outputs)]
+    lbls = ['Out {}: Fragmented'.format(i) for i in range(num_outputs)]
+    data = ''.join([
+        'VIDEO OUTPUT ROUTING:\n',
+        ''.join(['{} {}\n'.format(i, v) for i, v in enumerate(xpts)]),
+        '\nOUTPUT LABELS:\n',
+        ''.join(['{} {}\n'.format(i, lbl) for i, lbl in enumerate(lbls)]),
+        '\n',
+    ]).encode('UTF-8')
+
+    client = backend.client
+    for i in range(0, len(data), 3):
+        client.send_to_backend(data[i:i+3])
+        if i == 0:
+            assert client.stream_parser.buffer == data[:3]
+    assert not len(client.stream_parser.buffer)
+    while not client.block_queue.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(.01)
+    assert backend.crosspoints == xpts
+    assert backend.output_labels == lbls
+
+    await backend.disconnect()
+
+@pytest.mark.asyncio
+async def test_telnet_routing_single_emission(mocked_vidhub_telnet_device):
+    backend = await TelnetBackend.create_async(hostaddr=True)
+    assert backend.prelude_parsed
+
+    emissions = {'crosspoints':[], 'crosspoint_control':[]}
+    def on_crosspoints(instance, value, **kwargs):
+        emissions[kwargs['property'].name].append(kwargs.get('keys'))
+    backend.bind(crosspoints=on_crosspoints, crosspoint_control=on_crosspoints)
+
+    changed = [1, 4, 7]
+    xpts = backend.crosspoints[:]
+    data = ['VIDEO OUTPUT ROUTING:']
+    for out_idx in changed:
+        xpts[out_idx] = (xpts[out_idx] + 1) % backend.num_inputs
+        data.append('{} {}'.format(out_idx, xpts[out_idx]))
+    await backend.parse_block('\n'.join(data + ['', '']))
+
+    assert backend.crosspoints == backend.crosspoint_control == xpts
+    assert emissions['crosspoints'] == [changed]
+    assert emissions['crosspoint_control'] == [changed]
+
+    backend.unbind(on_crosspoints)
+    await backend.disconnect()
+
+@pytest.mark.asyncio
+async def test_telnet_protocol_stream(unused_tcp_port):
+    from conftest import VIDHUB_PREAMBLE
+
+    async def handle_client(reader, writer):
+        for i in range(0, len(VIDHUB_PREAMBLE), 5):
+            writer.write(VIDHUB_PREAMBLE[i:i+5])
+            await writer.drain()
+        while True:
+            data = await reader.readuntil(b'\n\n')
+            writer.write(b'ACK\n\n' + data)
+            await writer.drain()
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', unused_tcp_port)
+
+    backend = await TelnetBackend.create_async(hostaddr='127.0.0.1', hostport=unused_tcp_port)
+    assert backend.prelude_parsed
+    assert backend.device_id == 'A0B2C3D4E5F6'
+    assert backend.num_outputs == len(backend.crosspoints) == 12
+    assert backend.crosspoints[1] == 9
+
+    await backend.set_crosspoints(*((i, 3) for i in range(backend.num_outputs)))
+    assert backend.crosspoints == [3] * backend.num_outputs
+
+    await backend.disconnect()
+    server.close()
+    await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_telnet_command_pipeline(unused_tcp_port):
+    from conftest import VIDHUB_PREAMBLE
+
+    received = []
+    async def handle_client(reader, writer):
+        writer.write(VIDHUB_PREAMBLE)
+        await writer.drain()
+        while True:
+            data = await reader.readuntil(b'\n\n')
+            received.append(data)
+            lines = [line for line in data.decode('UTF-8').splitlines() if len(line)]
+            if lines[0] == 'INPUT LABELS:':
+                # Never respond so the command times out
+                continue
+            # Delay the first response so later commands are queued behind it
+            if len(received) == 1:
+                await asyncio.sleep(.2)
+            if lines[0] == 'VIDEO OUTPUT ROUTING:':
+                routes = [[int(v) for v in line.split(' ')] for line in lines[1:]]
+                if any(out_idx >= 12 or in_idx >= 12 for out_idx, in_idx in routes):
+                    writer.write(b'NAK\n\n')
+                    await writer.drain()
+                    continue
+            writer.write(b'ACK\n\n' + data)
+            await writer.drain()
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', unused_tcp_port)
+
+    backend = await TelnetBackend.create_async(
+        hostaddr='127.0.0.1', hostport=unused_tcp_port, command_timeout=.5,
+    )
+    assert backend.prelude_parsed
+
+    tasks = [asyncio.ensure_future(coro) for coro in [
+        backend.set_crosspoints((0, 1), (1, 1)),
+        backend.set_crosspoints((2, 20)),
+        backend.set_output_label(3, 'Pipelined'),
+        backend.set_crosspoint(4, 5),
+    ]]
+    # All commands should be in flight while the first response is delayed
+    await asyncio.sleep(.1)
+    assert len(backend.pending_commands) == 4
+
+    results = await asyncio.gather(*tasks)
+    assert results == [True, False, True, True]
+    assert len(received) == 4
+    assert not len(backend.pending_commands)
+    assert backend.crosspoints[:2] == [1, 1]
+    assert backend.crosspoints[2] != 20
+    assert backend.crosspoints[4] == 5
+    assert backend.output_labels[3] == 'Pipelined'
+
+    assert not await backend.set_input_label(0, 'Timeout')
+    assert backend.input_labels[0] != 'Timeout'
+
+    await backend.disconnect()
+    assert not len(backend.pending_commands)
+    server.close()
+    await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_telnet_late_reply_resync(unused_tcp_port):
+    from conftest import VIDHUB_PREAMBLE
+
+    connections = []
+    async def handle_client(reader, writer):
+        connections.append(writer)
+        writer.write(VIDHUB_PREAMBLE)
+        await writer.drain()
+        while True:
+            try:
+                data = await reader.readuntil(b'\n\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            lines = [line for line in data.decode('UTF-8').splitlines() if len(line)]
+            if lines[0] == 'INPUT LABELS:' and lines[1] == '0 Slow':
+                # Reply after the command has timed out
+                await asyncio.sleep(.3)
+            elif lines[0] == 'VIDEO OUTPUT ROUTING:':
+                # Reject routes to input 9
+                routes = [line.split(' ') for line in lines[1:]]
+                if any(in_idx == '9' for out_idx, in_idx in routes):
+                    writer.write(b'NAK\n\n')
+                    await writer.drain()
+                    continue
+            try:
+                writer.write(b'ACK\n\n' + data)
+                await writer.drain()
+            except ConnectionError:
+                break
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', unused_tcp_port)
+    backend = await TelnetBackend.create_async(
+        hostaddr='127.0.0.1', hostport=unused_tcp_port, command_timeout=.1,
+    )
+
+    assert not await backend.set_input_label(0, 'Slow')
+    assert backend._resync_task is not None
+
+    # The connection is reestablished so the late ACK can't be matched to
+    # the next command (which the device rejects)
+    for i in range(50):
+        if backend._resync_task is None:
+            break
+        await asyncio.sleep(.05)
+    assert backend._resync_task is None
+    assert backend.connection_state.is_connected
+    assert len(connections) == 2
+    assert not await backend.set_crosspoint(0, 9)
+    await asyncio.sleep(.3)
+    assert await backend.set_crosspoint(0, 3)
+    assert backend.crosspoints[0] == 3
+    assert not len(backend.pending_commands)
+
+    await backend.disconnect()
+    server.close()
+    await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_telnet_rejected_control_write(unused_tcp_port):
+    from conftest import VIDHUB_PREAMBLE
+
+    routing_cmds = []
+    async def handle_client(reader, writer):
+        writer.write(VIDHUB_PREAMBLE)
+        await writer.drain()
+        while True:
+            try:
+                data = await reader.readuntil(b'\n\n')
+            except asyncio.IncompleteReadError:
+                break
+            lines = [line for line in data.decode('UTF-8').splitlines() if len(line)]
+            if lines[0] == 'VIDEO OUTPUT ROUTING:':
+                routing_cmds.append(lines[1:])
+                # Input 7 can't be routed to output 0
+                if '0 7' in lines[1:]:
+                    writer.write(b'NAK\n\n')
+                    await writer.drain()
+                    continue
+            writer.write(b'ACK\n\n' + data)
+            await writer.drain()
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', unused_tcp_port)
+    backend = await TelnetBackend.create_async(hostaddr='127.0.0.1', hostport=unused_tcp_port)
+    assert backend.crosspoints[0] != 7
+    orig_value = backend.crosspoints[0]
+
+    # The rejected value is replaced by the device state
+    backend.crosspoint_control[0] = 7
+    await asyncio.sleep(.1)
+    assert routing_cmds == [['0 7']]
+    assert backend.crosspoint_control[0] == backend.crosspoints[0] == orig_value
+
+    # Changes to other outputs should not resend the rejected value
+    backend.crosspoint_control[3] = 2
+    await asyncio.sleep(.3)
+    assert routing_cmds == [['0 7'], ['3 2']]
+    assert backend.crosspoint_control == backend.crosspoints
+
+    await backend.disconnect()
+    server.close()
+    await server.wait_closed()
 
 
 @pytest.mark.asyncio
@@ -291,3 +579,78 @@ async def test_connect_called_while_disconnecting(backend_name, telnet_backend_f
     ]
     states = listener.states
     assert states == states_expected
+
+@pytest.mark.asyncio
+async def test_telnet_auto_reconnect(unused_tcp_port):
+    from conftest import VIDHUB_PREAMBLE
+    from vidhubcontrol.common import ConnectionState
+
+    writers = []
+    async def handle_client(reader, writer):
+        writers.append(writer)
+        writer.write(VIDHUB_PREAMBLE)
+        await writer.drain()
+        while True:
+            try:
+                data = await reader.readuntil(b'\n\n')
+            except asyncio.IncompleteReadError:
+                break
+            writer.write(b'ACK\n\n' + data)
+            await writer.drain()
+
+    async def wait_for_state(state):
+        state = ConnectionState.from_str(state)
+        for i in range(200):
+            if state in backend.connection_state:
+                break
+            await asyncio.sleep(.01)
+        assert state in backend.connection_state
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', unused_tcp_port)
+
+    backend = TelnetBackend(
+        hostaddr='127.0.0.1', hostport=unused_tcp_port,
+        auto_reconnect=True, reconnect_delay=.05, reconnect_max_delay=.2,
+    )
+
+    # The supervisor must not rely only on being notified of the state change
+    mgr = backend.connection_manager
+    orig_wait_for = mgr.wait_for
+    async def wait_for(state, timeout=None):
+        if state == 'not_connected':
+            await mgr._condition.wait_for(lambda: False)
+        return await orig_wait_for(state, timeout)
+    mgr.wait_for = wait_for
+
+    await backend.connect()
+    assert backend.connection_state.is_connected
+    assert backend.reconnect_count == 0
+
+    # Writes made while disconnected are queued until the supervisor reconnects
+    writers[0].close()
+    await wait_for_state('not_connected')
+    assert await backend.set_crosspoint(0, 3)
+    assert backend.connection_state.is_connected
+    assert backend.reconnect_count == 1
+    assert len(writers) == 2
+    assert backend.crosspoints[0] == 3
+
+    # With the "reject" policy, writes fail immediately while disconnected
+    backend.write_policy = 'reject'
+    server.close()
+    await server.wait_closed()
+    writers[1].close()
+    await wait_for_state('not_connected')
+    assert not await backend.set_crosspoint(0, 4)
+
+    # Attempts continue (and fail) with the backoff applied between them
+    await asyncio.sleep(.3)
+    assert ConnectionState.failure in backend.connection_state
+    assert backend.reconnect_count == 1
+
+    await backend.disconnect()
+    assert backend._supervisor is None
+
+    backend.reconnect_jitter = 0
+    delays = [backend.get_reconnect_delay(i) for i in range(4)]
+    assert delays == [.05, .1, .2, .2]
@@ -1,220 +1,241 @@
 from loguru import logger
 import asyncio
-import telnetlib
-
-
-_DEFAULT_LIMIT = 2 ** 16
+from typing import List, Dict, Optional
+
+TELNET_PORT = 23
+
+IAC = 255 # "Interpret As Command"
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250 # Subnegotiation Begin
+SE = 240 # Subnegotiation End
+
+IAC_BYTE = bytes([IAC])
+
+BLOCK_TERMINATOR = b'\n\n'
+END_PRELUDE = b'END PRELUDE:'
+
+def split_blocks(bfr: bytearray, search_start: Optional[int] = 0) -> List[bytes]:
+    """Remove all complete protocol blocks from the beginning of *bfr*
+
+    A block is a section of text ending with a blank line. The single line
+    ``"END PRELUDE:"`` (sent by Videohub devices after the protocol preamble)
+    is also treated as a complete block whether or not it is followed by
+    a blank line (the next section may follow it directly).
+
+    The given :class:`bytearray` is modified in place so only the incomplete
+    portion (if any) remains.
+
+    Arguments:
+        bfr: The buffer to search
+        search_start: Position to begin searching for the first block
+            terminator. Callers that append to the same buffer may pass
+            ``len(bfr) - 1`` from the previous call to avoid scanning
+            incomplete data more than once.
+
+    Returns:
+        A list of the blocks found (including their trailing newlines)
+    """
+    blocks = []
+    start = 0
+    size = len(bfr)
+    while True:
+        # Skip blank lines between blocks
+        while start < size and bfr[start] == 0x0a:
+            start += 1
+        if bfr.startswith(END_PRELUDE, start):
+            # A single line block which may be followed immediately by
+            # the next section
+            i = bfr.find(b'\n', start)
+            end = i + 1
+        else:
+            i = bfr.find(BLOCK_TERMINATOR, max(start, search_start))
+            end = i + len(BLOCK_TERMINATOR)
+        if i < 0:
+            break
+        blocks.append(bytes(bfr[start:end]))
+        start = end
+    if start:
+        del bfr[:start]
+    return blocks
+
+def split_section_values(lines: List[str]) -> Dict[str, str]:
+    """Split the ``"Key: value"`` lines of a protocol block into a dict
+    """
+    d = {}
+    for line in lines:
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        d[key] = value.strip(' ')
+    return d
+
+class TelnetStreamParser(object):
+    """Incremental parser for a telnet byte stream
+
+    Telnet command sequences are stripped as data is fed in (option requests
+    are refused) and the remaining data is split into protocol blocks using
+    :func:`split_blocks`.
+
+    Attributes:
+        buffer: Data received that does not yet form a complete block
+        replies: Option negotiation responses to be sent back to the remote
+            host. These are collected by :meth:`take_replies`
+    """
+    buffer: bytearray
+    replies: bytearray
+    def __init__(self):
+        self.buffer = bytearray()
+        self.replies = bytearray()
+        self._search_start = 0
+        self._iac_seq = None
+        self._in_sb = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add received data to the parser
+
+        Returns:
+            A list of any protocol blocks completed by the data
+        """
+        if self._iac_seq is None and not self._in_sb and IAC not in data:
+            self.buffer.extend(data)
+        else:
+            self._feed_commands(data)
+        blocks = split_blocks(self.buffer, self._search_start)
+        self._search_start = max(0, len(self.buffer) - 1)
+        return blocks
+
+    def _feed_commands(self, data: bytes):
+        bfr = self.buffer
+        for c in data:
+            seq = self._iac_seq
+            if seq is None:
+                if c == IAC:
+                    self._iac_seq = bytearray()
+                elif not self._in_sb:
+                    bfr.append(c)
+                continue
+            if not len(seq):
+                if c == IAC:
+                    # Escaped 0xff data byte
+                    self._iac_seq = None
+                    if not self._in_sb:
+                        bfr.append(c)
+                elif c in (DO, DONT, WILL, WONT):
+                    seq.append(c)
+                else:
+                    self._iac_seq = None
+                    if c == SB:
+                        self._in_sb = True
+                    elif c == SE:
+                        self._in_sb = False
+                continue
+            # Option negotiation: refuse everything
+            cmd = seq[0]
+            self._iac_seq = None
+            if cmd == DO:
+                self.replies.extend(bytes([IAC, WONT, c]))
+            elif cmd == WILL:
+                self.replies.extend(bytes([IAC, DONT, c]))
+
+    def take_replies(self) -> bytes:
+        """Get (and clear) any pending negotiation responses
+        """
+        r = bytes(self.replies)
+        self.replies.clear()
+        return r
 
-class ReaderProtocol(asyncio.streams.StreamReaderProtocol):
-    def __init__(self, stream_reader, client_connected_cb=None, loop=None):
-        super().__init__(stream_reader, client_connected_cb, loop)
-        self.read_ready_event = asyncio.Event()
+class TelnetProtocol(asyncio.Protocol):
+    """An :class:`asyncio.Protocol` that delivers complete protocol blocks
+
+    Received data is processed by a :class:`TelnetStreamParser` and each
+    block is placed on the :attr:`block_queue`. An empty :class:`bytes` object
+    is placed on the queue when the connection is lost.
+    """
+    block_queue: asyncio.Queue
+    def __init__(self):
+        self.parser = TelnetStreamParser()
+        self.block_queue = asyncio.Queue()
+        self.transport = None
+        self.closed = asyncio.Event()
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+    def connection_made(self, transport):
+        self.transport = transport
     def data_received(self, data):
-        super().data_received(data)
-        self.read_ready_event.set()
-
-async def open_connection(host=None, port=None, *,
-                          loop=None, limit=_DEFAULT_LIMIT, **kwds):
-    if loop is None:
-        loop = asyncio.get_event_loop()
-    reader = asyncio.streams.StreamReader(limit=limit, loop=loop)
-    protocol = ReaderProtocol(reader, loop=loop)
-    transport, _ = await loop.create_connection(
-        lambda: protocol, host, port, **kwds)
-    writer = asyncio.streams.StreamWriter(transport, protocol, reader, loop)
-    return reader, writer
-
-class FakeSocket(object):
-    '''Fake socket operations to avoid implementing Telnet.process_rawq
-    '''
-    def __init__(self, tn):
-        self.telnet = tn
-        self.running = False
-        self.tx_queue = asyncio.Queue()
-
-    async def run(self):
-        self.running = True
-        while self.running:
-            data = await self.tx_queue.get()
-            if data is None:
-                break
-            self.tx_queue.task_done()
-            self.telnet.writer.write(data)
-            await self.telnet.writer.drain()
-    def close(self):
-        self.running = False
-        self.tx_queue.put_nowait(None)
-    def sendall(self, data):
-        self.tx_queue.put_nowait(data)
-
-class _Telnet(telnetlib.Telnet):
+        for block in self.parser.feed(data):
+            self.block_queue.put_nowait(block)
+        replies = self.parser.take_replies()
+        if len(replies):
+            self.transport.write(replies)
+    def connection_lost(self, exc):
+        self.transport = None
+        self._can_write.set()
+        self.block_queue.put_nowait(b'')
+        self.closed.set()
+    def pause_writing(self):
+        self._can_write.clear()
+    def resume_writing(self):
+        self._can_write.set()
+    async def drain(self):
+        await self._can_write.wait()
+
+class _Telnet(object):
     def __init__(self, host=None, port=0, timeout=0, loop=None):
         self.loop = loop
-        self.reader = None
-        self.writer = None
-        super().__init__(timeout=timeout)
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport = None
+        self.protocol = None
 
     async def open(self, host, port=0, timeout=0, loop=None):
         if not loop and not self.loop:
             loop = self.loop = asyncio.get_event_loop()
-        self.eof = 0
+        elif not loop:
+            loop = self.loop
         if not port:
-            port = telnetlib.TELNET_PORT
+            port = TELNET_PORT
         self.host = host
         self.port = port
         self.timeout = timeout
-        self.sock = FakeSocket(self)
-        self.sock_fut = asyncio.ensure_future(self.sock.run())
-        try:
-            self.reader, self.writer = await open_connection(host, port, loop=loop)
-        except:
-            self.sock.close()
-            await self.sock_fut
-            self.sock = None
-            raise
+        self.transport, self.protocol = await loop.create_connection(
+            TelnetProtocol, host, port,
+        )
 
     def close(self):
-        super().close()
-        if self.writer:
-            self.writer.close()
-        if self.reader:
-            self.reader._transport._protocol.read_ready_event.set()
-        self.reader = None
-        self.writer = None
+        if self.transport is not None:
+            self.transport.close()
+        elif self.protocol is not None:
+            self.protocol.block_queue.put_nowait(b'')
+        self.transport = None
 
     async def close_async(self):
         logger.debug(f'Telnet.close_async...')
-        if self.sock:
-            logger.debug('closing sock')
-            self.sock.close()
-            await asyncio.wait([self.sock_fut])
-            logger.debug('sock closed')
-        self.sock = None
+        protocol = self.protocol
         self.close()
+        if protocol is not None:
+            await protocol.closed.wait()
         logger.info('Telnet closed')
 
     async def write(self, bfr):
-        if telnetlib.IAC in bfr:
-            bfr = bfr.replace(telnetlib.IAC, telnetlib.IAC+telnetlib.IAC)
-        self.msg("send %r", bfr)
-        self.writer.write(bfr)
-        await self.writer.drain()
-
-    async def wait_for_data(self):
-        await self.reader._transport._protocol.read_ready_event.wait()
-
-    async def read_until(self, match, timeout=None):
-        """Read until a given string is encountered or until timeout.
-
-        When no match is found, return whatever is available instead,
-        possibly the empty string.  Raise EOFError if the connection
-        is closed and no cooked data is available.
+        if IAC_BYTE in bfr:
+            bfr = bfr.replace(IAC_BYTE, IAC_BYTE+IAC_BYTE)
+        if self.transport is None:
+            raise ConnectionResetError('Telnet connection is closed')
+        self.transport.write(bfr)
+        await self.protocol.drain()
 
-        """
-        n = len(match)
-        self.process_rawq()
-        i = self.cookedq.find(match)
-        if i >= 0:
-            i = i+n
-            buf = self.cookedq[:i]
-            self.cookedq = self.cookedq[i:]
-            return buf
-        if timeout is not None:
-            deadline = telnetlib._time() + timeout
-
-        while not self.eof:
-            if len(self.reader._buffer):
-                i = max(0, len(self.cookedq)-n)
-                await self.fill_rawq()
-                self.process_rawq()
-                i = self.cookedq.find(match, i)
-                if i >= 0:
-                    i = i+n
-                    buf = self.cookedq[:i]
-                    self.cookedq = self.cookedq[i:]
-                    return buf
-            if timeout is not None:
-                timeout = deadline - telnetlib._time()
-                if timeout < 0:
-                    break
-        return self.read_very_lazy()
-
-    async def read_all(self):
-        """Read all data until EOF; block until connection closed."""
-        self.process_rawq()
-        while not self.eof:
-            await self.fill_rawq()
-            self.process_rawq()
-        buf = self.cookedq
-        self.cookedq = b''
-        return buf
-
-    async def read_some(self):
-        """Read at least one byte of cooked data unless EOF is hit.
-
-        Return b'' if EOF is hit.  Block if no data is immediately
-        available.
-
-        """
-        self.process_rawq()
-        while not self.cookedq and not self.eof:
-            await self.fill_rawq()
-            self.process_rawq()
-        buf = self.cookedq
-        self.cookedq = b''
-        return buf
-
-    async def read_very_eager(self):
-        """Read everything that's possible without blocking in I/O (eager).
-
-        Raise EOFError if connection closed and no cooked data
-        available.  Return b'' if no cooked data available otherwise.
-        Don't block unless in the midst of an IAC sequence.
-
-        """
-        self.process_rawq()
-        while not self.eof and self.sock_avail():
-            await self.fill_rawq()
-            self.process_rawq()
-        return self.read_very_lazy()
-
-    async def read_eager(self):
-        """Read readily available data.
-
-        Raise EOFError if connection closed and no cooked data
-        available.  Return b'' if no cooked data available otherwise.
-        Don't block unless in the midst of an IAC sequence.
+    async def read_block(self) -> bytes:
+        """Wait for the next complete protocol block
 
+        Returns an empty :class:`bytes` object if the connection has been closed
         """
-        self.process_rawq()
-        while not self.cookedq and not self.eof and self.sock_avail():
-            await self.fill_rawq()
-            self.process_rawq()
-        return self.read_very_lazy()
-
-    async def fill_rawq(self):
-        """Fill raw queue from exactly one recv() system call.
-
-        Block if no data is immediately available.  Set self.eof when
-        connection is closed.
-
-        """
-        if self.irawq >= len(self.rawq):
-            self.rawq = b''
-            self.irawq = 0
-        # The buffer size should be fairly small so as to avoid quadratic
-        # behavior in process_rawq() above
-        buf = await self.reader.read(50)
-        self.msg("recv %r", buf)
-        self.eof = (not buf)
-        self.rawq = self.rawq + buf
-
-    def sock_avail(self):
-        """Test whether data is available on the socket."""
-        r = len(self.reader._buffer) > 0
-        if not r:
-            self.reader._transport._protocol.read_ready_event.clear()
-        return r
+        if self.protocol is None:
+            return b''
+        return await self.protocol.block_queue.get()
 
 async def Telnet(host=None, port=0, timeout=0, loop=None):
     '''Wrap the init in a coroutine so ``open`` can be awaited
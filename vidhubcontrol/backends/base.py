@@ -1,11 +1,32 @@
 from loguru import logger
 import asyncio
-from typing import Optional, List, Dict, ClassVar
+import random
+from typing import Optional, List, Dict, ClassVar, Iterable, Tuple, Any, Sequence
 
 from pydispatch import Dispatcher, Property
 from pydispatch.properties import ListProperty, DictProperty
 
 from vidhubcontrol.common import ConnectionState, ConnectionManager
+from vidhubcontrol import metrics
+
+RECONNECTS = metrics.counter(
+    'vidhubcontrol_device_reconnects_total',
+    'Successful reconnects made by device connection supervisors', ['device'],
+)
+
+def get_changed_indices(value: Sequence, keys: Optional[Iterable] = None) -> Sequence[int]:
+    """Get the indices of a :class:`~pydispatch.properties.ListProperty`
+    change from the ``keys`` argument given to its callbacks
+
+    If *keys* is ``None`` or contains a :class:`slice`, the entire list is
+    assumed to have changed.
+    """
+    if keys is None:
+        return range(len(value))
+    for key in keys:
+        if not isinstance(key, int):
+            return range(len(value))
+    return keys
 
 class BackendBase(Dispatcher):
     """Base class for communicating with devices
@@ -42,9 +63,64 @@ class BackendBase(Dispatcher):
     connection_manager: ConnectionManager
     """Manager for the device's :class:`~.common.ConnectionState`"""
 
+    connect_timeout: float
+    """Time (in seconds) to wait for :meth:`connect` to complete before
+    treating the attempt as a failure. Defaults to ``2``
+    """
+
+    auto_reconnect: bool
+    """If ``True``, a supervisor task started by :meth:`connect` will reconnect
+    whenever the connection is lost (until :meth:`disconnect` is called).
+    The supervisor is woken by the state change as well as directly when
+    an error closes the connection. Attempts are spaced using exponential
+    backoff with random jitter.
+    Defaults to ``False``
+    """
+
+    reconnect_delay: float
+    """Initial time (in seconds) to wait before a reconnect attempt. This is
+    doubled after each failed attempt. Defaults to ``1``
+    """
+
+    reconnect_max_delay: float
+    """Maximum time (in seconds) between reconnect attempts. Defaults to ``30``
+    """
+
+    reconnect_jitter: float
+    """Fraction of each reconnect delay that is randomized so that many
+    devices do not retry in lockstep. Defaults to ``.5``
+    """
+
+    write_policy: str
+    """How writes are handled while the :attr:`auto_reconnect` supervisor
+    is waiting to reconnect. If ``'queue'`` (the default), writes wait for the
+    connection for up to :attr:`write_queue_timeout` seconds. If ``'reject'``,
+    they fail immediately
+    """
+
+    write_queue_timeout: Optional[float]
+    """Maximum time (in seconds) a queued write waits for the connection.
+    If ``None``, it waits indefinitely. Defaults to ``30``
+    """
+
+    reconnect_count: int
+    """The number of successful reconnects made by the supervisor"""
+
     prelude_parsed: bool = Property(False)
     def __init__(self, **kwargs):
         self.connection_manager = ConnectionManager()
+        self.connect_timeout = kwargs.get('connect_timeout', 2)
+        self.auto_reconnect = kwargs.get('auto_reconnect', False)
+        self.reconnect_delay = kwargs.get('reconnect_delay', 1)
+        self.reconnect_max_delay = kwargs.get('reconnect_max_delay', 30)
+        self.reconnect_jitter = kwargs.get('reconnect_jitter', .5)
+        self.write_policy = kwargs.get('write_policy', 'queue')
+        if self.write_policy not in ('queue', 'reject'):
+            raise ValueError('Invalid write_policy: {!r}'.format(self.write_policy))
+        self.write_queue_timeout = kwargs.get('write_queue_timeout', 30)
+        self.reconnect_count = 0
+        self._supervisor = None
+        self._connection_lost = None
         self.device_name = kwargs.get('device_name')
         self.client = None
         self.event_loop = kwargs.get('event_loop', asyncio.get_event_loop())
@@ -57,12 +133,23 @@ class BackendBase(Dispatcher):
         :attr:`connection_manager`
         """
         return self.connection_manager.state
+    @property
+    def metrics_label(self) -> str:
+        """Value used for the ``device`` label in :mod:`vidhubcontrol.metrics`
+        """
+        if self.device_id is not None:
+            return self.device_id
+        return str(getattr(self, 'hostaddr', None) or id(self))
     @classmethod
     async def create_async(cls, **kwargs):
         obj = cls(**kwargs)
         await obj.connect()
         return obj
     async def connect(self):
+        if self.auto_reconnect and self._supervisor is None:
+            self._supervisor = asyncio.ensure_future(self._supervise_connection())
+        return await self._connect()
+    async def _connect(self):
         manager = self.connection_manager
         async with manager:
             if manager.state & ConnectionState.waiting != 0:
@@ -73,7 +160,7 @@ class BackendBase(Dispatcher):
             await manager.set_state('connecting')
         await asyncio.sleep(0)
         try:
-            r = await asyncio.wait_for(self.do_connect(), timeout=2)
+            r = await asyncio.wait_for(self.do_connect(), timeout=self.connect_timeout)
         except asyncio.TimeoutError as exc:
             r = False
         async with manager:
@@ -87,6 +174,9 @@ class BackendBase(Dispatcher):
                 await manager.set_state('connected')
         return r
     async def disconnect(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
         manager = self.connection_manager
         async with manager:
             if ConnectionState.not_connected in manager.state:
@@ -105,6 +195,72 @@ class BackendBase(Dispatcher):
         async with manager:
             self.client = None
             await manager.set_state('not_connected')
+    def get_reconnect_delay(self, attempt: int) -> float:
+        """Calculate the time to wait before a reconnect attempt
+
+        Arguments:
+            attempt: The number of failed attempts since the connection was lost
+
+        """
+        delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** attempt)
+        return delay * (1 - self.reconnect_jitter * random.random())
+    async def _wait_for_connection_lost(self):
+        manager = self.connection_manager
+        async def wait_for_state():
+            async with manager:
+                await manager.wait_for('not_connected')
+        tasks = [
+            asyncio.ensure_future(wait_for_state()),
+            asyncio.ensure_future(self._connection_lost.wait()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in tasks:
+                t.cancel()
+    async def _supervise_connection(self):
+        attempt = 0
+        self._connection_lost = asyncio.Event()
+        while True:
+            if ConnectionState.not_connected not in self.connection_state:
+                await self._wait_for_connection_lost()
+            self._connection_lost.clear()
+            await asyncio.sleep(self.get_reconnect_delay(attempt))
+            logger.debug('{!r}: reconnect attempt {}'.format(self, attempt + 1))
+            # Shielded so a disconnect() during an attempt leaves it to finish
+            # instead of stranding the manager in the "connecting" state
+            await asyncio.shield(self._connect())
+            if self.connection_state.is_connected:
+                attempt = 0
+                self.reconnect_count += 1
+                RECONNECTS.inc(device=self.metrics_label)
+            else:
+                attempt += 1
+    async def wait_for_reconnect(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the :attr:`auto_reconnect` supervisor to reestablish the
+        connection
+
+        Arguments:
+            timeout: Time (in seconds) to wait. If not given,
+                :attr:`write_queue_timeout` is used
+
+        Returns:
+            ``True`` if connected. ``False`` if the *timeout* was reached or
+            no reconnect is in progress
+
+        """
+        if self.connection_state.is_connected:
+            return True
+        if self._supervisor is None:
+            return False
+        if timeout is None:
+            timeout = self.write_queue_timeout
+        async with self.connection_manager as manager:
+            try:
+                await manager.wait_for('connected', timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
     async def _catch_exception(self, e: Exception, is_error: Optional[bool] = False):
         if not is_error:
             logger.exception(e)
@@ -122,6 +278,8 @@ class BackendBase(Dispatcher):
             self.client = None
             async with self.connection_manager as manager:
                 await manager.set_state('not_connected')
+            if self._connection_lost is not None:
+                self._connection_lost.set()
     async def do_connect(self):
         raise NotImplementedError()
     async def do_disconnect(self):
@@ -170,6 +328,15 @@ class VidhubBackendBase(BackendBase):
         presets: The currently available (stored) ``list`` of :class:`Preset`
             instances
             :class:`pydispatch.properties.ListProperty`
+        coalesce_window: Time (in seconds) that changes to the control
+            properties are collected before being written to the device.
+            Changes made to the same index within the window are merged
+            (the last value wins). If zero (the default), changes are written
+            on the next iteration of the event loop
+        write_counters: A ``dict`` of counters for the write coalescing:
+            ``'writes'`` (changes queued), ``'merged'`` (changes replaced
+            by a later value before being written) and ``'flushes'``
+            (commands written to the device)
     """
     crosspoints: List[int] = ListProperty()
     output_labels: List[str] = ListProperty()
@@ -186,9 +353,16 @@ class VidhubBackendBase(BackendBase):
         'input_labels':'input_label_control',
         'output_labels':'output_label_control',
     }
+    coalesce_window: float
+    write_counters: Dict[str, int]
     _events_ = ['on_preset_added', 'on_preset_stored', 'on_preset_active']
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.coalesce_window = kwargs.get('coalesce_window', 0)
+        self.write_counters = {'writes':0, 'merged':0, 'flushes':0}
+        self._pending_writes = {}
+        self._pending_write_futures = {}
+        self._flush_handles = {}
         self.bind(
             num_outputs=self.on_num_outputs,
             num_inputs=self.on_num_inputs,
@@ -199,6 +373,13 @@ class VidhubBackendBase(BackendBase):
             input_label_control=self.on_prop_control,
             crosspoint_control=self.on_prop_control,
         )
+        self._preset_outputs = {}
+        self._preset_index = {}
+        self._preset_mismatches = {}
+        self.bind(
+            crosspoints=self.on_crosspoints_presets,
+            prelude_parsed=self.on_prelude_parsed_presets,
+        )
         presets = kwargs.get('presets', [])
         for pst_data in presets:
             pst_data['backend'] = self
@@ -208,6 +389,37 @@ class VidhubBackendBase(BackendBase):
                 on_preset_stored=self.on_preset_stored,
                 active=self.on_preset_active,
             )
+    def update_list_property(self, name: str, changes: Iterable[Tuple[int, Any]]) -> List[int]:
+        """Apply multiple changes to one of the list properties and emit them
+        as a single event
+
+        Callbacks receive the indices given in the ``keys`` keyword argument.
+
+        Arguments:
+            name: The name of the :class:`~pydispatch.properties.ListProperty`
+            changes: An iterable of ``(index, value)`` tuples
+
+        Returns:
+            A list of the indices that were set
+        """
+        changes = list(changes)
+        if not len(changes):
+            return []
+        value = getattr(self, name)
+        prop = getattr(self.__class__, name)
+        keys = list(dict.fromkeys(i for i, item in changes))
+        elock = self.emission_lock(name)
+        if elock.held:
+            # Only the last emission is kept while another caller holds the
+            # lock, so report the whole list as changed
+            emit_keys = None
+        else:
+            emit_keys = keys
+        with elock:
+            for i, item in changes:
+                value[i] = item
+            self.emit(name, self, value, old=None, property=prop, keys=emit_keys)
+        return keys
     async def set_crosspoint(self, out_idx, in_idx):
         """Set a single crosspoint on the switcher
 
@@ -337,6 +549,63 @@ class VidhubBackendBase(BackendBase):
         self.emit('on_preset_stored', *args, **kwargs)
     def on_preset_active(self, instance, value, **kwargs):
         self.emit('on_preset_active', backend=self, preset=instance, value=value)
+    def update_preset_index(self, preset: 'Preset'):
+        """Index the outputs stored in a :class:`Preset` and update its
+        :attr:`~Preset.active` state
+
+        The backend keeps a mapping of each output to the presets that store it
+        along with the set of outputs that do not currently match for each
+        preset. This allows routing changes to only check the presets
+        affected by them.
+
+        This is called by the preset whenever its crosspoints change.
+        """
+        outputs = set(preset.crosspoints.keys())
+        prev_outputs = self._preset_outputs.get(preset, set())
+        for out_idx in prev_outputs - outputs:
+            presets = self._preset_index[out_idx]
+            presets.discard(preset)
+            if not len(presets):
+                del self._preset_index[out_idx]
+        for out_idx in outputs - prev_outputs:
+            self._preset_index.setdefault(out_idx, set()).add(preset)
+        self._preset_outputs[preset] = outputs
+        self._check_preset_mismatches(preset)
+    def _check_preset_mismatches(self, preset: 'Preset'):
+        if not self.prelude_parsed:
+            self._preset_mismatches.pop(preset, None)
+            return
+        xpts = self.crosspoints
+        mismatches = set()
+        for out_idx, in_idx in preset.crosspoints.items():
+            if out_idx >= len(xpts) or xpts[out_idx] != in_idx:
+                mismatches.add(out_idx)
+        self._preset_mismatches[preset] = mismatches
+        preset.active = len(preset.crosspoints) > 0 and not len(mismatches)
+    def on_crosspoints_presets(self, instance, value, **kwargs):
+        if not self.prelude_parsed or not len(self._preset_index):
+            return
+        changed = set()
+        for out_idx in get_changed_indices(value, kwargs.get('keys')):
+            presets = self._preset_index.get(out_idx)
+            if presets is None:
+                continue
+            in_idx = value[out_idx]
+            for preset in presets:
+                mismatches = self._preset_mismatches.get(preset)
+                if mismatches is None:
+                    self._check_preset_mismatches(preset)
+                    continue
+                if preset.crosspoints[out_idx] == in_idx:
+                    mismatches.discard(out_idx)
+                else:
+                    mismatches.add(out_idx)
+                changed.add(preset)
+        for preset in changed:
+            preset.active = not len(self._preset_mismatches[preset])
+    def on_prelude_parsed_presets(self, instance, value, **kwargs):
+        for preset in self._preset_outputs.keys():
+            self._check_preset_mismatches(preset)
     def on_num_outputs(self, instance, value, **kwargs):
         if value == len(self.output_labels):
             return
@@ -353,9 +622,14 @@ class VidhubBackendBase(BackendBase):
         prop = kwargs.get('property')
         if prop.name not in self.feedback_prop_map:
             return
-        elock = self.emission_lock(prop.name)
         control_prop = self.feedback_prop_map[prop.name]
-        setattr(self, control_prop, value[:])
+        keys = kwargs.get('keys')
+        control_value = getattr(self, control_prop)
+        if keys is None or len(control_value) != len(value):
+            setattr(self, control_prop, value[:])
+            return
+        keys = get_changed_indices(value, keys)
+        self.update_list_property(control_prop, ((i, value[i]) for i in keys))
     def on_prop_control(self, instance, value, **kwargs):
         if not self.prelude_parsed or not self.connection_state.is_connected:
             return
@@ -372,12 +646,92 @@ class VidhubBackendBase(BackendBase):
         aio_lock = elock.aio_locks.get(id(self.event_loop))
         if aio_lock is not None and aio_lock.locked():
             return
-        if value == getattr(self, feedback_prop):
+        feedback = getattr(self, feedback_prop)
+        if value == feedback:
+            return
+        # Only write the keys in this event that differ from the device.
+        # Others may hold a value the device has rejected
+        args = [
+            (key, value[key]) for key in keys
+            if key >= len(feedback) or value[key] != feedback[key]
+        ]
+        if not len(args):
             return
-        coro_name = '_'.join(['set', feedback_prop])
-        coro = getattr(self, coro_name)
-        args = [(key, value[key]) for key in keys]
-        tx_fut = asyncio.run_coroutine_threadsafe(coro(*args), loop=self.event_loop)
+        self.event_loop.call_soon_threadsafe(self.queue_writes, feedback_prop, args)
+    def queue_writes(self, name: str, changes: Iterable[Tuple[int, Any]]) -> asyncio.Future:
+        """Queue changes to be written to the device after the
+        :attr:`coalesce_window`
+
+        All changes queued for the same property within the window are
+        merged and sent using a single call to the property's setter method
+        (:meth:`set_crosspoints`, :meth:`set_output_labels` or
+        :meth:`set_input_labels`).
+
+        This method is not thread-safe and must be called from within the
+        :attr:`~BackendBase.event_loop`.
+
+        Arguments:
+            name: The property name (``'crosspoints'``, ``'output_labels'``
+                or ``'input_labels'``)
+            changes: An iterable of ``(index, value)`` tuples
+
+        Returns:
+            An :class:`asyncio.Future` with the result of the setter method
+            once the changes have been written
+        """
+        loop = self.event_loop
+        pending = self._pending_writes.setdefault(name, {})
+        counters = self.write_counters
+        for key, value in changes:
+            counters['writes'] += 1
+            if key in pending:
+                counters['merged'] += 1
+                del pending[key]
+            pending[key] = value
+        fut = self._pending_write_futures.get(name)
+        if fut is None:
+            fut = self._pending_write_futures[name] = loop.create_future()
+        if name not in self._flush_handles:
+            if self.coalesce_window > 0:
+                h = loop.call_later(self.coalesce_window, self._flush_writes, name)
+            else:
+                h = loop.call_soon(self._flush_writes, name)
+            self._flush_handles[name] = h
+        return fut
+    def _flush_writes(self, name: str):
+        del self._flush_handles[name]
+        changes = self._pending_writes.pop(name, {})
+        fut = self._pending_write_futures.pop(name)
+        if not len(changes):
+            fut.set_result(True)
+            return
+        self.write_counters['flushes'] += 1
+        asyncio.ensure_future(self._do_flush_writes(name, changes, fut))
+    async def _do_flush_writes(self, name: str, changes: Dict[int, Any], fut: asyncio.Future):
+        coro = getattr(self, '_'.join(['set', name]))
+        try:
+            r = await coro(*changes.items())
+        except Exception as e:
+            logger.exception(e)
+            r = False
+        if r is False:
+            self._revert_control_values(name, changes)
+        if not fut.done():
+            fut.set_result(r)
+    def _revert_control_values(self, name: str, changes: Dict[int, Any]):
+        # Restore the control property to the device state for any values
+        # that were rejected (unless they have been changed again since)
+        control_prop = self.feedback_prop_map.get(name)
+        if control_prop is None:
+            return
+        feedback = getattr(self, name)
+        control_value = getattr(self, control_prop)
+        if len(control_value) != len(feedback):
+            return
+        self.update_list_property(control_prop, (
+            (key, feedback[key]) for key, value in changes.items()
+            if control_value[key] == value and value != feedback[key]
+        ))
 
 class SmartViewBackendBase(BackendBase):
     """Base class for SmartView devices
@@ -627,18 +981,14 @@ class Preset(Dispatcher):
             name = 'Preset {}'.format(self.index + 1)
         self.name = name
         self.crosspoints = kwargs.get('crosspoints', {})
-        if self.backend.connection_state.is_connected and self.backend.prelude_parsed:
-            self.check_active()
-        else:
-            self.backend.bind(prelude_parsed=self.on_backend_ready)
-        self.backend.bind(crosspoints=self.on_backend_crosspoints)
+        self.backend.update_preset_index(self)
         self.bind(crosspoints=self.on_preset_crosspoints)
     async def store(self, outputs_to_store=None, clear_current=True):
         if outputs_to_store is None:
             outputs_to_store = range(self.backend.num_outputs)
-        if clear_current:
-            self.crosspoints = {}
         async with self.emission_lock('crosspoints'):
+            if clear_current:
+                self.crosspoints = {}
             for out_idx in outputs_to_store:
                 self.crosspoints[out_idx] = self.backend.crosspoints[out_idx]
             self.active = True
@@ -649,25 +999,6 @@ class Preset(Dispatcher):
         args = [(i, v) for i, v in self.crosspoints.items()]
         await self.backend.set_crosspoints(*args)
     def check_active(self):
-        if not len(self.crosspoints):
-            self.active = False
-            return
-        for out_idx, in_idx in self.crosspoints.items():
-            in_idx = self.crosspoints[out_idx]
-            if self.backend.crosspoints[out_idx] != in_idx:
-                self.active = False
-                return
-        self.active = True
-    def on_backend_ready(self, instance, value, **kwargs):
-        if not value:
-            return
-        self.backend.unbind(self.on_backend_ready)
-        self.check_active()
-    def on_backend_crosspoints(self, instance, value, **kwargs):
-        if not self.backend.prelude_parsed:
-            return
-        self.check_active()
+        self.backend.update_preset_index(self)
     def on_preset_crosspoints(self, instance, value, **kwargs):
-        if not len(self.crosspoints) or not self.backend.prelude_parsed:
-            return
-        self.check_active()
+        self.backend.update_preset_index(self)
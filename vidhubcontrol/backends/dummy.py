@@ -20,21 +20,18 @@ class DummyBackend(VidhubBackendBase):
     async def set_crosspoint(self, out_idx, in_idx):
         return await self.set_crosspoints((out_idx, in_idx))
     async def set_crosspoints(self, *args):
-        async with self.emission_lock('crosspoints'):
-            for out_idx, in_idx in args:
-                self.crosspoints[out_idx] = in_idx
+        self.update_list_property('crosspoints', args)
+        return True
     async def set_output_label(self, out_idx, lbl):
         return await self.set_output_labels((out_idx, lbl))
     async def set_output_labels(self, *args):
-        async with self.emission_lock('output_labels'):
-            for out_idx, lbl in args:
-                self.output_labels[out_idx] = lbl
+        self.update_list_property('output_labels', args)
+        return True
     async def set_input_label(self, in_idx, lbl):
         return await self.set_input_labels((in_idx, lbl))
     async def set_input_labels(self, *args):
-        async with self.emission_lock('input_labels'):
-            for in_idx, lbl in args:
-                self.input_labels[in_idx] = lbl
+        self.update_list_property('input_labels', args)
+        return True
 
 class SmartViewDummyBackend(SmartViewBackendBase):
     def __init__(self, **kwargs):
@@ -2,11 +2,14 @@ import asyncio
 from loguru import logger
 import string
 import errno
-from typing import Optional
+import time
+from collections import deque
+from typing import Optional, List, Dict, Deque
 
 from pydispatch import Property
 
-from vidhubcontrol import aiotelnetlib
+from vidhubcontrol import aiotelnetlib, metrics
+from vidhubcontrol.aiotelnetlib import split_section_values
 from .base import (
     VidhubBackendBase,
     SmartViewBackendBase,
@@ -14,7 +17,39 @@ from .base import (
     MONITOR_PROPERTY_MAP,
 )
 from vidhubcontrol.common import ConnectionState
+from vidhubcontrol.utils import current_task
 
+CONNECTION_ERRNOS = frozenset([
+    errno.EHOSTUNREACH, errno.ECONNREFUSED, errno.ECONNRESET,
+    errno.ECONNABORTED, errno.ETIMEDOUT, errno.ENETUNREACH, errno.EPIPE,
+])
+"""OSError numbers that indicate the connection to the device was lost or
+could not be established
+"""
+
+COMMAND_LATENCY = metrics.histogram(
+    'vidhubcontrol_command_latency_seconds',
+    'Time from sending a command to receiving its ACK or NAK', ['device'],
+)
+COMMAND_TIMEOUTS = metrics.counter(
+    'vidhubcontrol_command_timeouts_total',
+    'Commands that received no response', ['device'],
+)
+PARSE_TIME = metrics.histogram(
+    'vidhubcontrol_parse_seconds', 'Time spent parsing each protocol block',
+    ['section'],
+)
+ROUTES_APPLIED = metrics.counter(
+    'vidhubcontrol_routes_applied_total',
+    'Crosspoint changes acknowledged by devices', ['device'],
+)
+
+def is_connection_error(e: Exception) -> bool:
+    """Check whether the given exception means the connection was lost
+    """
+    if isinstance(e, EOFError):
+        return True
+    return isinstance(e, OSError) and e.errno in CONNECTION_ERRNOS
 
 class TelnetBackendBase(object):
     """Mix-in class for backends implementing telnet
@@ -23,52 +58,113 @@ class TelnetBackendBase(object):
         hostaddr: IPv4 address of the device
         hostport: Port address of the device
         read_enabled: Internal flag to keep the :meth:`read_loop` running
-        rx_bfr: Data received from the device to be parsed
+        section_handlers: Mapping of section headers to the coroutine
+            functions used to parse them. This is built from
+            :attr:`SECTION_HANDLERS` for each instance
+        command_timeout: Default time (in seconds) to wait for the device
+            to respond to a command sent by :meth:`send_command`
+        pending_commands: A :class:`~collections.deque` of futures for commands
+            that have been sent and are waiting for a response. Since the
+            device responds in the order commands are received, each ACK or
+            NAK is matched to the oldest one. If a command times out, the
+            connection is reestablished since later replies can no longer
+            be matched
         client: Instance of :class:`vidhubcontrol.aiotelnetlib._Telnet`
 
     """
+    SECTION_HANDLERS = {
+        'ACK':'parse_ack_or_nak',
+        'NAK':'parse_ack_or_nak',
+        'PROTOCOL PREAMBLE:':'parse_protocol_preamble',
+    }
     hostaddr: str = Property()
     hostport: int = Property()
     read_enabled: bool
-    rx_bfr: bytes
+    section_handlers: Dict[str, 'typing.Callable']
+    command_timeout: float
+    pending_commands: Deque[asyncio.Future]
     client: 'vidhubcontrol.aiotelnetlib._Telnet'
     def _telnet_init(self, **kwargs):
         self.read_enabled = False
-        self.current_section = None
-        self.ack_or_nak = None
         self.read_coro = None
+        self.command_timeout = kwargs.get('command_timeout', 5)
+        self.pending_commands = deque()
+        self._resync_task = None
         self.hostaddr = kwargs.get('hostaddr')
         self.hostport = kwargs.get('hostport', self.DEFAULT_PORT)
-        self.rx_bfr = b''
+        self.section_handlers = {
+            key:getattr(self, attr) for key, attr in self.SECTION_HANDLERS.items()
+        }
     async def read_loop(self):
         while self.read_enabled:
             try:
-                await self.client.wait_for_data()
+                block = await self.client.read_block()
             except Exception as e:
                 logger.error(e)
                 await self._catch_exception(e)
                 return
             if not self.read_enabled:
                 break
-            try:
-                rx_bfr = await self.client.read_very_eager()
-            except Exception as e:
-                logger.error(e)
-                await self._catch_exception(e)
+            if not len(block):
+                await self._catch_exception(EOFError('Telnet connection closed'))
                 return
-            if len(rx_bfr):
-                self.rx_bfr += rx_bfr
-                logger.debug(self.rx_bfr.decode('UTF-8'))
-                await self.parse_rx_bfr()
-                self.rx_bfr = b''
-    async def send_to_client(self, data):
-        if ConnectionState.failure in self.connection_state:
+            block = block.decode('UTF-8')
+            logger.debug(block)
+            await self.parse_block(block)
+            self.response_ready.set()
+    async def parse_block(self, block: str):
+        """Parse a single protocol block
+
+        The first line of the block is used to look up the handler in
+        :attr:`section_handlers`. The handler is called with the section
+        header and the remaining lines of the block.
+
+        Blocks are framed by the :attr:`client` (see
+        :class:`~vidhubcontrol.aiotelnetlib.TelnetStreamParser`) and
+        passed here by :meth:`read_loop`.
+        """
+        lines = [line for line in block.splitlines() if len(line)]
+        if not len(lines):
             return
-        if not self.connection_state.is_connected:
-            c = await self.connect()
-        c = self.client
-        if not c:
+        section = lines[0]
+        handler = self.section_handlers.get(section)
+        if handler is None:
+            logger.debug(f'Unhandled section: "{section}"')
             return
+        if not metrics.REGISTRY.enabled:
+            await handler(section, lines[1:])
+            return
+        start_ts = time.perf_counter()
+        await handler(section, lines[1:])
+        PARSE_TIME.observe(time.perf_counter() - start_ts, section=section.rstrip(':'))
+    async def parse_ack_or_nak(self, section: str, lines: List[str]):
+        logger.debug(f'ack_or_nak: {section}')
+        if not len(self.pending_commands):
+            logger.warning(f'Received unexpected {section}')
+            return
+        fut = self.pending_commands.popleft()
+        if not fut.done():
+            fut.set_result(section == 'ACK')
+    async def parse_protocol_preamble(self, section: str, lines: List[str]):
+        values = split_section_values(lines)
+        if 'Version' in values:
+            self.device_version = values['Version']
+    async def parse_ignored_section(self, section: str, lines: List[str]):
+        pass
+    async def _get_client(self) -> Optional['vidhubcontrol.aiotelnetlib._Telnet']:
+        if self.auto_reconnect:
+            if not self.connection_state.is_connected:
+                if self.write_policy == 'reject':
+                    return None
+                if not await self.wait_for_reconnect():
+                    return None
+            return self.client
+        if ConnectionState.failure in self.connection_state:
+            return None
+        if not self.connection_state.is_connected:
+            await self.connect()
+        return self.client
+    async def _write_to_client(self, c, data: bytes) -> bool:
         s = '\n'.join(['---> {}'.format(line) for line in data.decode('UTF-8').splitlines()])
         logger.debug(s)
         try:
@@ -76,10 +172,81 @@ class TelnetBackendBase(object):
         except Exception as e:
             logger.error(e)
             await self._catch_exception(e)
+            return False
+        return True
+    async def send_to_client(self, data):
+        c = await self._get_client()
+        if not c:
+            return
+        await self._write_to_client(c, data)
+    async def send_command(self, data: bytes, timeout: Optional[float] = None) -> bool:
+        """Send a command to the device and wait for its response
+
+        Multiple commands may be in flight at once. Each is added to
+        :attr:`pending_commands` and resolved by the ACK or NAK the device
+        sends in reply.
+
+        Arguments:
+            data: The command block to send
+            timeout: Time (in seconds) to wait for a response. If not given,
+                :attr:`command_timeout` is used
+
+        Returns:
+            ``True`` if the device acknowledged the command, ``False`` if it
+            was rejected, timed out or could not be sent
+
+        """
+        if timeout is None:
+            timeout = self.command_timeout
+        c = await self._get_client()
+        if not c:
+            return False
+        fut = asyncio.get_event_loop().create_future()
+        self.pending_commands.append(fut)
+        start_ts = time.perf_counter() if metrics.REGISTRY.enabled else None
+        sent = await self._write_to_client(c, data)
+        if not sent:
+            if not fut.done():
+                fut.set_result(False)
+            return False
+        try:
+            r = await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Timed out waiting for response')
+            COMMAND_TIMEOUTS.inc(device=self.metrics_label)
+            self._handle_command_timeout()
+            return False
+        if start_ts is not None:
+            COMMAND_LATENCY.observe(time.perf_counter() - start_ts, device=self.metrics_label)
+        return r
+    def _handle_command_timeout(self):
+        # Replies are matched to commands in order, so a late (or missing)
+        # reply would be paired with the wrong command from here on.
+        # Reconnect to start over with an empty queue.
+        if self._resync_task is not None:
+            return
+        self._clear_pending_commands()
+        self._resync_task = asyncio.ensure_future(self._resync_connection())
+    async def _resync_connection(self):
+        task = self._resync_task
+        try:
+            exc = asyncio.TimeoutError('Command response timed out')
+            await self._catch_exception(exc, is_error=True)
+            # Don't reconnect if disconnect() was called in the meantime
+            if not self.auto_reconnect and self._resync_task is task:
+                await self.connect()
+        finally:
+            if self._resync_task is task:
+                self._resync_task = None
+    def _clear_pending_commands(self):
+        pending = self.pending_commands
+        while len(pending):
+            fut = pending.popleft()
+            if not fut.done():
+                fut.set_result(False)
     async def do_connect(self):
-        self.ack_or_nak_event = asyncio.Event()
         self.response_ready = asyncio.Event()
-        self.rx_bfr = b''
+        self._clear_pending_commands()
         logger.debug('connecting')
         try:
             c = self.client = await aiotelnetlib.Telnet(self.hostaddr, self.hostport)
@@ -97,115 +264,76 @@ class TelnetBackendBase(object):
     async def do_disconnect(self):
         logger.debug('disconnecting')
         self.read_enabled = False
+        if self._resync_task is not current_task():
+            self._resync_task = None
         if self.client is not None:
             await self.client.close_async()
         if self.read_coro is not None:
-            await self.read_coro
+            # The read loop may be the task that found the connection closed
+            if self.read_coro is not current_task():
+                await self.read_coro
             self.read_coro = None
         self.client = None
+        self._clear_pending_commands()
         logger.debug('disconnected')
     async def wait_for_response(self, prelude=False):
         logger.debug('wait_for_response...')
         while self.read_enabled:
             await self.response_ready.wait()
             self.response_ready.clear()
-            if prelude:
-                if self.prelude_parsed:
-                    return
-                else:
-                    await asyncio.sleep(.1)
-            if self.ack_or_nak is not None:
-                resp = self.ack_or_nak
-                self.ack_or_nak_event.clear()
-                logger.debug('ack_or_nak: {}'.format(resp))
-                self.ack_or_nak = None
-                return resp
-    async def wait_for_ack_or_nak(self):
-        logger.debug('wait_for_ack_or_nak...')
-        if ConnectionState.failure in self.connection_state:
-            return False
-        await self.ack_or_nak_event.wait()
-        resp = self.ack_or_nak
-        self.ack_or_nak = None
-        self.ack_or_nak_event.clear()
-        return resp.startswith('ACK')
+            if not prelude or self.prelude_parsed:
+                return
 
 class TelnetBackend(TelnetBackendBase, VidhubBackendBase):
     """Base class for backends implementing telnet
 
     """
     DEFAULT_PORT = 9990
-    SECTION_NAMES = [
-        'PROTOCOL PREAMBLE:',
-        'VIDEOHUB DEVICE:',
-        'INPUT LABELS:',
-        'OUTPUT LABELS:',
-        'VIDEO OUTPUT LOCKS:',
-        'VIDEO OUTPUT ROUTING:',
-        'CONFIGURATION:',
-    ]
+    SECTION_HANDLERS = {
+        **TelnetBackendBase.SECTION_HANDLERS,
+        'VIDEOHUB DEVICE:':'parse_device_section',
+        'INPUT LABELS:':'parse_labels_section',
+        'OUTPUT LABELS:':'parse_labels_section',
+        'VIDEO OUTPUT LOCKS:':'parse_ignored_section',
+        'VIDEO OUTPUT ROUTING:':'parse_routing_section',
+        'CONFIGURATION:':'parse_ignored_section',
+        'END PRELUDE:':'parse_end_prelude',
+    }
+    LABEL_SECTION_PROPS = {
+        'INPUT LABELS:':'input_labels',
+        'OUTPUT LABELS:':'output_labels',
+    }
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._telnet_init(**kwargs)
     async def _catch_exception(self, e: Exception, is_error: Optional[bool] = False):
-        if isinstance(e, OSError):
-            err = e.args[0]
-            if err in [errno.EHOSTUNREACH, errno.ECONNREFUSED]:
-                is_error = True
+        if is_connection_error(e):
+            is_error = True
         await super()._catch_exception(e, is_error)
-    async def parse_rx_bfr(self):
-        def split_value(line):
-            return line.split(':')[1].strip(' ')
-        bfr = self.rx_bfr.decode('UTF-8')
-        section_parsed = False
-        for line_idx, line in enumerate(bfr.splitlines()):
-            if 'END PRELUDE' in line:
-                self.current_section = None
-                self.rx_bfr = b''
-                self.prelude_parsed = True
-                break
-            line = line.rstrip('\n')
-            if not len(line):
-                continue
-            if line.startswith('ACK') or line.startswith('NAK'):
-                self.ack_or_nak = line
-                self.ack_or_nak_event.set()
-                continue
-            if line in self.SECTION_NAMES:
-                self.current_section = line.rstrip(':')
-                continue
-            if self.current_section is None:
-                continue
-            elif self.current_section == 'PROTOCOL PREAMBLE':
-                if line.startswith('Version:'):
-                    self.device_version = split_value(line)
-            elif self.current_section == 'VIDEOHUB DEVICE':
-                if line.startswith('Model name:'):
-                    self.device_model = split_value(line)
-                elif line.startswith('Unique ID:'):
-                    self.device_id = split_value(line).upper()
-                elif line.startswith('Video outputs:'):
-                    self.num_outputs = int(split_value(line))
-                elif line.startswith('Video inputs:'):
-                    self.num_inputs = int(split_value(line))
-            elif self.current_section == 'OUTPUT LABELS':
-                i = int(line.split(' ')[0])
-                self.output_labels[i] = ' '.join(line.split(' ')[1:])
-                section_parsed = True
-            elif self.current_section == 'INPUT LABELS':
-                i = int(line.split(' ')[0])
-                self.input_labels[i] = ' '.join(line.split(' ')[1:])
-                section_parsed = True
-            elif self.current_section == 'VIDEO OUTPUT ROUTING':
-                out_idx, in_idx = [int(v) for v in line.split(' ')]
-                self.crosspoints[out_idx] = in_idx
-            else:
-                section_parsed = True
-        self.response_ready.set()
-        if not self.prelude_parsed:
-            return
-        if self.current_section is not None and section_parsed:
-            self.current_section = None
+    async def parse_device_section(self, section: str, lines: List[str]):
+        values = split_section_values(lines)
+        if 'Model name' in values:
+            self.device_model = values['Model name']
+        if 'Unique ID' in values:
+            self.device_id = values['Unique ID'].upper()
+        if 'Video outputs' in values:
+            self.num_outputs = int(values['Video outputs'])
+        if 'Video inputs' in values:
+            self.num_inputs = int(values['Video inputs'])
+    async def parse_labels_section(self, section: str, lines: List[str]):
+        changes = []
+        for line in lines:
+            i, _, lbl = line.partition(' ')
+            changes.append((int(i), lbl))
+        self.update_list_property(self.LABEL_SECTION_PROPS[section], changes)
+    async def parse_routing_section(self, section: str, lines: List[str]):
+        changes = []
+        for line in lines:
+            out_idx, in_idx = [int(v) for v in line.split(' ')]
+            changes.append((out_idx, in_idx))
+        self.update_list_property('crosspoints', changes)
+    async def parse_end_prelude(self, section: str, lines: List[str]):
+        self.prelude_parsed = True
     async def get_status(self, *sections):
         if not len(sections):
             sections = [
@@ -213,8 +341,7 @@ class TelnetBackend(TelnetBackendBase, VidhubBackendBase):
                 b'OUTPUT LABELS:\n\n',
                 b'INPUT LABELS:\n\n',
             ]
-        for section in sections:
-            await self.send_to_client(section)
+        await asyncio.gather(*[self.send_command(section) for section in sections])
     async def set_crosspoint(self, out_idx, in_idx):
         return await self.set_crosspoints((out_idx, in_idx))
     async def set_crosspoints(self, *args):
@@ -224,15 +351,11 @@ class TelnetBackend(TelnetBackendBase, VidhubBackendBase):
             tx_lines.append('{} {}'.format(out_idx, in_idx))
         tx_bfr = bytes('\n'.join(tx_lines), 'UTF-8')
         tx_bfr += b'\n\n'
-        async with self.emission_lock('crosspoints'):
-            await self.send_to_client(tx_bfr)
-            r = await self.wait_for_ack_or_nak()
-            if not r:
-                return False
-            xpts = self.crosspoints[:]
-            for out_idx, in_idx in args:
-                xpts[out_idx] = in_idx
-            self.crosspoints[:] = xpts
+        r = await self.send_command(tx_bfr)
+        if not r:
+            return False
+        self.update_list_property('crosspoints', args)
+        ROUTES_APPLIED.inc(len(args), device=self.metrics_label)
         return True
     async def set_output_label(self, out_idx, label):
         return await self.set_output_labels((out_idx, label))
@@ -243,15 +366,10 @@ class TelnetBackend(TelnetBackendBase, VidhubBackendBase):
             tx_lines.append('{} {}'.format(out_idx, label))
         tx_bfr = bytes('\n'.join(tx_lines), 'UTF-8')
         tx_bfr += b'\n\n'
-        async with self.emission_lock('output_labels'):
-            await self.send_to_client(tx_bfr)
-            r = await self.wait_for_ack_or_nak()
-            if not r:
-                return False
-            lbls = self.output_labels[:]
-            for out_idx, label in args:
-                lbls[out_idx] = label
-            self.output_labels = lbls[:]
+        r = await self.send_command(tx_bfr)
+        if not r:
+            return False
+        self.update_list_property('output_labels', args)
         return True
     async def set_input_label(self, in_idx, label):
         return await self.set_input_labels((in_idx, label))
@@ -262,82 +380,44 @@ class TelnetBackend(TelnetBackendBase, VidhubBackendBase):
             tx_lines.append('{} {}'.format(in_idx, label))
         tx_bfr = bytes('\n'.join(tx_lines), 'UTF-8')
         tx_bfr += b'\n\n'
-        async with self.emission_lock('input_labels'):
-            await self.send_to_client(tx_bfr)
-            r = await self.wait_for_ack_or_nak()
-            if not r:
-                return False
-            lbls = self.input_labels[:]
-            for in_idx, label in args:
-                lbls[in_idx] = label
-            self.input_labels = lbls[:]
+        r = await self.send_command(tx_bfr)
+        if not r:
+            return False
+        self.update_list_property('input_labels', args)
         return True
 
 class SmartViewTelnetBackendBase(TelnetBackendBase):
     DEFAULT_PORT = 9992
-    SECTION_NAMES = [
-        'PROTOCOL PREAMBLE:',
-        'SMARTVIEW DEVICE:',
-        'NETWORK:',
-    ]
-    async def parse_rx_bfr(self):
-        def split_value(line):
-            return line.split(':')[1].strip(' ')
-        bfr = self.rx_bfr.decode('UTF-8')
-        section_parsed = False
-        for line_idx, line in enumerate(bfr.splitlines()):
-            line = line.rstrip('\n')
-            if not len(line):
-                if self.current_section.startswith('MONITOR') and len(self.monitors) == self.num_monitors:
-                    self.current_section = None
-                    self.rx_bfr = b''
-                    self.prelude_parsed = True
-                    break
-                continue
-            if line.startswith('ACK') or line.startswith('NAK'):
-                self.ack_or_nak = line
-                self.ack_or_nak_event.set()
-                if bfr.rstrip('\n') == line:
-                    self.current_section = None
-                    self.rx_bfr = b''
-                    break
+    SECTION_HANDLERS = {
+        **TelnetBackendBase.SECTION_HANDLERS,
+        'SMARTVIEW DEVICE:':'parse_device_section',
+        'NETWORK:':'parse_ignored_section',
+    }
+    async def parse_device_section(self, section: str, lines: List[str]):
+        values = split_section_values(lines)
+        if 'Model' in values:
+            self.device_model = values['Model']
+        if 'Hostname' in values:
+            self.device_id = values['Hostname'].split('-')[1].upper()
+        if 'Name' in values:
+            if self.device_name is None or self.device_name == self.device_id:
+                self.device_name = values['Name']
+        if 'Monitors' in values:
+            self.num_monitors = int(values['Monitors'])
+            for c in string.ascii_uppercase[:self.num_monitors]:
+                s = 'MONITOR {}:'.format(c)
+                self.section_handlers.setdefault(s, self.parse_monitor_section)
+        if 'Inverted' in values:
+            self.inverted = values['Inverted'] == 'true'
+    async def parse_monitor_section(self, section: str, lines: List[str]):
+        monitor_name = section.rstrip(':')
+        for line in lines:
+            _, sep, value = line.partition(':')
+            if not sep:
                 continue
-            if line in self.SECTION_NAMES:
-                self.current_section = line.rstrip(':')
-                continue
-            if self.current_section is None:
-                continue
-            elif self.current_section == 'PROTOCOL PREAMBLE':
-                if line.startswith('Version:'):
-                    self.device_version = split_value(line)
-            elif self.current_section == 'SMARTVIEW DEVICE':
-                if line.startswith('Model:'):
-                    self.device_model = split_value(line)
-                elif line.startswith('Hostname:'):
-                    self.device_id = split_value(line).split('-')[1].upper()
-                elif line.startswith('Name:'):
-                    if self.device_name is None or self.device_name == self.device_id:
-                        self.device_name = split_value(line)
-                elif line.startswith('Monitors:'):
-                    self.num_monitors = int(split_value(line))
-                    for c in string.ascii_uppercase[:self.num_monitors]:
-                        s = 'MONITOR {}:'.format(c)
-                        if s not in self.SECTION_NAMES:
-                            self.SECTION_NAMES.append(s)
-                elif line.startswith('Inverted:'):
-                    self.inverted = split_value(line) == 'true'
-            elif self.current_section == 'NETWORK':
-                pass
-            elif self.current_section.startswith('MONITOR '):
-                monitor_name = self.current_section
-                await self.parse_monitor_line(monitor_name, line, split_value(line))
-            else:
-                section_parsed = True
-        self.response_ready.set()
-        if not self.prelude_parsed:
-            return
-        if self.current_section is not None and section_parsed:
-            self.current_section = None
+            await self.parse_monitor_line(monitor_name, line, value.strip(' '))
+        if not self.prelude_parsed and len(self.monitors) == self.num_monitors:
+            self.prelude_parsed = True
     async def parse_monitor_line(self, monitor_name, line, value):
         monitor = None
         for _m in self.monitors:
@@ -364,8 +444,7 @@ class SmartViewTelnetBackendBase(TelnetBackendBase):
         ]
         tx_bfr = bytes('\n'.join(tx_lines), 'UTF-8')
         tx_bfr += b'\n\n'
-        await self.send_to_client(tx_bfr)
-        r = await self.wait_for_ack_or_nak()
+        r = await self.send_command(tx_bfr)
         if r:
             await monitor.set_property_from_backend(name, value)
     def _on_monitors(self, *args, **kwargs):
@@ -376,10 +455,8 @@ class SmartViewTelnetBackend(SmartViewTelnetBackendBase, SmartViewBackendBase):
         super().__init__(**kwargs)
         self._telnet_init(**kwargs)
     async def _catch_exception(self, e: Exception, is_error: Optional[bool] = False):
-        if isinstance(e, OSError):
-            err = e.args[0]
-            if err in [errno.EHOSTUNREACH, errno.ECONNREFUSED]:
-                is_error = True
+        if is_connection_error(e):
+            is_error = True
         await super()._catch_exception(e, is_error)
 
 class SmartScopeTelnetBackend(SmartViewTelnetBackendBase, SmartScopeBackendBase):
@@ -387,8 +464,6 @@ class SmartScopeTelnetBackend(SmartViewTelnetBackendBase, SmartScopeBackendBase)
         super().__init__(**kwargs)
         self._telnet_init(**kwargs)
     async def _catch_exception(self, e: Exception, is_error: Optional[bool] = False):
-        if isinstance(e, OSError):
-            err = e.args[0]
-            if err in [errno.EHOSTUNREACH, errno.ECONNREFUSED]:
-                is_error = True
+        if is_connection_error(e):
+            is_error = True
         await super()._catch_exception(e, is_error)
@@ -1,7 +1,9 @@
 import os
 import json
 import asyncio
-from typing import List, Dict, ClassVar
+import threading
+import time
+from typing import List, Dict, ClassVar, Tuple, Iterable, Optional
 from loguru import logger
 
 import jsonfactory
@@ -9,7 +11,9 @@ from pydispatch import Dispatcher, Property
 from pydispatch.properties import ListProperty, DictProperty
 
 from vidhubcontrol.common import ConnectionState, ConnectionManager, SyncronizedConnectionManager
-from vidhubcontrol.discovery import BMDDiscovery
+from vidhubcontrol.discovery import BMDDiscovery, DiscoveryCache, SubnetSweeper
+from vidhubcontrol.utils import atomic_write
+from vidhubcontrol import metrics
 from vidhubcontrol.backends import (
     DummyBackend,
     SmartViewDummyBackend,
@@ -26,6 +30,21 @@ BACKENDS = {
     'smartscope':{cls.__name__:cls for cls in [SmartScopeDummyBackend, SmartScopeTelnetBackend]},
 }
 
+SAVE_LATENCY = metrics.histogram(
+    'vidhubcontrol_config_save_seconds',
+    'Time spent serializing and writing the config file',
+)
+
+def _copy_conf_value(value):
+    if isinstance(value, ConfigBase):
+        value = value._get_conf_data()
+    if isinstance(value, dict):
+        return {k:_copy_conf_value(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_copy_conf_value(v) for v in value]
+    return value
+
+
 class ConfigBase(Dispatcher):
     _conf_attrs = []
     _events_ = ['trigger_save']
@@ -37,6 +56,13 @@ class ConfigBase(Dispatcher):
                 val = val._get_conf_data()
             d[attr] = val
         return d
+    def _get_conf_snapshot(self):
+        """Get a copy of the config data containing only builtin types
+
+        The result is detached from any observable containers so it may be
+        serialized outside of the event loop.
+        """
+        return _copy_conf_value(self)
 
 class Config(ConfigBase):
     """Config store for devices
@@ -58,6 +84,10 @@ class Config(ConfigBase):
     * A change is detected for a device's network address
     * Any user-defined device value changes (device name, presets, etc)
 
+    These changes are debounced using :attr:`save_delay` and
+    :attr:`save_max_delay` (see :meth:`schedule_save`) and the file is written
+    from a worker thread.
+
     The recommended method to start ``Config`` is through the :meth:`load_async`
     method.
 
@@ -73,6 +103,19 @@ class Config(ConfigBase):
     Keyword Arguments:
         filename (:obj:`str`, optional): Filename to load/save config data to.
             If not given, defaults to :attr:`DEFAULT_FILENAME`
+        save_delay (:obj:`float`, optional): Value for :attr:`save_delay`
+        save_max_delay (:obj:`float`, optional): Value for :attr:`save_max_delay`
+        connect_timeout (:obj:`float`, optional): Value for :attr:`connect_timeout`
+        max_concurrent_connects (:obj:`int`, optional): Value for
+            :attr:`max_concurrent_connects`
+        auto_reconnect (:obj:`bool`, optional): Value for :attr:`auto_reconnect`
+        write_policy (:obj:`str`, optional): Value for :attr:`write_policy`
+        use_discovery_cache (:obj:`bool`, optional): Value for
+            :attr:`use_discovery_cache`
+        discovery_cache_max_age (:obj:`float`, optional): Value for
+            :attr:`discovery_cache_max_age`
+        sweep_networks (:obj:`list`, optional): Value for :attr:`sweep_networks`
+        sweep_interval (:obj:`float`, optional): Value for :attr:`sweep_interval`
 
     Attributes:
         vidhubs: A :class:`~pydispatch.properties.DictProperty` of
@@ -87,6 +130,45 @@ class Config(ConfigBase):
         all_devices: A :class:`~pydispatch.properties.DictProperty`
             containing all devices from :attr:`vidhubs`, :attr:`smartviews` and
             :attr:`smartscopes`
+        salvos: A :class:`~pydispatch.properties.DictProperty` of
+            :class:`Salvo` instances using :attr:`Salvo.name` as keys
+        save_delay: Time (in seconds) to wait after the last change before
+            saving. Defaults to ``.5``
+        save_max_delay: Maximum time (in seconds) a save can be delayed by
+            subsequent changes. Defaults to ``5``
+        save_metrics: A ``dict`` of save statistics:
+            ``'requests'`` (saves scheduled), ``'coalesced'`` (requests merged
+            into a pending save), ``'saves'`` (files written),
+            ``'last_latency'`` / ``'max_latency'`` / ``'total_latency'`` (time
+            in seconds spent serializing and writing)
+        connect_timeout: Time (in seconds) each device backend is given to
+            connect. Defaults to ``2``
+        max_concurrent_connects: The number of device connections that may
+            be attempted at the same time. Defaults to ``16``
+        auto_reconnect: Passed to each device backend
+            (see :attr:`vidhubcontrol.backends.base.BackendBase.auto_reconnect`).
+            Defaults to ``False``
+        write_policy: Passed to each device backend
+            (see :attr:`vidhubcontrol.backends.base.BackendBase.write_policy`).
+            Defaults to ``'queue'``
+        use_discovery_cache: If ``True`` (the default), discovered devices
+            are stored in a :class:`~vidhubcontrol.discovery.DiscoveryCache`
+            next to the config :attr:`filename` and their last known
+            addresses are tried at start-up, alongside live discovery
+        discovery_cache_max_age: Time (in seconds) a device may go unseen
+            before it is dropped from the discovery cache. Defaults to
+            ``86400``
+        discovery_cache: The :class:`~vidhubcontrol.discovery.DiscoveryCache`
+            in use (created in :meth:`start`)
+        sweep_networks: Networks (as CIDR strings) to search for devices
+            using a :class:`~vidhubcontrol.discovery.SubnetSweeper`, for use
+            where Zeroconf announcements can't be received. Defaults to an
+            empty list (disabled)
+        sweep_interval: Time (in seconds) between sweeps of
+            :attr:`sweep_networks`. If ``None``, only one sweep is made at
+            start-up. Defaults to ``300``
+        subnet_sweeper: The :class:`~vidhubcontrol.discovery.SubnetSweeper`
+            in use (if any)
 
     .. autoattribute:: DEFAULT_FILENAME
 
@@ -100,7 +182,8 @@ class Config(ConfigBase):
     smartviews: Dict[str, 'SmartViewConfig'] = DictProperty()
     smartscopes: Dict[str, 'SmartScopeConfig'] = DictProperty()
     all_devices: Dict[str, 'DeviceConfigBase'] = DictProperty()
-    _conf_attrs = ['vidhubs', 'smartscopes', 'smartviews']
+    salvos: Dict[str, 'Salvo'] = DictProperty()
+    _conf_attrs = ['vidhubs', 'smartscopes', 'smartviews', 'salvos']
     _device_type_map = {
         'vidhub':{'prop':'vidhubs'},
         'smartview':{'prop':'smartviews'},
@@ -112,7 +195,34 @@ class Config(ConfigBase):
         self.filename = kwargs.get('filename', self.DEFAULT_FILENAME)
         self.loop = asyncio.get_event_loop()
         self.discovery_listener = None
-        self.discovery_lock = asyncio.Lock()
+        self.discovery_cache = None
+        self.use_discovery_cache = kwargs.get('use_discovery_cache', True)
+        self.discovery_cache_max_age = kwargs.get('discovery_cache_max_age', 86400)
+        self._discovery_locks = {}
+        self.sweep_networks = kwargs.get('sweep_networks', [])
+        self.sweep_interval = kwargs.get('sweep_interval', 300)
+        self.subnet_sweeper = None
+        self.save_delay = kwargs.get('save_delay', .5)
+        self.save_max_delay = kwargs.get('save_max_delay', 5)
+        self.save_metrics = {
+            'requests':0, 'coalesced':0, 'saves':0,
+            'last_latency':0., 'max_latency':0., 'total_latency':0.,
+        }
+        self._save_handle = None
+        self._save_requested_at = None
+        self._save_task = None
+        self._save_generation = 0
+        self._written_generation = 0
+        self._write_lock = threading.Lock()
+        self.connect_timeout = kwargs.get('connect_timeout', 2)
+        self.max_concurrent_connects = kwargs.get('max_concurrent_connects', 16)
+        self.auto_reconnect = kwargs.get('auto_reconnect', False)
+        self.write_policy = kwargs.get('write_policy', 'queue')
+        self._connect_semaphore = asyncio.Semaphore(self.max_concurrent_connects)
+        self._connect_tasks = set()
+        self._devices_changed = asyncio.Event()
+        for salvo_data in kwargs.get('salvos', {}).values():
+            self._add_salvo(Salvo(config=self, **salvo_data))
 
     @property
     def connection_state(self) -> ConnectionState:
@@ -149,7 +259,8 @@ class Config(ConfigBase):
 
         Note:
             All config object instances are created using the
-            :meth:`DeviceConfigBase.create` classmethod.
+            :meth:`DeviceConfigBase.create` classmethod. Their backends are
+            connected in the background (see :meth:`schedule_connect`).
 
         """
         async def _init_backend(prop, cls, **okwargs):
@@ -165,6 +276,7 @@ class Config(ConfigBase):
                 device_id=self.on_backend_device_id,
                 trigger_save=self.on_device_trigger_save,
             )
+            obj.connection_manager.bind(state_changed=self.on_device_state_changed)
         tasks = []
         for key, d in self._device_type_map.items():
             items = kwargs.get(d['prop'], {})
@@ -183,6 +295,10 @@ class Config(ConfigBase):
         but can be overridden in this method. They will also be passed to
         :meth:`_initialize_backends`.
 
+        This returns once the device configs have been created. Their
+        backends will continue to connect in the background;
+        use :meth:`wait_for_devices` to wait for them.
+
         """
         manager = self.connection_manager
         async with manager:
@@ -202,13 +318,24 @@ class Config(ConfigBase):
                 await manager.set_state('connected')
             return
         assert self.discovery_listener is None
-        self.discovery_listener = BMDDiscovery(self.loop)
+        if self.use_discovery_cache:
+            self.discovery_cache = DiscoveryCache(
+                DiscoveryCache.filename_for(self.filename),
+                max_age=self.discovery_cache_max_age,
+            )
+        self.discovery_listener = BMDDiscovery(self.loop, cache=self.discovery_cache)
         self.discovery_listener.bind_async(
             self.loop,
             bmd_service_added=self.on_discovery_service_added,
             bmd_service_updated=self.on_discovery_service_updated,
         )
         await self.discovery_listener.start()
+        if self.sweep_networks:
+            self.subnet_sweeper = SubnetSweeper(
+                self.loop, self.discovery_listener, self.sweep_networks,
+                interval=self.sweep_interval,
+            )
+            await self.subnet_sweeper.start()
         async with manager:
             await manager.set_state('connected')
         logger.debug('Config started')
@@ -222,9 +349,14 @@ class Config(ConfigBase):
                 return
             await manager.set_state('disconnecting')
         logger.debug('Config stopping...')
+        if self.subnet_sweeper is not None:
+            await self.subnet_sweeper.stop()
+            self.subnet_sweeper = None
         if self.discovery_listener is not None:
             await self.discovery_listener.stop()
             self.discovery_listener = None
+        if len(self._connect_tasks):
+            await asyncio.gather(*self._connect_tasks, return_exceptions=True)
         coros = set()
         for vidhub in self.vidhubs.values():
             coros.add(vidhub.close())
@@ -234,9 +366,64 @@ class Config(ConfigBase):
             coros.add(smartscope.close())
         if len(coros):
             await asyncio.gather(*coros)
+        await self.flush_save()
         async with self.connection_manager as manager:
             await manager.set_state('not_connected')
         logger.debug('Config stopped')
+    def schedule_connect(self, device: 'DeviceConfigBase') -> asyncio.Task:
+        """Connects the backend of the given device in the background
+
+        No more than :attr:`max_concurrent_connects` devices will be
+        connecting at once. The others wait for a slot in the order they
+        were scheduled.
+
+        Arguments:
+            device: The :class:`DeviceConfigBase` instance to connect
+
+        Returns:
+            The :class:`asyncio.Task` performing the connection
+
+        """
+        task = asyncio.ensure_future(self._connect_device(device))
+        self._connect_tasks.add(task)
+        task.add_done_callback(self._connect_tasks.discard)
+        return task
+    async def _connect_device(self, device):
+        async with self._connect_semaphore:
+            if self.connection_state & (ConnectionState.disconnecting | ConnectionState.not_connected):
+                return
+            await device.connect_backend()
+    def on_device_state_changed(self, *args, **kwargs):
+        self._devices_changed.set()
+    async def wait_for_devices(self, count: Optional[int] = None,
+                               timeout: Optional[float] = None) -> bool:
+        """Wait for devices in :attr:`all_devices` to be connected
+
+        Arguments:
+            count (:obj:`int`, optional): The number of connected devices to
+                wait for. If not given, waits for all of them
+            timeout (:obj:`float`, optional): If given, the number of seconds
+                to wait. Otherwise, this will wait indefinitely
+
+        Returns:
+            bool: ``True`` if the devices connected within the *timeout*
+
+        """
+        async def wait():
+            while True:
+                self._devices_changed.clear()
+                devices = list(self.all_devices.values())
+                num_connected = len([
+                    obj for obj in devices if obj.connection_state.is_connected
+                ])
+                if num_connected >= (len(devices) if count is None else count):
+                    return
+                await self._devices_changed.wait()
+        try:
+            await asyncio.wait_for(wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
     async def build_backend(self, device_type, backend_name, **kwargs):
         """Creates a "backend" instance
 
@@ -312,7 +499,9 @@ class Config(ConfigBase):
             trigger_save=self.on_device_trigger_save,
             device_id=self.on_backend_device_id,
         )
-        self.save()
+        obj.connection_manager.bind(state_changed=self.on_device_state_changed)
+        self._devices_changed.set()
+        self.schedule_save()
     def on_backend_device_id(self, backend, value, **kwargs):
         if value is None:
             return
@@ -323,13 +512,27 @@ class Config(ConfigBase):
         if old in prop:
             del prop[old]
         if value in prop:
-            self.save()
+            self.schedule_save()
             return
         assert value not in self.all_devices
         self.all_devices[value] = backend
         prop[value] = backend
-        self.save()
-    async def add_discovered_device(self, device_type, info, device_id):
+        self.schedule_save()
+    async def add_discovered_device(self, device_type, info, device_id, cached=False):
+        """Add or update a device found by discovery
+
+        Arguments:
+            device_type (str): The type of device (``'vidhub'``,
+                ``'smartview'`` or ``'smartscope'``)
+            info: The :class:`~vidhubcontrol.discovery.ServiceInfo` of the device
+            device_id (str): The device's unique id
+            cached (bool, optional): ``True`` if the info came from the
+                :attr:`discovery_cache` rather than a live announcement. The
+                cached endpoint is only used if the device is not connected
+                or connecting, and never replaces the address of a device
+                already in the config unless that device is unreachable
+
+        """
         manager = self.connection_manager
         async with manager:
             if manager.state & (ConnectionState.disconnecting | ConnectionState.not_connected):
@@ -337,22 +540,34 @@ class Config(ConfigBase):
             if ConnectionState.connecting in manager.state:
                 await manager.wait_for('connected')
         logger.debug(f'add_discovered_device: {device_type}, {info}, {device_id}')
-        async with self.discovery_lock:
-            prop = getattr(self, self._device_type_map[device_type]['prop'])
+        prop = getattr(self, self._device_type_map[device_type]['prop'])
+        hostaddr = str(info.address)
+        hostport = int(info.port)
+        obj = prop.get(device_id)
+        if obj is not None:
+            active = obj.connection_state & (ConnectionState.connected | ConnectionState.waiting)
+            if obj.hostaddr == hostaddr and obj.hostport == hostport:
+                if active or cached:
+                    # Endpoint unchanged and connected (or connecting)
+                    return
+            elif active and cached:
+                return
+        lock = self._discovery_locks.get(device_id)
+        if lock is None:
+            lock = self._discovery_locks[device_id] = asyncio.Lock()
+        async with lock:
             cls = None
             for key, _cls in BACKENDS[device_type].items():
                 if 'Telnet' in key:
                     cls = _cls
                     break
-            hostaddr = str(info.address)
-            hostport = int(info.port)
             if device_id in prop:
                 obj = prop[device_id]
                 logger.debug(f'existing device: {obj!r}')
                 if obj.hostaddr != hostaddr or obj.hostport != hostport:
                     logger.debug('resetting hostaddr')
                     await obj.reset_hostaddr(hostaddr, hostport)
-                elif not obj.connection_state.is_connected:
+                elif not obj.connection_state & (ConnectionState.connected | ConnectionState.waiting):
                     await obj.reconnect()
                 return
             backend = await cls.create_async(
@@ -373,17 +588,57 @@ class Config(ConfigBase):
         device_id = kwargs.get('id')
         if device_id is None:
             return
-        await self.add_discovered_device(device_type, info, device_id)
+        await self.add_discovered_device(
+            device_type, info, device_id, cached=kwargs.get('cached', False),
+        )
 
     async def on_discovery_service_updated(self, info, **kwargs):
         logger.debug(f'update: {info!r}, {kwargs}')
         await self.on_discovery_service_added(info, **kwargs)
 
+    def _add_salvo(self, salvo: 'Salvo'):
+        self.salvos[salvo.name] = salvo
+        salvo.bind(trigger_save=self.on_device_trigger_save)
+    def add_salvo(self, name: str, crosspoints: Iterable[Tuple[str, int, int]]) -> 'Salvo':
+        """Creates a :class:`Salvo` and stores it in :attr:`salvos`
+
+        If a salvo already exists with the given name, it will be replaced.
+
+        Arguments:
+            name: The name of the salvo
+            crosspoints: An iterable of ``(device_id, out_idx, in_idx)`` tuples
+
+        Returns:
+            The :class:`Salvo` instance
+
+        """
+        if name in self.salvos:
+            self.salvos[name].unbind(self)
+        salvo = Salvo(config=self, name=name, crosspoints=crosspoints)
+        self._add_salvo(salvo)
+        self.schedule_save()
+        return salvo
+    def remove_salvo(self, name: str):
+        """Removes a :class:`Salvo` from :attr:`salvos`
+        """
+        salvo = self.salvos[name]
+        salvo.unbind(self)
+        del self.salvos[name]
+        self.schedule_save()
+    async def recall_salvo(self, name: str) -> 'SalvoResult':
+        """Recalls the :class:`Salvo` with the given name
+
+        See :meth:`Salvo.recall`
+        """
+        return await self.salvos[name].recall()
     def on_device_trigger_save(self, *args, **kwargs):
-        self.save()
+        self.schedule_save()
     def save(self, filename=None):
         """Saves the config data to the given filename
 
+        This writes the file immediately. Any pending save scheduled by
+        :meth:`schedule_save` will be cancelled.
+
         Arguments:
             filename (:obj:`str`, optional): The filename to write config data to.
                 If not supplied, the current :attr:`filename` is used.
@@ -395,15 +650,92 @@ class Config(ConfigBase):
         """
         if filename is not None:
             self.filename = filename
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        generation, data = self._get_save_data()
+        elapsed = self._write_config(self.filename, data, generation)
+        self._update_save_metrics(elapsed)
+    def schedule_save(self):
+        """Schedules the config data to be saved
+
+        The save will occur after :attr:`save_delay` unless another request is
+        made before then, in which case the save is pushed back again. Saves
+        will not be delayed more than :attr:`save_max_delay` from the first
+        pending request.
+
+        The config data is collected on the event loop, then serialized and
+        written (atomically) using the loop's default executor.
+
+        This may be called from any thread (property changes made by the UI
+        do not occur on the event loop). The timer is always armed on the
+        loop itself.
+        """
+        self.loop.call_soon_threadsafe(self._arm_save_timer)
+    def _arm_save_timer(self):
+        loop = self.loop
+        now = loop.time()
+        self.save_metrics['requests'] += 1
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self.save_metrics['coalesced'] += 1
         else:
-            filename = self.filename
-        filename = os.path.expanduser(filename)
-        data = self._get_conf_data()
-        if not os.path.exists(os.path.dirname(filename)):
-            os.makedirs(os.path.dirname(filename))
-        s = jsonfactory.dumps(data, indent=4)
-        with open(filename, 'w') as f:
-            f.write(s)
+            self._save_requested_at = now
+        max_remaining = self._save_requested_at + self.save_max_delay - now
+        delay = max(0, min(self.save_delay, max_remaining))
+        self._save_handle = loop.call_later(delay, self._start_scheduled_save)
+    async def flush_save(self):
+        """Writes any pending save immediately and waits for all saves to complete
+        """
+        # Let any requests handed off by schedule_save arm the timer first
+        await asyncio.sleep(0)
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._start_scheduled_save()
+        t = self._save_task
+        if t is not None:
+            await t
+    def _start_scheduled_save(self):
+        self._save_handle = None
+        self._save_requested_at = None
+        generation, data = self._get_save_data()
+        self._save_task = asyncio.ensure_future(
+            self._save_in_executor(self.filename, data, generation, self._save_task)
+        )
+    def _get_save_data(self):
+        self._save_generation += 1
+        return self._save_generation, self._get_conf_snapshot()
+    async def _save_in_executor(self, filename, data, generation, prev_task):
+        if prev_task is not None:
+            await prev_task
+        try:
+            elapsed = await self.loop.run_in_executor(
+                None, self._write_config, filename, data, generation,
+            )
+        except Exception as e:
+            logger.exception(e)
+            return
+        self._update_save_metrics(elapsed)
+    def _write_config(self, filename, data, generation):
+        with self._write_lock:
+            # A newer snapshot has already been written by :meth:`save`
+            if generation < self._written_generation:
+                return None
+            start_time = time.monotonic()
+            filename = os.path.expanduser(filename)
+            s = jsonfactory.dumps(data, indent=4)
+            atomic_write(filename, s)
+            self._written_generation = generation
+            return time.monotonic() - start_time
+    def _update_save_metrics(self, elapsed):
+        if elapsed is None:
+            return
+        SAVE_LATENCY.observe(elapsed)
+        m = self.save_metrics
+        m['saves'] += 1
+        m['last_latency'] = elapsed
+        m['total_latency'] += elapsed
+        m['max_latency'] = max(m['max_latency'], elapsed)
     @classmethod
     def _prepare_load_params(cls, filename=None, **kwargs):
         if filename is None:
@@ -434,7 +766,8 @@ class Config(ConfigBase):
         """Creates a Config instance, loading data from the given filename
 
         This coroutine method creates the ``Config`` instance and will ``await``
-        all start-up coroutines and futures before returning.
+        all start-up coroutines and futures before returning. Device backends
+        will continue connecting in the background (see :meth:`start`).
 
         Arguments:
             filename (:obj:`str`, optional): The filename to read config data
@@ -513,7 +846,9 @@ class DeviceConfigBase(ConfigBase):
         then be used to collect config values from.
 
         If "backend" is not present, the appropriate one will be created using
-        :meth:`build_backend`.
+        :meth:`build_backend` and connected with :meth:`connect_backend`. When
+        a :attr:`config` is present, this is done in the background using
+        :meth:`Config.schedule_connect`.
 
         Returns:
             An instance of :class:`DeviceConfigBase`
@@ -530,6 +865,11 @@ class DeviceConfigBase(ConfigBase):
             self.backend = await self.build_backend(**self._get_conf_data())
             await self.on_backend_set(self, self.backend, old=None)
         self.bind_async(self.loop, backend=self.on_backend_set)
+        if kwargs.get('backend') is None:
+            if self.config is not None:
+                self.config.schedule_connect(self)
+            else:
+                await self.connect_backend()
         return self
     @classmethod
     async def from_existing(cls, backend, **kwargs):
@@ -556,6 +896,16 @@ class DeviceConfigBase(ConfigBase):
             kwargs.setdefault(key, val)
         kwargs['event_loop'] = backend.event_loop
         return await cls.create(**kwargs)
+    async def connect_backend(self):
+        """Connects the :attr:`backend` and updates attributes from the
+        values reported by the device
+        """
+        backend = self.backend
+        await backend.connect()
+        if backend is not self.backend or not backend.connection_state.is_connected:
+            return
+        self._update_from_backend(backend)
+        self.emit('trigger_save')
     async def reconnect(self):
         async with self.connection_manager as manager:
             if ConnectionState.waiting in manager.state:
@@ -579,8 +929,8 @@ class DeviceConfigBase(ConfigBase):
     async def build_backend(self, cls=None, **kwargs):
         """Creates a backend instance asynchronously
 
-        Keyword arguments will be passed to the
-        :meth:`vidhubcontrol.backends.base.BackendBase.create_async` method.
+        Keyword arguments will be passed to the backend's init method. The
+        backend is not connected here (see :meth:`connect_backend`).
 
         Arguments:
             cls (optional): A subclass of
@@ -593,19 +943,13 @@ class DeviceConfigBase(ConfigBase):
 
         """
         kwargs.setdefault('event_loop', self.loop)
+        if self.config is not None:
+            for key in ['connect_timeout', 'auto_reconnect', 'write_policy']:
+                kwargs.setdefault(key, getattr(self.config, key))
         if cls is None:
             cls = BACKENDS[self.device_type][self.backend_name]
-        await self.connection_manager.set_other(None)
-        async with self.connection_manager as manager:
-            await manager.set_state(ConnectionState.connecting)
         backend = cls(**kwargs)
-        async def wait_for_connecting():
-            async with backend.connection_manager as backend_mgr:
-                state = await backend_mgr.wait_for('connecting')
-            await self.connection_manager.set_other(backend_mgr)
-        t = asyncio.ensure_future(backend.connect())
-        await wait_for_connecting()
-        await t
+        await self.connection_manager.set_other(backend.connection_manager)
         return backend
     def on_backend_prop_change(self, instance, value, **kwargs):
         if instance is not self.backend:
@@ -624,26 +968,28 @@ class DeviceConfigBase(ConfigBase):
             return
         if self.connection_manager.other is not backend.connection_manager:
             await self.connection_manager.set_other(backend.connection_manager)
-        if backend.connection_state.is_connected:
-            if self.backend.device_name != self.device_name:
-                self.device_name = self.backend.device_name
-        if backend.device_id is None:
-            if self.device_id is None:
-                self.device_id = self.config.id_for_device(self)
-        elif backend.connection_state.is_connected:
-            self.device_id = backend.device_id
+        self._update_from_backend(backend)
         backend.bind(
             device_name=self.on_backend_prop_change,
             device_id=self._on_backend_device_id,
         )
         if hasattr(backend, 'hostport'):
-            if backend.connection_state.is_connected:
-                self.hostaddr = backend.hostaddr
-                self.hostport = backend.hostport
             backend.bind(
                 hostaddr=self.on_backend_prop_change,
                 hostport=self.on_backend_prop_change,
             )
+    def _update_from_backend(self, backend):
+        if backend.connection_state.is_connected:
+            if backend.device_name != self.device_name:
+                self.device_name = backend.device_name
+        if backend.device_id is None:
+            if self.device_id is None:
+                self.device_id = self.config.id_for_device(self)
+        elif backend.connection_state.is_connected:
+            self.device_id = backend.device_id
+        if hasattr(backend, 'hostport') and backend.connection_state.is_connected:
+            self.hostaddr = backend.hostaddr
+            self.hostport = backend.hostport
     def _on_backend_device_id(self, backend, value, **kwargs):
         if backend is not self.backend:
             return
@@ -728,6 +1074,120 @@ class SmartScopeConfig(DeviceConfigBase):
     """
     device_type: ClassVar[str] = 'smartscope'
 
+class Salvo(ConfigBase):
+    """A set of crosspoints across one or more Videohub devices that are
+    recalled together
+
+    Attributes:
+        config: A reference to the parent :class:`Config` instance
+        name: The name of the salvo
+        crosspoints: A ``list`` of ``(device_id, out_idx, in_idx)`` tuples
+            where ``device_id`` is a key in :attr:`Config.vidhubs`
+
+    """
+    name: str = Property()
+    crosspoints: List[Tuple[str, int, int]] = ListProperty()
+    _conf_attrs = ['name', 'crosspoints']
+    def __init__(self, **kwargs):
+        self.config = kwargs.get('config')
+        self.name = kwargs.get('name')
+        self.crosspoints = [tuple(xpt) for xpt in kwargs.get('crosspoints', [])]
+        self.bind(name=self.on_prop_change, crosspoints=self.on_prop_change)
+    def get_device_crosspoints(self) -> Dict[str, List[Tuple[int, int]]]:
+        """Group the :attr:`crosspoints` by device
+
+        Returns:
+            A ``dict`` of ``(out_idx, in_idx)`` lists using the device ids
+            as keys
+        """
+        d = {}
+        for device_id, out_idx, in_idx in self.crosspoints:
+            d.setdefault(device_id, []).append((out_idx, in_idx))
+        return d
+    async def recall(self) -> 'SalvoResult':
+        """Sets the crosspoints on all devices
+
+        The crosspoints for each device are sent concurrently using a single
+        :meth:`~vidhubcontrol.backends.base.VidhubBackendBase.set_crosspoints`
+        call per device.
+
+        Returns:
+            A :class:`SalvoResult` containing the result from each device
+
+        """
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
+        async def recall_device(device_id, args):
+            device = self.config.vidhubs.get(device_id)
+            if device is None or device.backend is None:
+                logger.warning(f'Salvo "{self.name}": device "{device_id}" not found')
+                return SalvoDeviceResult(device_id, False, None)
+            try:
+                r = await device.backend.set_crosspoints(*args)
+            except Exception as e:
+                logger.exception(e)
+                r = False
+            return SalvoDeviceResult(device_id, bool(r), loop.time() - start_time)
+        coros = [
+            recall_device(device_id, args)
+            for device_id, args in self.get_device_crosspoints().items()
+        ]
+        results = await asyncio.gather(*coros)
+        return SalvoResult(self, results, loop.time() - start_time)
+    def on_prop_change(self, *args, **kwargs):
+        self.emit('trigger_save')
+
+class SalvoDeviceResult(object):
+    """The result of a :class:`Salvo` recall for a single device
+
+    Attributes:
+        device_id: The device id
+        success: ``True`` if the device acknowledged the changes
+        elapsed: Time (in seconds) from the start of the recall until the
+            device responded. ``None`` if the device could not be found
+    """
+    def __init__(self, device_id: str, success: bool, elapsed: Optional[float]):
+        self.device_id = device_id
+        self.success = success
+        self.elapsed = elapsed
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self}>'
+    def __str__(self):
+        r = 'ACK' if self.success else 'NAK'
+        return f'{self.device_id}: {r} ({self.elapsed})'
+
+class SalvoResult(object):
+    """The results of a :meth:`Salvo.recall`
+
+    Attributes:
+        salvo: The :class:`Salvo` instance
+        devices: A ``dict`` of :class:`SalvoDeviceResult` using the device
+            ids as keys
+        elapsed: Total time (in seconds) for all devices to respond
+    """
+    def __init__(self, salvo: Salvo, results: Iterable[SalvoDeviceResult], elapsed: float):
+        self.salvo = salvo
+        self.devices = {r.device_id:r for r in results}
+        self.elapsed = elapsed
+    @property
+    def success(self) -> bool:
+        """``True`` if all devices acknowledged their changes
+        """
+        return all((r.success for r in self.devices.values()))
+    @property
+    def skew(self) -> Optional[float]:
+        """The time (in seconds) between the first and last successful
+        device responses
+        """
+        times = [r.elapsed for r in self.devices.values() if r.success]
+        if not len(times):
+            return None
+        return max(times) - min(times)
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self}>'
+    def __str__(self):
+        return f'{self.salvo.name}: success={self.success}, elapsed={self.elapsed}, skew={self.skew}'
+
 Config._device_type_map['vidhub']['cls'] = VidhubConfig
 Config._device_type_map['smartview']['cls'] = SmartViewConfig
 Config._device_type_map['smartscope']['cls'] = SmartScopeConfig
@@ -2,8 +2,11 @@ import asyncio
 from typing import (
     List, Tuple, Dict, Union, Optional, Any, Callable, Coroutine, Awaitable,
 )
+import os
+import json
 import ipaddress
 import platform
+import time
 from loguru import logger
 
 from pydispatch import Dispatcher, Property
@@ -22,7 +25,8 @@ if ZEROCONF_AVAILABLE:
     from zeroconf import IPVersion
 
 
-from vidhubcontrol.utils import find_ip_addresses
+from vidhubcontrol.utils import find_ip_addresses, atomic_write
+from vidhubcontrol.aiotelnetlib import split_section_values
 
 PUBLISH_TTL = 60
 
@@ -151,6 +155,19 @@ class ServiceInfo(Dispatcher):
         """
         return (self.type, self.name)#, self.address, self.port)
 
+    @property
+    def fingerprint(self) -> Tuple:
+        """A hashable summary of the :attr:`addresses`, :attr:`port`,
+        :attr:`server` and :attr:`properties` used to detect repeated
+        announcements of unchanged services
+        """
+        return (
+            tuple(str(addr) for addr in self.addresses),
+            self.port,
+            self.server,
+            tuple(sorted(self.properties.items())),
+        )
+
     def to_zc_info(self) -> 'zeroconf.ServiceInfo':
         """Creates a copy as an instance of :class:`zeroconf.ServiceInfo`
         """
@@ -234,9 +251,20 @@ class Listener(Dispatcher):
     Allows async communication with :class:`zeroconf.Zeroconf` through
     :meth:`asyncio.AbstractEventLoop.run_in_executor` calls.
 
+    Services found by the browser are resolved on the :attr:`mainloop` using
+    :meth:`zeroconf.asyncio.AsyncZeroconf.async_get_service_info`, so many
+    services can be resolved concurrently without blocking the browser
+    thread.
+
     Arguments:
         mainloop (:class:`asyncio.BaseEventLoop`): asyncio event loop instance
         service_type (str): The fully qualified service type name to subscribe to
+        max_concurrent_resolve (int, optional): The number of services that
+            may be resolved at once. Defaults to ``16``
+        resolve_timeout (float, optional): Time (in seconds) to wait for a
+            service to be resolved. Defaults to ``3``
+        resolve_cache_ttl (float, optional): Time (in seconds) that resolved
+            services are kept in :attr:`resolve_cache`. Defaults to ``60``
 
     Attributes:
         services: All services currently discovered as instances of
@@ -245,20 +273,41 @@ class Listener(Dispatcher):
             events with instances of :class:`Message`
         published_services: Stores services that have been published
             using :meth:`publish_service` as :class:`ServiceInfo` instances.
+        resolve_cache: Recently resolved services stored by
+            :attr:`ServiceInfo.id` as ``tuples`` of
+            ``(timestamp, ServiceInfo)``
+        discovery_counters (dict): Counts of ``'duplicates'`` (updates
+            dropped because the service had not changed)
 
     """
     _events_ = ['service_added', 'service_updated', 'service_removed']
     services: Dict[str, ServiceInfo] = DictProperty()
     message_queue: asyncio.Queue
     published_services: Dict[str, ServiceInfo]
-    def __init__(self, mainloop, service_type):
+    resolve_cache: Dict[Tuple[str, str], Tuple[float, ServiceInfo]]
+    def __init__(
+        self,
+        mainloop,
+        service_type,
+        max_concurrent_resolve: Optional[int] = 16,
+        resolve_timeout: Optional[float] = 3,
+        resolve_cache_ttl: Optional[float] = 60,
+    ):
         self.mainloop = mainloop
         self.service_type = service_type
+        self.max_concurrent_resolve = max_concurrent_resolve
+        self.resolve_timeout = resolve_timeout
+        self.resolve_cache_ttl = resolve_cache_ttl
+        self.resolve_cache = {}
+        self._resolve_semaphore = asyncio.Semaphore(max_concurrent_resolve)
+        self._resolve_tasks = {}
+        self.discovery_counters = {'duplicates':0}
         self.running = False
         self.stopped = asyncio.Event()
         self.message_queue = asyncio.Queue()
         self._service_info_lock = asyncio.Lock()
         self.zeroconf = None
+        self.async_zeroconf = None
         self.published_services = {}
 
     async def start(self):
@@ -318,6 +367,11 @@ class Listener(Dispatcher):
         logger.debug('Discovery stopping...')
         await self.message_queue.put(None)
         await self.run_future
+        tasks = list(self._resolve_tasks.values())
+        for task in tasks:
+            task.cancel()
+        if len(tasks):
+            await asyncio.gather(*tasks, return_exceptions=True)
         await self.stop_zeroconf()
         self.stopped.set()
         logger.debug('Discovery stopped')
@@ -365,6 +419,9 @@ class Listener(Dispatcher):
                 self.emit('service_added', info, **kwargs)
                 return
             cur = self.services[info.id]
+            if cur.fingerprint == info.fingerprint:
+                self.discovery_counters['duplicates'] += 1
+                return
             cur.update(info)
         self.emit('service_updated', info, **kwargs)
 
@@ -377,26 +434,125 @@ class Listener(Dispatcher):
 
     def add_service(self, zc: 'zeroconf.Zeroconf', type_: str, name: str):
         if self.running:
-            info = zc.get_service_info(type_, name)
-            info = ServiceInfo.from_zc_info(info)
-            msg = AddedMessage(info)
-            run_on_loop(self.add_message(msg), self.mainloop)
+            self.mainloop.call_soon_threadsafe(
+                self.schedule_resolve, type_, name, AddedMessage,
+            )
 
     def remove_service(self, zc: 'zeroconf.Zeroconf', type_: str, name: str):
         if self.running:
-            info = ServiceInfo(type_=type_, name=name)
-            msg = RemovedMessage(info)
-            run_on_loop(self.add_message(msg), self.mainloop)
+            self.mainloop.call_soon_threadsafe(self._on_service_removed, type_, name)
 
     def update_service(self, zc: 'zeroconf.Zeroconf', type_: str, name: str):
         if self.running:
-            info = zc.get_service_info(type_, name)
-            if info is None:
-                self.remove_service(zc, type_, name)
-                return
-            info = ServiceInfo.from_zc_info(info)
-            msg = UpdateMessage(info)
-            run_on_loop(self.add_message(msg), self.mainloop)
+            self.mainloop.call_soon_threadsafe(
+                self.schedule_resolve, type_, name, UpdateMessage,
+            )
+
+    def _on_service_removed(self, type_: str, name: str):
+        info = ServiceInfo(type_=type_, name=name)
+        self.resolve_cache.pop(info.id, None)
+        task = self._resolve_tasks.pop(info.id, None)
+        if task is not None:
+            task.cancel()
+        asyncio.ensure_future(self.add_message(RemovedMessage(info)))
+
+    def schedule_resolve(self, type_: str, name: str, msg_cls: type = AddedMessage) -> asyncio.Task:
+        """Start resolving a service in the background
+
+        If a resolution for the same service is already in progress, it is
+        cancelled and replaced.
+
+        This method is not thread-safe and must be called from within the
+        :attr:`mainloop`.
+
+        Arguments:
+            type_ (str): Fully qualified service type
+            name (str): Fully qualified service name
+            msg_cls: The :class:`BrowserMessage` subclass to add to the
+                :attr:`message_queue` once resolved
+
+        """
+        service_id = (type_, name)
+        prev_task = self._resolve_tasks.get(service_id)
+        if prev_task is not None:
+            prev_task.cancel()
+            # Handles both new and existing services
+            msg_cls = UpdateMessage
+        use_cache = msg_cls is AddedMessage
+        task = asyncio.ensure_future(self.resolve_service(type_, name, msg_cls, use_cache))
+        self._resolve_tasks[service_id] = task
+        def on_done(t):
+            if self._resolve_tasks.get(service_id) is t:
+                del self._resolve_tasks[service_id]
+        task.add_done_callback(on_done)
+        return task
+
+    async def get_service_info(self, type_: str, name: str) -> Optional[ServiceInfo]:
+        """Request information for a service from the network
+
+        Returns:
+            A :class:`ServiceInfo` instance or ``None`` if the service could
+            not be resolved within :attr:`resolve_timeout`
+
+        """
+        if self.async_zeroconf is None:
+            return None
+        timeout = int(self.resolve_timeout * 1000)
+        zc_info = await self.async_zeroconf.async_get_service_info(type_, name, timeout)
+        if zc_info is None:
+            return None
+        return ServiceInfo.from_zc_info(zc_info)
+
+    async def resolve_service(
+        self,
+        type_: str,
+        name: str,
+        msg_cls: type = AddedMessage,
+        use_cache: Optional[bool] = True
+    ) -> Optional[ServiceInfo]:
+        """Resolve a service and add a message for it to the :attr:`message_queue`
+
+        No more than :attr:`max_concurrent_resolve` services are resolved
+        at once.
+
+        Arguments:
+            type_ (str): Fully qualified service type
+            name (str): Fully qualified service name
+            msg_cls: The :class:`BrowserMessage` subclass to use
+            use_cache (bool, optional): If ``True`` (the default), use the
+                :attr:`resolve_cache` entry for the service if one exists and
+                has not expired
+
+        Returns:
+            The resolved :class:`ServiceInfo` or ``None`` if it could not be
+            resolved
+
+        """
+        service_id = (type_, name)
+        now = time.monotonic()
+        cached = self.resolve_cache.get(service_id)
+        if use_cache and cached is not None and now - cached[0] < self.resolve_cache_ttl:
+            info = cached[1]
+        else:
+            async with self._resolve_semaphore:
+                info = await self.get_service_info(type_, name)
+        if info is None:
+            self.resolve_cache.pop(service_id, None)
+            if msg_cls is UpdateMessage:
+                await self.add_message(RemovedMessage(ServiceInfo(type_=type_, name=name)))
+            else:
+                logger.warning(f'Could not resolve service "{name}"')
+            return None
+        self.resolve_cache[service_id] = (time.monotonic(), info)
+        cur = self.services.get(service_id)
+        if cur is not None:
+            if cur.fingerprint == info.fingerprint:
+                # Repeated announcement, nothing has changed
+                self.discovery_counters['duplicates'] += 1
+                return info
+            msg_cls = UpdateMessage
+        await self.add_message(msg_cls(info))
+        return info
 
     async def get_local_ifaces(self, refresh: Optional[bool] = False) -> List[ipaddress.IPv4Interface]:
         ifaces = getattr(self, '_local_ifaces', None)
@@ -522,10 +678,136 @@ class Listener(Dispatcher):
         del self.published_services[service_id]
         await run_on_loop(self.add_message(msg), self.mainloop)
 
+class DiscoveryCache(object):
+    """On-disk record of discovered Blackmagic devices
+
+    Allows devices to be contacted at their last known address as soon as
+    :class:`BMDDiscovery` starts, before any announcements are received.
+
+    Arguments:
+        filename (str): The file to store the cache in
+        max_age (float, optional): Entries not seen for this number of seconds
+            are discarded when loaded. Defaults to ``86400`` (one day)
+        save_delay (float, optional): Time (in seconds) to wait after a change
+            before saving. Defaults to ``1``
+
+    Attributes:
+        entries (dict): The cached devices stored by their unique id. Each
+            value is a ``dict`` with the ``'id'``, ``'device_type'``,
+            ``'type'``, ``'name'``, ``'address'``, ``'port'``,
+            ``'properties'`` and ``'last_seen'`` of the device
+
+    """
+    def __init__(self, filename: str, max_age: Optional[float] = 86400, save_delay: Optional[float] = 1):
+        self.filename = os.path.expanduser(filename)
+        self.max_age = max_age
+        self.save_delay = save_delay
+        self.entries = {}
+        self._save_handle = None
+        self._save_task = None
+
+    @staticmethod
+    def filename_for(config_filename: str) -> str:
+        """Get the cache filename to use alongside the given config filename
+
+        ``"~/vidhubcontrol.json"`` becomes ``"~/vidhubcontrol.discovery.json"``
+        """
+        root, ext = os.path.splitext(os.path.expanduser(config_filename))
+        return ''.join([root, '.discovery', ext or '.json'])
+
+    def load(self):
+        """Read entries from :attr:`filename`, discarding any that have expired
+        """
+        self.entries.clear()
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not read discovery cache: {e}')
+            return
+        now = time.time()
+        for entry in data.get('devices', []):
+            if now - entry.get('last_seen', 0) > self.max_age:
+                continue
+            self.entries[entry['id']] = entry
+
+    def update(self, bmd_id: str, device_type: str, info: ServiceInfo):
+        """Store the endpoint of a discovered device and schedule a save
+        """
+        if not len(info.addresses):
+            return
+        self.entries[bmd_id] = {
+            'id':bmd_id,
+            'device_type':device_type,
+            'type':info.type,
+            'name':info.name,
+            'address':str(info.address),
+            'port':info.port,
+            'properties':dict(info.properties),
+            'last_seen':time.time(),
+        }
+        self.schedule_save()
+
+    def get_service_info(self, entry: Dict) -> ServiceInfo:
+        """Create a :class:`ServiceInfo` from a cache entry
+        """
+        return ServiceInfo(
+            type_=entry['type'],
+            name=entry['name'],
+            port=entry['port'],
+            addresses=[unpack_ip_address(entry['address'])],
+            properties=entry['properties'],
+        )
+
+    def schedule_save(self):
+        if self._save_handle is not None:
+            return
+        loop = asyncio.get_event_loop()
+        self._save_handle = loop.call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        self._save_handle = None
+        data = json.dumps({'devices':list(self.entries.values())}, indent=2)
+        loop = asyncio.get_event_loop()
+        self._save_task = asyncio.ensure_future(
+            self._save_in_executor(loop, data, self._save_task)
+        )
+
+    async def _save_in_executor(self, loop, data, prev_task):
+        if prev_task is not None:
+            await prev_task
+        try:
+            await loop.run_in_executor(None, atomic_write, self.filename, data)
+        except Exception as e:
+            logger.exception(e)
+
+    async def flush(self):
+        """Write any pending changes immediately and wait for completion
+        """
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._start_save()
+        if self._save_task is not None:
+            await self._save_task
+
 class BMDDiscovery(Listener):
     """Zeroconf listener for Blackmagic devices
 
+    The ``bmd_service_added`` and ``bmd_service_updated`` events are held
+    for :attr:`settle_window` seconds after the first change for a device.
+    Any changes for the same device within that time are merged into a
+    single event containing the latest :class:`ServiceInfo`.
+
+    If a :class:`DiscoveryCache` is given, devices found in it are emitted
+    with ``bmd_service_added`` (with the keyword argument ``cached=True``)
+    when the listener starts. Live announcements are stored in the cache.
+
     Attributes:
+        settle_window (float): Time (in seconds) to merge changes for each
+            device. Defaults to ``.25``
+        cache: A :class:`DiscoveryCache` instance or ``None``
         vidhubs: Contains discovered Videohub devices.
             This :class:`~pydispatch.properties.DictProperty` can be used to
             subscribe to changes.
@@ -541,8 +823,12 @@ class BMDDiscovery(Listener):
     smart_views: Dict[str, ServiceInfo] = DictProperty()
     smart_scopes: Dict[str, ServiceInfo] = DictProperty()
     _events_ = ['bmd_service_added', 'bmd_service_updated', 'bmd_service_removed']
-    def __init__(self, mainloop, service_type='_blackmagic._tcp.local.'):
-        super().__init__(mainloop, service_type)
+    def __init__(self, mainloop, service_type='_blackmagic._tcp.local.', **kwargs):
+        self.settle_window = kwargs.pop('settle_window', .25)
+        self.cache = kwargs.pop('cache', None)
+        super().__init__(mainloop, service_type, **kwargs)
+        self._pending_bmd_events = {}
+        self._settle_handles = {}
         self.bind_async(
             mainloop,
             service_added=self._add_bmd_service_info,
@@ -569,7 +855,7 @@ class BMDDiscovery(Listener):
                     self.smart_views[bmd_id] = info
                     device_type = 'smartview'
         kwargs['device_type'] = device_type
-        self.emit('bmd_service_added', info, **kwargs)
+        self._queue_bmd_event('bmd_service_added', info, kwargs)
 
     async def _update_bmd_service_info(self, info: ServiceInfo, **kwargs):
         device_cls = info.properties['class']
@@ -589,7 +875,61 @@ class BMDDiscovery(Listener):
                 raise KeyError(f'Cannot find entry for "{info!r}"')
         assert o.id == info.id
         kwargs['device_type'] = device_type
-        self.emit('bmd_service_updated', info, **kwargs)
+        self._queue_bmd_event('bmd_service_updated', info, kwargs)
+
+    def _queue_bmd_event(self, event_name: str, info: ServiceInfo, kwargs: Dict):
+        bmd_id = kwargs['id']
+        pending = self._pending_bmd_events.get(bmd_id)
+        if pending is not None and pending[0] == 'bmd_service_added':
+            # The device hasn't been announced yet
+            event_name = 'bmd_service_added'
+        self._pending_bmd_events[bmd_id] = (event_name, info, kwargs)
+        if bmd_id not in self._settle_handles:
+            self._settle_handles[bmd_id] = self.mainloop.call_later(
+                self.settle_window, self._emit_bmd_event, bmd_id,
+            )
+
+    def _emit_bmd_event(self, bmd_id: str):
+        del self._settle_handles[bmd_id]
+        event_name, info, kwargs = self._pending_bmd_events.pop(bmd_id)
+        if self.cache is not None:
+            self.cache.update(bmd_id, kwargs['device_type'], info)
+        self.emit(event_name, info, **kwargs)
+
+    def _emit_cached_services(self):
+        for bmd_id, entry in self.cache.entries.items():
+            try:
+                info = self.cache.get_service_info(entry)
+            except (KeyError, ValueError) as e:
+                logger.warning(f'Invalid discovery cache entry for "{bmd_id}": {e}')
+                continue
+            self.emit(
+                'bmd_service_added', info,
+                **{'class':info.properties.get('class'), 'id':bmd_id,
+                'device_type':entry['device_type'], 'cached':True},
+            )
+
+    async def start(self):
+        if self.running:
+            return
+        if self.cache is not None:
+            await self.mainloop.run_in_executor(None, self.cache.load)
+        await super().start()
+        if self.cache is not None:
+            self._emit_cached_services()
+
+    def _cancel_bmd_event(self, bmd_id: str):
+        h = self._settle_handles.pop(bmd_id, None)
+        if h is not None:
+            h.cancel()
+        self._pending_bmd_events.pop(bmd_id, None)
+
+    async def stop(self):
+        for bmd_id in list(self._settle_handles.keys()):
+            self._cancel_bmd_event(bmd_id)
+        await super().stop()
+        if self.cache is not None:
+            await self.cache.flush()
 
     async def _remove_bmd_service_info(self, info: ServiceInfo, **kwargs):
         device_cls = info.properties.get('class')
@@ -604,9 +944,265 @@ class BMDDiscovery(Listener):
             elif bmd_id in self.smart_scopes and device_cls == 'SmartView':
                 del self.smart_scopes[bmd_id]
                 kwargs.update({'class':device_cls, 'id':bmd_id, 'device_type':'smartscope'})
+        self._cancel_bmd_event(bmd_id)
         self.emit('bmd_service_removed', info, **kwargs)
 
 
+def parse_bmd_preamble(data: str) -> Optional[Dict[str, str]]:
+    """Identify a Blackmagic device from the start of its protocol preamble
+
+    Arguments:
+        data (str): Text read from the device's control port, including at
+            least the ``"PROTOCOL PREAMBLE:"`` and device sections
+
+    Returns:
+        A ``dict`` of service properties (``'class'``, ``'unique id'``,
+        ``'name'`` and ``'protocol version'``) or ``None`` if the data is not
+        from a supported device
+
+    """
+    sections = {}
+    for block in data.replace('\r', '').split('\n\n'):
+        lines = [line for line in block.split('\n') if line]
+        if len(lines):
+            sections[lines[0]] = split_section_values(lines[1:])
+    preamble = sections.get('PROTOCOL PREAMBLE:')
+    if preamble is None:
+        return None
+    props = {'protocol version':preamble.get('Version', '')}
+    if 'VIDEOHUB DEVICE:' in sections:
+        values = sections['VIDEOHUB DEVICE:']
+        if 'Unique ID' not in values:
+            return None
+        props['class'] = 'Videohub'
+        props['unique id'] = values['Unique ID']
+        props['name'] = values.get('Model name', 'Videohub')
+    elif 'SMARTVIEW DEVICE:' in sections:
+        values = sections['SMARTVIEW DEVICE:']
+        hostname = values.get('Hostname', '')
+        if '-' not in hostname:
+            return None
+        props['class'] = 'SmartView'
+        props['unique id'] = hostname.split('-')[1]
+        props['name'] = values.get('Model', 'SmartView')
+    else:
+        return None
+    return props
+
+class SubnetSweeper(object):
+    """Active discovery of Blackmagic devices for networks where
+    multicast (mDNS) is not available
+
+    Connects to the control ports of every host in the given networks and
+    reads the protocol preamble to identify the device. Devices that are
+    found are passed to :meth:`Listener.update_service_info` of the
+    :attr:`listener` (a :class:`BMDDiscovery`), so they are handled the same
+    way as devices announced by Zeroconf.
+
+    The number of connections open at once is limited by
+    :attr:`max_concurrent` and new connections are started no faster than
+    :attr:`rate` per second.
+
+    Arguments:
+        mainloop (:class:`asyncio.BaseEventLoop`): asyncio event loop instance
+        listener: The :class:`BMDDiscovery` instance to add devices to
+        networks: An iterable of networks to sweep as CIDR strings or
+            :class:`ipaddress.IPv4Network` instances
+
+    Keyword Arguments:
+        ports: The ports to probe on each host. Defaults to :attr:`DEFAULT_PORTS`
+        max_concurrent (int): Value for :attr:`max_concurrent`. Defaults to ``256``
+        rate (float): Value for :attr:`rate`. Defaults to ``1000``
+        connect_timeout (float): Time (in seconds) to wait for each connection.
+            Defaults to ``.5``
+        read_timeout (float): Time (in seconds) to wait for the preamble.
+            Defaults to ``1``
+        interval (float): If given, sweeps are repeated with this delay (in
+            seconds) between them. Otherwise only one sweep is made
+
+    Attributes:
+        found: Devices found as :class:`ServiceInfo` instances, stored by
+            their unique id
+        counters (dict): Counts of ``'probes'`` (connections attempted),
+            ``'open'`` (ports that accepted a connection) and ``'found'``
+            (devices identified)
+
+    """
+    DEFAULT_PORTS = (9990, 9991, 9992)
+    SERVICE_TYPE = '_blackmagic._tcp.local.'
+    MAX_PREAMBLE_SIZE = 8192
+    found: Dict[str, ServiceInfo]
+    def __init__(self, mainloop, listener, networks, **kwargs):
+        self.mainloop = mainloop
+        self.listener = listener
+        self.networks = [ipaddress.ip_network(n, strict=False) for n in networks]
+        self.ports = tuple(kwargs.get('ports', self.DEFAULT_PORTS))
+        self.max_concurrent = kwargs.get('max_concurrent', 256)
+        self.rate = kwargs.get('rate', 1000)
+        self.connect_timeout = kwargs.get('connect_timeout', .5)
+        self.read_timeout = kwargs.get('read_timeout', 1)
+        self.interval = kwargs.get('interval')
+        self.found = {}
+        self.counters = {'probes':0, 'open':0, 'found':0}
+        self._next_probe = None
+        self._run_task = None
+
+    def iter_endpoints(self):
+        for network in self.networks:
+            for host in network.hosts():
+                for port in self.ports:
+                    yield str(host), port
+
+    async def start(self):
+        """Start sweeping in the background
+        """
+        if self._run_task is not None:
+            return
+        self._run_task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        t = self._run_task
+        if t is None:
+            return
+        self._run_task = None
+        t.cancel()
+        try:
+            await t
+        except asyncio.CancelledError:
+            pass
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Log and keep going so one bad sweep doesn't stop them all
+                logger.exception(exc)
+            if self.interval is None:
+                break
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> List[ServiceInfo]:
+        """Probe every host and port once
+
+        Returns:
+            A ``list`` of :class:`ServiceInfo` for the devices found
+
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        tasks = set()
+        results = []
+        async def probe(host, port):
+            try:
+                info = await self.probe(host, port)
+            finally:
+                semaphore.release()
+            if info is not None:
+                results.append(info)
+                await self.add_device(info)
+        try:
+            for host, port in self.iter_endpoints():
+                await semaphore.acquire()
+                await self._wait_for_rate()
+                t = asyncio.ensure_future(probe(host, port))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+            if len(tasks):
+                await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for t in tasks:
+                t.cancel()
+            raise
+        return results
+
+    async def _wait_for_rate(self):
+        now = self.mainloop.time()
+        if self._next_probe is None or self._next_probe < now:
+            self._next_probe = now
+        delay = self._next_probe - now
+        self._next_probe += 1 / self.rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def probe(self, host: str, port: int) -> Optional[ServiceInfo]:
+        """Connect to a single host and port and identify the device
+
+        Returns:
+            A :class:`ServiceInfo` or ``None`` if no supported device was found
+
+        """
+        self.counters['probes'] += 1
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, limit=self.MAX_PREAMBLE_SIZE),
+                self.connect_timeout,
+            )
+        except (OSError, asyncio.TimeoutError):
+            return None
+        self.counters['open'] += 1
+        try:
+            data = await asyncio.wait_for(self._read_preamble(reader), self.read_timeout)
+        except (
+            OSError, asyncio.TimeoutError, ValueError,
+            asyncio.LimitOverrunError, asyncio.IncompleteReadError,
+        ):
+            # Other services may send long lines or binary data
+            return None
+        finally:
+            writer.close()
+        props = parse_bmd_preamble(data)
+        if props is None:
+            return None
+        bmd_id = props['unique id'].upper()
+        name = f'{props["name"]}-{bmd_id}.{self.SERVICE_TYPE}'
+        return ServiceInfo(
+            type_=self.SERVICE_TYPE, name=name, port=port,
+            addresses=[ipaddress.ip_address(host)], properties=props,
+        )
+
+    async def _read_preamble(self, reader: asyncio.StreamReader) -> str:
+        # Read until the end of the device section (the second block)
+        lines = []
+        num_bytes = 0
+        blocks = 0
+        while num_bytes < self.MAX_PREAMBLE_SIZE:
+            line = await reader.readline()
+            if not line:
+                break
+            num_bytes += len(line)
+            line = line.decode('UTF-8', 'replace').rstrip('\r\n')
+            lines.append(line)
+            if not line:
+                blocks += 1
+                if blocks >= 2:
+                    break
+        return '\n'.join(lines)
+
+    async def add_device(self, info: ServiceInfo):
+        bmd_id = info.properties['unique id'].upper()
+        listener = self.listener
+        for prop in [listener.vidhubs, listener.smart_views, listener.smart_scopes]:
+            existing = prop.get(bmd_id)
+            if existing is None:
+                continue
+            # Keep the service name and properties if the device has already
+            # been found (possibly through Zeroconf) so only endpoint changes
+            # are treated as updates
+            info = ServiceInfo(
+                type_=existing.type, name=existing.name, server=existing.server,
+                port=info.port, addresses=info.addresses,
+                properties=existing.properties.copy(),
+            )
+            break
+        if bmd_id not in self.found:
+            self.counters['found'] += 1
+        self.found[bmd_id] = info
+        logger.debug(f'Sweep found {info!r}')
+        await self.listener.update_service_info(info)
+
+
 def main():
     loop = asyncio.get_event_loop()
     loop.set_debug(True)
@@ -1,3 +1,3 @@
-from .node import OscNode, PubSubOscNode
-from .server import OSCUDPServer, OscDispatcher
+from .node import OscNode, PubSubOscNode, LazyPubSubOscNode
+from .server import OSCUDPServer, OSCTCPServer, OscDispatcher
 from .interface import OscInterface
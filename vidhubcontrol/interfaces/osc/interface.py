@@ -1,12 +1,14 @@
 import asyncio
 import ipaddress
+import weakref
 
 from pydispatch import Dispatcher, Property
 from pydispatch.properties import DictProperty
 
 from vidhubcontrol.utils import find_ip_addresses
-from .node import OscNode, PubSubOscNode
-from .server import OSCUDPServer, OscDispatcher
+from vidhubcontrol.backends.base import get_changed_indices
+from .node import OscNode, PubSubOscNode, LazyPubSubOscNode
+from .server import OSCUDPServer, OSCTCPServer, OscDispatcher, MAX_DATAGRAM_SIZE
 
 
 class OscInterface(Dispatcher):
@@ -21,10 +23,16 @@ class OscInterface(Dispatcher):
     vidhubs_by_name = DictProperty()
     def __init__(self, **kwargs):
         self.event_loop = kwargs.get('event_loop', asyncio.get_event_loop())
+        self._vidhub_confs_by_manager = {}
         self.bind_async(self.event_loop, config=self.on_config)
         self.config = kwargs.get('config')
         self.iface_name = kwargs.get('iface_name')
         self.hostport = kwargs.get('hostport', 9000)
+        self.max_datagram_size = kwargs.get('max_datagram_size', MAX_DATAGRAM_SIZE)
+        self.tcp_hostport = kwargs.get('tcp_hostport')
+        self.tcp_max_write_queue = kwargs.get('tcp_max_write_queue', 1024)
+        self.lease_sweep_interval = kwargs.get('lease_sweep_interval', 10)
+        self._lease_sweep_task = None
         hostaddr = kwargs.get('hostaddr')
         if self.iface_name is not None:
             for iface_name, iface in find_ip_addresses(self.hostiface):
@@ -42,7 +50,9 @@ class OscInterface(Dispatcher):
                 self.hostiface = iface
                 self.iface_name = iface_name
         self.osc_dispatcher = OscDispatcher()
+        self.subscriber_registry = self.osc_dispatcher.subscriber_registry
         self.server = None
+        self.tcp_server = None
         self.root_node = OscNode(
             'vidhubcontrol',
             osc_dispatcher=self.osc_dispatcher,
@@ -59,6 +69,10 @@ class OscInterface(Dispatcher):
             cls=PubSubOscNode,
             published_property=(self, 'vidhubs_by_name'),
         )
+        clients_node = self.root_node.add_child('_clients')
+        clients_node.bind_async(self.event_loop,
+            on_message_received=self.on_clients_node_message,
+        )
         # self.root_node.add_child('vidhubs/_update')
         # subscribe_node = self.root_node.add_child('vidhubs/_subscribe')
         # query_node = self.root_node.add_child('vidhubs/_query')
@@ -86,14 +100,54 @@ class OscInterface(Dispatcher):
             if self.config.USE_DISCOVERY:
                 await self.publish_zeroconf_service()
         addr = (str(self.hostiface.ip), self.hostport)
-        self.server = OSCUDPServer(addr, self.osc_dispatcher)
+        self.server = OSCUDPServer(
+            addr, self.osc_dispatcher, max_datagram_size=self.max_datagram_size,
+        )
         await self.server.start()
+        if self.tcp_hostport is not None:
+            self.tcp_server = OSCTCPServer(
+                (addr[0], self.tcp_hostport), self.osc_dispatcher,
+                max_write_queue=self.tcp_max_write_queue,
+            )
+            await self.tcp_server.start()
+        if self._lease_sweep_task is None:
+            self._lease_sweep_task = asyncio.ensure_future(self.lease_sweep_loop())
     async def stop(self):
+        if self._lease_sweep_task is not None:
+            self._lease_sweep_task.cancel()
+            try:
+                await self._lease_sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._lease_sweep_task = None
         if self.config is not None and self.config.USE_DISCOVERY:
             await self.unpublish_zeroconf_service()
+        if self.tcp_server is not None:
+            await self.tcp_server.stop()
+        self.tcp_server = None
         if self.server is not None:
             await self.server.stop()
         self.server = None
+    async def lease_sweep_loop(self):
+        """Remove expired subscription leases every
+        :attr:`lease_sweep_interval` seconds (see
+        :meth:`~.server.SubscriberRegistry.sweep`)
+        """
+        while True:
+            await asyncio.sleep(self.lease_sweep_interval)
+            self.subscriber_registry.sweep()
+    async def on_clients_node_message(self, node, client_address, *messages):
+        # Reply with (address, subscriptions, message_rate, byte_rate) for each client
+        args = []
+        for info in self.subscriber_registry.get_client_info():
+            host, port = info['client_address'][:2]
+            args.extend([
+                '{}:{}'.format(host, port),
+                info['subscriptions'],
+                float(info['message_rate']),
+                float(info['byte_rate']),
+            ])
+        await node.send_message(client_address, *args)
     async def publish_zeroconf_service(self):
         await self.config.discovery_listener.publish_service(
             '_osc._udp.local.', self.hostport, properties={
@@ -102,8 +156,19 @@ class OscInterface(Dispatcher):
                 'types':'ifsbrTF',
             }
         )
+        if self.tcp_hostport is not None:
+            await self.config.discovery_listener.publish_service(
+                '_osc._tcp.local.', self.tcp_hostport, properties={
+                    'txtvers':'1',
+                    'version':'1.1',
+                    'types':'ifsbrTF',
+                    'framing':'slip',
+                }
+            )
     async def unpublish_zeroconf_service(self):
         await self.config.discovery_listener.unpublish_service('_osc._udp.local.')
+        if self.tcp_hostport is not None:
+            await self.config.discovery_listener.unpublish_service('_osc._tcp.local.')
     def on_vidhub_name(self, instance, value, **kwargs):
         old = kwargs.get('old')
         with self.emission_lock('vidhubs_by_name'):
@@ -117,15 +182,93 @@ class OscInterface(Dispatcher):
         config.bind_async(self.event_loop, vidhubs=self.update_config_vidhubs)
 
     async def update_config_vidhubs(self, *args, **kwargs):
+        vidhubs = self.config.vidhubs
+        keys = kwargs.get('keys')
+        if keys is None:
+            vidhub_confs = list(vidhubs.values())
+        else:
+            vidhub_confs = [vidhubs[key] for key in keys if key in vidhubs]
         coros = set()
-        for vidhub_conf in self.config.vidhubs.values():
-            if vidhub_conf.device_id is None:
+        for vidhub_conf in vidhub_confs:
+            mgr = vidhub_conf.connection_manager
+            if mgr not in self._vidhub_confs_by_manager:
+                self._vidhub_confs_by_manager[mgr] = vidhub_conf
+                mgr.bind_async(self.event_loop, state_changed=self.on_vidhub_conf_state)
+            if not self._can_add_vidhub_conf(vidhub_conf):
                 continue
-            vidhub = vidhub_conf.backend
-            coros.add(self.add_vidhub(vidhub))
+            coros.add(self.add_vidhub(vidhub_conf.backend))
         if len(coros):
             await asyncio.gather(*coros)
 
+    def _can_add_vidhub_conf(self, vidhub_conf):
+        if vidhub_conf.device_id is None:
+            return False
+        return vidhub_conf.backend.connection_state.is_connected
+
+    async def on_vidhub_conf_state(self, instance, state, **kwargs):
+        if not state.is_connected:
+            return
+        # Only the device whose state changed needs to be added
+        vidhub_conf = self._vidhub_confs_by_manager.get(instance)
+        if vidhub_conf is None or not self._can_add_vidhub_conf(vidhub_conf):
+            return
+        await self.add_vidhub(vidhub_conf.backend)
+
+
+class VidhubFeedbackListener(object):
+    """Updates the per-index nodes of a vidhub from changes to its
+    ``crosspoints`` and label properties
+
+    A single instance is shared by all nodes for a vidhub (see :meth:`get`),
+    and one binding is made for each property. When a property changes,
+    only the nodes registered for the changed indices are updated.
+
+    Attributes:
+        vidhub: The :class:`~vidhubcontrol.backends.base.VidhubBackendBase`
+            instance
+        nodes (dict): Sets of nodes stored by property name and index
+
+    """
+    _instances = weakref.WeakKeyDictionary()
+    def __init__(self, vidhub):
+        self.vidhub = vidhub
+        self.nodes = {}
+    @classmethod
+    def get(cls, vidhub):
+        """Get the listener for the given vidhub, creating it if necessary
+        """
+        obj = cls._instances.get(vidhub)
+        if obj is None:
+            obj = cls._instances[vidhub] = cls(vidhub)
+        return obj
+    def add_node(self, prop_name, node):
+        """Register a node to have its ``value`` updated from the item
+        at ``node.index`` in the given property
+        """
+        if prop_name not in self.nodes:
+            self.nodes[prop_name] = {}
+            self.vidhub.bind(**{prop_name:self.on_vidhub_property})
+        self.nodes[prop_name].setdefault(node.index, set()).add(node)
+    def remove_node(self, prop_name, node):
+        nodes_by_index = self.nodes.get(prop_name, {})
+        nodes = nodes_by_index.get(node.index)
+        if nodes is None:
+            return
+        nodes.discard(node)
+        if not len(nodes):
+            del nodes_by_index[node.index]
+    def on_vidhub_property(self, instance, value, **kwargs):
+        prop = kwargs.get('property')
+        nodes_by_index = self.nodes.get(prop.name)
+        if not nodes_by_index:
+            return
+        for i in get_changed_indices(value, kwargs.get('keys')):
+            nodes = nodes_by_index.get(i)
+            if not nodes or i >= len(value):
+                continue
+            for node in nodes:
+                node.value = value[i]
+
 
 class VidhubNode(PubSubOscNode):
     _info_properties = [
@@ -171,16 +314,20 @@ class VidhubInfoNode(PubSubOscNode):
             vidhub, prop = self.published_property
             vidhub.device_name = messages[0]
 
-class VidhubLabelNode(PubSubOscNode):
+class VidhubLabelNode(LazyPubSubOscNode):
     def __init__(self, name, parent, **kwargs):
         super().__init__(name, parent, **kwargs)
         self.vidhub = kwargs.get('vidhub')
         self.property_attr = '_'.join([self.name, 'labels'])
         self.vidhub_property = getattr(self.vidhub, self.property_attr)
-        for i, lbl in enumerate(self.vidhub_property):
-            node = self.add_child(str(i), cls=VidhubSingleLabelNode)
         self.published_property = (self.vidhub, self.property_attr)
 
+    def get_lazy_child_names(self):
+        return [str(i) for i in range(len(self.vidhub_property))]
+
+    def build_lazy_child(self, name):
+        return self.add_child(name, cls=VidhubSingleLabelNode)
+
     async def on_osc_dispatcher_message(self, osc_address, client_address, *messages):
         if not len(messages):
             lbls = self.vidhub_property[:]
@@ -210,24 +357,31 @@ class VidhubSingleLabelNode(PubSubOscNode):
         self.index = int(name)
         self.published_property = (self, 'value')
         self.value = self.parent.vidhub_property[self.index]
-        self.parent.vidhub.bind(**{self.parent.property_attr:self.on_vidhub_labels})
-    def on_vidhub_labels(self, instance, value, **kwargs):
-        self.value = value[self.index]
+        listener = VidhubFeedbackListener.get(self.parent.vidhub)
+        listener.add_node(self.parent.property_attr, self)
+    def release(self):
+        super().release()
+        listener = VidhubFeedbackListener.get(self.parent.vidhub)
+        listener.remove_node(self.parent.property_attr, self)
 
-class VidhubCrosspointNode(PubSubOscNode):
+class VidhubCrosspointNode(LazyPubSubOscNode):
     def __init__(self, name, parent, **kwargs):
         super().__init__(name, parent, **kwargs)
         self.vidhub = kwargs.get('vidhub')
-        for i in range(self.vidhub.num_outputs):
-            self.add_child(name=str(i), cls=VidhubSingleCrosspointNode, index=i)
         self.published_property = (self.vidhub, 'crosspoints')
 
+    def get_lazy_child_names(self):
+        return [str(i) for i in range(len(self.vidhub.crosspoints))]
+
+    def build_lazy_child(self, name):
+        return self.add_child(name=name, cls=VidhubSingleCrosspointNode, index=int(name))
+
     async def on_osc_dispatcher_message(self, osc_address, client_address, *messages):
         if not len(messages):
             await self.send_message(client_address, *self.vidhub.crosspoints[:])
         elif len(messages) <= len(self.vidhub.crosspoints):
             args = ((out_idx, in_idx) for out_idx, in_idx in enumerate(messages))
-            await self.vidhub.set_crosspoints(*args)
+            await self.vidhub.queue_writes('crosspoints', args)
             ## TODO: give feedback from async call
         await super().on_osc_dispatcher_message(osc_address, client_address, *messages)
 
@@ -239,16 +393,17 @@ class VidhubSingleCrosspointNode(PubSubOscNode):
         self.published_property = (self, 'value')
         self.index = kwargs.get('index')
         self.value = self.parent.vidhub.crosspoints[self.index]
-        self.parent.vidhub.bind(crosspoints=self.on_crosspoints)
-    def on_crosspoints(self, instance, value, **kwargs):
-        self.value = value[self.index]
+        VidhubFeedbackListener.get(self.parent.vidhub).add_node('crosspoints', self)
+    def release(self):
+        super().release()
+        VidhubFeedbackListener.get(self.parent.vidhub).remove_node('crosspoints', self)
 
     async def on_osc_dispatcher_message(self, osc_address, client_address, *messages):
         if not len(messages):
             await self.send_message(client_address, self.value)
         else:
             xpt = messages[0]
-            await self.parent.vidhub.set_crosspoint(self.index, xpt)
+            await self.parent.vidhub.queue_writes('crosspoints', [(self.index, xpt)])
         await super().on_osc_dispatcher_message(osc_address, client_address, *messages)
 
 class VidhubPresetGroupNode(PubSubOscNode):
@@ -49,11 +49,31 @@ class OscNode(Dispatcher):
         if osc_address.startswith('/'):
             return self.root.find(osc_address.lstrip('/'))
         if '/' not in osc_address:
-            return self.children.get(osc_address)
+            return self.get_child(osc_address)
         name = osc_address.split('/')[0]
-        child = self.children.get(name)
+        child = self.get_child(name)
         if child is not None:
             return child.find('/'.join(osc_address.split('/')[1:]))
+    def get_child(self, name):
+        """Get the child node with the given name, creating it with
+        :meth:`materialize_child` if it is not present
+        """
+        child = self.children.get(name)
+        if child is None:
+            child = self.materialize_child(name)
+        return child
+    def get_lazy_child_names(self):
+        """Names of the children that can be created on demand by
+        :meth:`materialize_child`
+        """
+        return []
+    def materialize_child(self, name):
+        """Create a child node on demand (if supported)
+
+        Returns:
+            The new child or ``None``
+        """
+        return None
     def build_osc_address(self, to_parent=None):
         path = self.name
         p = self.parent
@@ -96,6 +116,27 @@ class OscNode(Dispatcher):
         )
         self.children[child.name] = child
         return tail
+    def remove_child(self, name):
+        """Remove the child node with the given name and :meth:`release`
+        it (and its descendants)
+        """
+        child = self.children.get(name)
+        if child is None:
+            return
+        del self.children[name]
+        child.unbind(self)
+        self.unbind(child)
+        for node in child.walk():
+            node.release()
+    def release(self):
+        """Remove the handler for this node from the :attr:`osc_dispatcher`
+        """
+        if self.osc_dispatcher is None or self.osc_address is None:
+            return
+        try:
+            self.osc_dispatcher.unmap(self.osc_address, self.on_osc_dispatcher_message)
+        except ValueError:
+            pass
     def on_parent(self, instance, value, **kwargs):
         old = kwargs.get('old')
         if old is not None:
@@ -116,6 +157,8 @@ class OscNode(Dispatcher):
             child.osc_dispatcher = obj
     async def send_message(self, client_address, *args, **kwargs):
         await self.osc_dispatcher.send_message(self, client_address, *args, **kwargs)
+    async def send_message_multi(self, client_addresses, *args, **kwargs):
+        await self.osc_dispatcher.send_message_multi(self, client_addresses, *args, **kwargs)
     async def on_osc_dispatcher_message(self, osc_address, client_address, *messages):
         self.emit('on_message_received', self, client_address, *messages)
         self.emit('on_tree_message_received', self, client_address, *messages)
@@ -123,22 +166,66 @@ class OscNode(Dispatcher):
         self.emit('on_tree_message_received', node, client_address, *messages)
     def __iter__(self):
         yield from self.children.values()
-    def walk(self):
+    def walk(self, materialize=False):
         yield self
-        for child in self:
-            yield from child.walk()
+        if materialize:
+            for name in self.get_lazy_child_names():
+                self.get_child(name)
+        for child in list(self):
+            yield from child.walk(materialize)
     def __repr__(self):
         return '<{self.__class__.__name__}>: {self}'.format(self=self)
     def __str__(self):
         return str(self.osc_address)
 
 class PubSubOscNode(OscNode):
-    # spec: tuple of (instance, property_name)
+    """An :class:`OscNode` that publishes the value of a
+    :class:`~pydispatch.properties.Property` to subscribed clients
+
+    Clients subscribe by sending a message to the ``_subscribe`` child and
+    unsubscribe by sending ``False`` to it. By default, the full value is sent
+    to the node's address each time it changes.
+
+    If ``"delta"`` is sent to ``_subscribe`` and the published value is a
+    ``list``, the client instead gets a full snapshot once and then only the
+    changed items as ``index, value`` pairs, sent to the ``_delta`` child
+    (created with the first delta subscription).
+    Changes within :attr:`delta_window` seconds are combined and each
+    message contains no more than :attr:`max_delta_pairs` pairs. A new
+    snapshot can be requested using ``_query``.
+
+    Attributes:
+        published_property: A tuple of ``(instance, property_name)``
+        subscribers (set): Addresses of clients receiving the full value
+        delta_subscribers (set): Addresses of clients receiving changes
+        delta_window (float): Time (in seconds) to combine changes for
+            :attr:`delta_subscribers`. Defaults to ``.05``
+        max_delta_pairs (int): The number of ``index, value`` pairs to send in
+            each ``_delta`` message. Defaults to ``64``
+        subscription_ttl (float): Time (in seconds) a subscription lasts unless
+            renewed by subscribing again. Defaults to ``300``
+        max_subscribers (int): The number of clients that may be subscribed
+            at once. When exceeded, the subscription closest to expiring is
+            removed. Defaults to ``64``
+
+    """
     published_property = Property()
+    delta_window = .05
+    max_delta_pairs = 64
+    subscription_ttl = 300
+    max_subscribers = 64
     def __init__(self, name, parent=None, **kwargs):
         super().__init__(name, parent, **kwargs)
         self._subscriber_lock = asyncio.Lock()
         self.subscribers = set()
+        self.delta_subscribers = set()
+        self.delta_window = kwargs.get('delta_window', self.delta_window)
+        self.subscription_ttl = kwargs.get('subscription_ttl', self.subscription_ttl)
+        self.max_subscribers = kwargs.get('max_subscribers', self.max_subscribers)
+        self._leases = {}
+        self._next_expiry = None
+        self._pending_delta = {}
+        self._delta_handle = None
         subscribe_node = self.add_child('_subscribe')
         query_node = self.add_child('_query')
         list_node = self.add_child('_list')
@@ -159,24 +246,120 @@ class PubSubOscNode(OscNode):
             remove = True
         else:
             remove = False
-        await self._add_or_remove_subscriber(client_address, remove)
+        delta = len(messages) > 0 and messages[0] == 'delta'
+        await self._add_or_remove_subscriber(client_address, remove, delta)
+
+    @property
+    def subscriber_registry(self):
+        return getattr(self.osc_dispatcher, 'subscriber_registry', None)
+
+    def _remove_subscriber(self, client_address):
+        self.subscribers.discard(client_address)
+        self.delta_subscribers.discard(client_address)
+        self._leases.pop(client_address, None)
+        registry = self.subscriber_registry
+        if registry is not None:
+            registry.remove_subscription(client_address, self)
 
-    async def _add_or_remove_subscriber(self, client_address, remove):
+    def _add_lease(self, client_address):
+        if client_address not in self._leases and len(self._leases) >= self.max_subscribers:
+            oldest = min(self._leases, key=self._leases.get)
+            self._remove_subscriber(oldest)
+        expires = self.event_loop.time() + self.subscription_ttl
+        self._leases[client_address] = expires
+        self._next_expiry = min(self._leases.values())
+        registry = self.subscriber_registry
+        if registry is not None:
+            registry.add_subscription(client_address, self)
+
+    def evict_expired(self):
+        """Remove subscribers whose lease has expired
+
+        Returns:
+            list: The addresses of the removed clients
+        """
+        now = self.event_loop.time()
+        if self._next_expiry is None or now < self._next_expiry:
+            return []
+        expired = [addr for addr, expires in self._leases.items() if expires <= now]
+        for client_address in expired:
+            self._remove_subscriber(client_address)
+        if len(self._leases):
+            self._next_expiry = min(self._leases.values())
+        else:
+            self._next_expiry = None
+        return expired
+
+    async def _add_or_remove_subscriber(self, client_address, remove, delta=False):
         async with self._subscriber_lock:
             if remove:
+                self._remove_subscriber(client_address)
+            elif delta:
+                self._add_lease(client_address)
                 self.subscribers.discard(client_address)
+                self.delta_subscribers.add(client_address)
+                # Only created once needed
+                self.add_child('_delta')
             else:
+                self._add_lease(client_address)
+                self.delta_subscribers.discard(client_address)
                 self.subscribers.add(client_address)
         node = self.find('_subscribe')
         await node.send_message(client_address)
+        if delta and not remove:
+            try:
+                response = self.get_query_response()
+            except NotImplementedError:
+                return
+            await self.send_message(client_address, *response)
 
-    async def _send_to_subscribers(self, *messages):
-        coros = set()
+    async def _send_to_subscribers(self, *messages, node=None, delta=False):
+        if node is None:
+            node = self
         async with self._subscriber_lock:
-            for client_address in self.subscribers:
-                coros.add(self.send_message(client_address, *messages))
-        if len(coros):
-            await asyncio.gather(*coros)
+            self.evict_expired()
+            clients = tuple(self.delta_subscribers if delta else self.subscribers)
+        if len(clients):
+            await node.send_message_multi(clients, *messages)
+
+    def queue_delta(self, value, keys=None):
+        """Store changed items of a ``list`` value to be sent to
+        :attr:`delta_subscribers`
+
+        Arguments:
+            value (list): The current value
+            keys (optional): The changed indices. If not given, all items
+                are sent
+
+        """
+        if not len(self.delta_subscribers):
+            return
+        if keys is None:
+            keys = range(len(value))
+        for i in keys:
+            if isinstance(i, int) and i < len(value):
+                self._pending_delta[i] = value[i]
+        if self._delta_handle is None and len(self._pending_delta):
+            self._delta_handle = self.event_loop.call_later(
+                self.delta_window, self._start_delta_flush,
+            )
+
+    def _start_delta_flush(self):
+        self._delta_handle = None
+        asyncio.ensure_future(self.send_delta())
+
+    async def send_delta(self):
+        """Send all changes stored by :meth:`queue_delta` to the
+        :attr:`delta_subscribers`
+        """
+        items = sorted(self._pending_delta.items())
+        self._pending_delta.clear()
+        node = self.find('_delta')
+        for i in range(0, len(items), self.max_delta_pairs):
+            args = []
+            for item in items[i:i+self.max_delta_pairs]:
+                args.extend(item)
+            await self._send_to_subscribers(*args, node=node, delta=True)
 
     async def update_subscribers(self, *messages):
         await self._send_to_subscribers(*messages)
@@ -187,7 +370,7 @@ class PubSubOscNode(OscNode):
             recursive = 'recursive' in messages[0].lower()
         coros = set()
         if recursive:
-            for node in self.walk():
+            for node in self.walk(materialize=True):
                 if not isinstance(node, PubSubOscNode):
                     continue
                 try:
@@ -221,11 +404,13 @@ class PubSubOscNode(OscNode):
         if len(messages) and isinstance(messages[0], str):
             recursive = 'recursive' in messages[0].lower()
         if recursive:
-            child_iter = self.walk()
+            child_iter = self.walk(materialize=True)
         else:
             child_iter = self.children.values()
-        child_iter = (n for n in child_iter if n.name not in ('_query', '_subscribe', '_list'))
+        child_iter = (n for n in child_iter if n.name not in ('_query', '_subscribe', '_list', '_delta'))
         addrs = [n.build_osc_address(to_parent=self) for n in child_iter if n is not self]
+        if not recursive:
+            addrs.extend((name for name in self.get_lazy_child_names() if name not in self.children))
         node = self.find('_list')
         await node.send_message(client_address, *addrs)
 
@@ -242,8 +427,97 @@ class PubSubOscNode(OscNode):
     async def on_published_property_change(self, instance, value, **kwargs):
         if isinstance(value, list):
             args = value
-        elif isinstance(value, dict):
-            args = value.keys()
+            self.queue_delta(value, kwargs.get('keys'))
         else:
-            args = [value]
+            if isinstance(value, dict):
+                args = value.keys()
+            else:
+                args = [value]
+            # Delta mode only applies to lists
+            await self._send_to_subscribers(*args, delta=True)
         await self.update_subscribers(*args)
+
+
+class LazyPubSubOscNode(PubSubOscNode):
+    """A :class:`PubSubOscNode` with children that are only created when needed
+
+    The names given by :meth:`get_lazy_child_names` are listed as children,
+    but each is only built (using :meth:`build_lazy_child`) when it is first
+    found by address, either locally or by the :attr:`osc_dispatcher`.
+    Built children that have no subscribers are removed after not being
+    used for :attr:`lazy_node_ttl` seconds.
+
+    Attributes:
+        lazy_node_ttl (float): Time (in seconds) to keep an unused child.
+            Defaults to ``60``
+
+    """
+    lazy_node_ttl = 60
+    def __init__(self, name, parent=None, **kwargs):
+        self._lazy_access = {}
+        self._release_handles = {}
+        super().__init__(name, parent, **kwargs)
+        self.lazy_node_ttl = kwargs.get('lazy_node_ttl', self.lazy_node_ttl)
+
+    def get_lazy_child_names(self):
+        raise NotImplementedError()
+
+    def build_lazy_child(self, name):
+        raise NotImplementedError()
+
+    def materialize_child(self, name):
+        if name not in self.get_lazy_child_names():
+            return None
+        child = self.build_lazy_child(name)
+        self.touch_child(name)
+        return child
+
+    def touch_child(self, name):
+        """Mark the given child as used and schedule its release
+        """
+        self._lazy_access[name] = self.event_loop.time()
+        if name not in self._release_handles:
+            self._release_handles[name] = self.event_loop.call_later(
+                self.lazy_node_ttl, self._check_release, name,
+            )
+
+    def _check_release(self, name):
+        del self._release_handles[name]
+        child = self.children.get(name)
+        if child is None:
+            self._lazy_access.pop(name, None)
+            return
+        subscribed = any(
+            len(node.subscribers) or len(node.delta_subscribers)
+            for node in child.walk() if isinstance(node, PubSubOscNode)
+        )
+        remaining = self._lazy_access[name] + self.lazy_node_ttl - self.event_loop.time()
+        if subscribed or remaining > 0:
+            delay = self.lazy_node_ttl if subscribed else remaining
+            self._release_handles[name] = self.event_loop.call_later(
+                delay, self._check_release, name,
+            )
+            return
+        del self._lazy_access[name]
+        self.remove_child(name)
+
+    def on_osc_dispatcher(self, instance, obj, **kwargs):
+        super().on_osc_dispatcher(instance, obj, **kwargs)
+        if obj is not None:
+            obj.set_resolver(self.osc_address, self)
+
+    def release(self):
+        super().release()
+        for handle in self._release_handles.values():
+            handle.cancel()
+        self._release_handles.clear()
+        if self.osc_dispatcher is not None and self.osc_address is not None:
+            self.osc_dispatcher.set_resolver(self.osc_address, None)
+
+    async def on_child_message_received(self, node, client_address, *messages):
+        child = node
+        while child.parent is not self:
+            child = child.parent
+        if child.name in self._lazy_access:
+            self.touch_child(child.name)
+        await super().on_child_message_received(node, client_address, *messages)
@@ -1,23 +1,444 @@
 import asyncio
 import time
+import re
+import heapq
+import functools
+import weakref
+from loguru import logger
 
 from pythonosc import osc_server, osc_bundle, osc_message, osc_packet
 from pythonosc.osc_bundle_builder import OscBundleBuilder
 from pythonosc.osc_message_builder import OscMessageBuilder
 import pythonosc.dispatcher
 
+from vidhubcontrol import metrics
+from vidhubcontrol.utils import current_task
+
+MAX_DATAGRAM_SIZE = 1400
+"""Default size limit (in bytes) for datagrams sent by :class:`OSCUDPServer`
+"""
+
+BUNDLE_HEADER_SIZE = 16
+"""Size of the ``"#bundle"`` tag and timetag at the start of each bundle"""
+
+PACKETS_RECEIVED = metrics.counter(
+    'vidhubcontrol_osc_packets_received_total', 'OSC packets received', ['transport'],
+)
+BYTES_RECEIVED = metrics.counter(
+    'vidhubcontrol_osc_bytes_received_total', 'OSC bytes received', ['transport'],
+)
+PACKETS_SENT = metrics.counter(
+    'vidhubcontrol_osc_packets_sent_total', 'OSC packets sent', ['transport'],
+)
+BYTES_SENT = metrics.counter(
+    'vidhubcontrol_osc_bytes_sent_total', 'OSC bytes sent', ['transport'],
+)
+QUEUE_DEPTH = metrics.gauge(
+    'vidhubcontrol_osc_queue_depth', 'Items waiting in the OSC server queues', ['queue'],
+)
+
+def build_bundles(timestamp, messages, max_size=MAX_DATAGRAM_SIZE):
+    """Pack messages into as few bundles as possible without exceeding
+    *max_size* bytes per bundle
+
+    The bundle sizes are tracked as messages are added so no bundle is built
+    more than once. Message order is preserved across the bundles. A message
+    too large to fit within *max_size* is placed in a bundle by itself.
+
+    Arguments:
+        timestamp: The timetag to use for each bundle
+        messages: An iterable of :class:`pythonosc.osc_message.OscMessage`
+            instances
+        max_size (int): The size limit (in bytes) for each bundle
+
+    Yields:
+        :class:`pythonosc.osc_bundle.OscBundle`
+
+    """
+    builder = None
+    size = 0
+    for message in messages:
+        # Each element is prefixed with its size as an int32
+        msg_size = message.size + 4
+        if builder is not None and size + msg_size > max_size:
+            yield builder.build()
+            builder = None
+        if builder is None:
+            builder = OscBundleBuilder(timestamp)
+            size = BUNDLE_HEADER_SIZE
+        builder.add_content(message)
+        size += msg_size
+    if builder is not None:
+        yield builder.build()
+
+SLIP_END = b'\xc0'
+SLIP_ESC = b'\xdb'
+SLIP_ESC_END = b'\xdb\xdc'
+SLIP_ESC_ESC = b'\xdb\xdd'
+
+def slip_encode(data):
+    """Frame a packet using SLIP (:rfc:`1055`) as specified by OSC 1.1
+
+    The "double-END" form is used: the packet is both preceded and followed
+    by an ``END`` byte.
+    """
+    data = data.replace(SLIP_ESC, SLIP_ESC_ESC).replace(SLIP_END, SLIP_ESC_END)
+    return b''.join([SLIP_END, data, SLIP_END])
+
+def slip_decode(data):
+    """Remove SLIP escapes from a single frame (without ``END`` bytes)
+    """
+    return data.replace(SLIP_ESC_END, SLIP_END).replace(SLIP_ESC_ESC, SLIP_ESC)
+
+class SlipDecoder(object):
+    """Incrementally split a stream of SLIP-framed data into packets
+
+    Attributes:
+        max_packet_size (int): Frames larger than this (in bytes) are
+            discarded
+
+    """
+    def __init__(self, max_packet_size=65536):
+        self.max_packet_size = max_packet_size
+        self._buffer = bytearray()
+        self._discarding = False
+    def feed(self, data):
+        """Add data received from the stream
+
+        Returns:
+            list: Any packets completed by the data
+
+        """
+        packets = []
+        frames = data.split(SLIP_END)
+        for i, frame in enumerate(frames):
+            if not self._discarding:
+                self._buffer.extend(frame)
+                if len(self._buffer) > self.max_packet_size * 2:
+                    self._buffer.clear()
+                    self._discarding = True
+            if i == len(frames) - 1:
+                # The last frame is incomplete
+                break
+            if not self._discarding and len(self._buffer):
+                packet = slip_decode(bytes(self._buffer))
+                if len(packet) <= self.max_packet_size:
+                    packets.append(packet)
+            self._buffer.clear()
+            self._discarding = False
+        return packets
+
+OSC_PATTERN_CHARS = frozenset('*?[]{}')
+
+@functools.lru_cache(maxsize=1024)
+def compile_osc_pattern(pattern):
+    """Compile one part of an OSC address pattern into a regular expression
+
+    Supports the ``*``, ``?``, ``[...]`` (including ``[!...]`` and ranges)
+    and ``{a,b}`` forms from the OSC 1.0 specification. Results are cached
+    per pattern.
+
+    Returns:
+        A compiled :class:`re.Pattern` to be used with ``fullmatch``
+
+    """
+    result = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        end = -1
+        if c == '[':
+            end = pattern.find(']', i)
+            if end != -1:
+                body = pattern[i+1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                result.append('[{}]'.format(body))
+        elif c == '{':
+            end = pattern.find('}', i)
+            if end != -1:
+                choices = pattern[i+1:end].split(',')
+                result.append('(?:{})'.format('|'.join(re.escape(ch) for ch in choices)))
+        if end != -1:
+            i = end + 1
+            continue
+        if c == '*':
+            result.append('[^/]*')
+        elif c == '?':
+            result.append('[^/]')
+        else:
+            result.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(result))
+
+class ClientStats(object):
+    """Traffic and subscription information for a single client
+
+    Attributes:
+        client_address: The ``(host, port)`` of the client
+        subscriptions: The :class:`~.node.PubSubOscNode` instances the
+            client is subscribed to (stored as weak references)
+        messages (int): Total number of messages sent to the client
+        bytes (int): Total number of bytes sent to the client
+        message_rate (float): Messages per second, calculated by
+            :meth:`SubscriberRegistry.sweep`
+        byte_rate (float): Bytes per second, calculated by
+            :meth:`SubscriberRegistry.sweep`
+
+    """
+    __slots__ = (
+        'client_address', 'subscriptions', 'messages', 'bytes',
+        'message_rate', 'byte_rate', '_sample', '__weakref__',
+    )
+    def __init__(self, client_address, now):
+        self.client_address = client_address
+        self.subscriptions = weakref.WeakSet()
+        self.messages = 0
+        self.bytes = 0
+        self.message_rate = 0.
+        self.byte_rate = 0.
+        self._sample = (now, 0, 0)
+    def update_rates(self, now):
+        t, messages, num_bytes = self._sample
+        elapsed = now - t
+        if elapsed <= 0:
+            return
+        self.message_rate = (self.messages - messages) / elapsed
+        self.byte_rate = (self.bytes - num_bytes) / elapsed
+        self._sample = (now, self.messages, self.bytes)
+
+class SubscriberRegistry(object):
+    """Tracks subscriptions and traffic for all clients of an
+    :class:`OscDispatcher`
+
+    Attributes:
+        clients (dict): :class:`ClientStats` instances stored by client address
+
+    """
+    def __init__(self):
+        self.clients = {}
+    def _get_client(self, client_address):
+        stats = self.clients.get(client_address)
+        if stats is None:
+            stats = ClientStats(client_address, time.monotonic())
+            self.clients[client_address] = stats
+        return stats
+    def add_subscription(self, client_address, node):
+        self._get_client(client_address).subscriptions.add(node)
+    def remove_subscription(self, client_address, node):
+        stats = self.clients.get(client_address)
+        if stats is not None:
+            stats.subscriptions.discard(node)
+    def record_send(self, client_address, num_bytes, num_messages=1):
+        stats = self._get_client(client_address)
+        stats.messages += num_messages
+        stats.bytes += num_bytes
+    def sweep(self):
+        """Evict expired subscriptions and update the client rates
+
+        Clients without subscriptions are removed once no messages have been
+        sent to them since the previous sweep.
+        """
+        now = time.monotonic()
+        for client_address, stats in list(self.clients.items()):
+            for node in list(stats.subscriptions):
+                node.evict_expired()
+            last_messages = stats._sample[1]
+            stats.update_rates(now)
+            if not len(stats.subscriptions) and stats.messages == last_messages:
+                del self.clients[client_address]
+    def get_client_info(self):
+        """Get a summary for each client
+
+        Returns:
+            A ``list`` of ``dict`` with the keys ``'client_address'``,
+            ``'subscriptions'``, ``'messages'``, ``'bytes'``,
+            ``'message_rate'`` and ``'byte_rate'``
+        """
+        return [dict(
+            client_address=stats.client_address,
+            subscriptions=len(stats.subscriptions),
+            messages=stats.messages,
+            bytes=stats.bytes,
+            message_rate=stats.message_rate,
+            byte_rate=stats.byte_rate,
+        ) for stats in self.clients.values()]
+
+class _RouteNode(object):
+    __slots__ = ('children', 'handlers', 'resolver')
+    def __init__(self):
+        self.children = {}
+        self.handlers = None
+        self.resolver = None
+
 class OscDispatcher(pythonosc.dispatcher.Dispatcher):
+    """Dispatcher using a tree of address parts to find handlers
+
+    Messages are sent using :attr:`server` (an :class:`OSCUDPServer`) unless
+    the destination is a stream connection in :attr:`connections`
+    (registered by :class:`OSCTCPServer`).
+
+    Each mapped address is split on ``"/"`` and stored in a tree, so finding
+    the handlers for a message address takes one ``dict`` lookup per address
+    part rather than a comparison with every mapped address. Parts
+    containing OSC pattern characters are matched against the children at
+    that level using :func:`compile_osc_pattern`.
+
+    A node may be set as the "resolver" for its address using
+    :meth:`set_resolver`. Its lazily created children are then built
+    (and mapped) the first time a message addresses them.
+    """
     def __init__(self, server=None):
         super().__init__()
         self.server = server
-        self.dispatch_queue = asyncio.Queue()
-    async def send_message(self, node, client_address, *args, **kwargs):
-        when = kwargs.get('when', time.time())
+        self.connections = {}
+        self.scheduler = OscScheduler()
+        self.subscriber_registry = SubscriberRegistry()
+        self._route_root = _RouteNode()
+        self._pattern_map = {}
+    def map(self, address, handler, *args, needs_reply_address=False):
+        handlerobj = super().map(address, handler, *args, needs_reply_address=needs_reply_address)
+        if address is not None:
+            if OSC_PATTERN_CHARS.isdisjoint(address):
+                route = self._route_root
+                for part in address.split('/'):
+                    route = route.children.setdefault(part, _RouteNode())
+                route.handlers = self._map[address]
+            else:
+                self._pattern_map[address] = self._map[address]
+        return handlerobj
+    def set_resolver(self, address, node):
+        """Set (or clear) the node used to create children for the given address
+
+        Arguments:
+            address (str): The address of *node*
+            node: An :class:`~.node.OscNode` that implements
+                :meth:`~.node.OscNode.get_lazy_child_names` and
+                :meth:`~.node.OscNode.get_child`, or ``None`` to remove it
+
+        """
+        if node is None:
+            routes = self._get_routes(address)
+            if routes is not None:
+                routes[-1].resolver = None
+                self._prune_routes(address, routes)
+            return
+        route = self._route_root
+        for part in address.split('/'):
+            route = route.children.setdefault(part, _RouteNode())
+        route.resolver = node
+    def unmap(self, address, handler, *args, needs_reply_address=False):
+        super().unmap(address, handler, *args, needs_reply_address=needs_reply_address)
+        if len(self._map.get(address, [])):
+            return
+        self._map.pop(address, None)
+        if address is None:
+            return
+        if address in self._pattern_map:
+            del self._pattern_map[address]
+            return
+        routes = self._get_routes(address)
+        if routes is not None:
+            routes[-1].handlers = None
+            self._prune_routes(address, routes)
+    def _get_routes(self, address):
+        routes = [self._route_root]
+        for part in address.split('/'):
+            route = routes[-1].children.get(part)
+            if route is None:
+                return None
+            routes.append(route)
+        return routes
+    def _prune_routes(self, address, routes):
+        # Remove branches left without handlers
+        parts = address.split('/')
+        for part, route, parent in zip(reversed(parts), reversed(routes[1:]), reversed(routes[:-1])):
+            if route.handlers is not None or route.resolver is not None or len(route.children):
+                break
+            del parent.children[part]
+    def _iter_routes(self, route, parts):
+        if not len(parts):
+            yield route
+            return
+        part, parts = parts[0], parts[1:]
+        if OSC_PATTERN_CHARS.isdisjoint(part):
+            child = route.children.get(part)
+            if child is None and route.resolver is not None:
+                if route.resolver.get_child(part) is not None:
+                    child = route.children.get(part)
+            if child is not None:
+                yield from self._iter_routes(child, parts)
+            return
+        pattern = compile_osc_pattern(part)
+        if route.resolver is not None:
+            for name in route.resolver.get_lazy_child_names():
+                if name not in route.children and pattern.fullmatch(name):
+                    route.resolver.get_child(name)
+        for name, child in list(route.children.items()):
+            if pattern.fullmatch(name):
+                yield from self._iter_routes(child, parts)
+    def handlers_for_address(self, address_pattern):
+        matched = False
+        for route in self._iter_routes(self._route_root, address_pattern.split('/')):
+            if route.handlers:
+                yield from route.handlers
+                matched = True
+        for addr, handlers in self._pattern_map.items():
+            # Addresses mapped with wildcards match the incoming address
+            pattern = compile_osc_pattern(addr)
+            if len(handlers) and pattern.fullmatch(address_pattern):
+                yield from handlers
+                matched = True
+        if not matched and self._default_handler is not None:
+            yield self._default_handler
+    def build_message(self, node, *args):
+        """Build an :class:`~pythonosc.osc_message.OscMessage` for the given node
+        """
         builder = OscMessageBuilder(address=node.osc_address)
         for arg in args:
             builder.add_arg(arg)
-        msg = builder.build()
-        await self.server.sendto(msg, client_address, when)
+        return builder.build()
+    async def send_message(self, node, client_address, *args, **kwargs):
+        await self.send_message_multi(node, (client_address,), *args, **kwargs)
+    async def send_message_multi(self, node, client_addresses, *args, **kwargs):
+        """Send a message to multiple clients
+
+        The message is encoded once and the same bytes are queued for
+        every destination.
+
+        Arguments:
+            node: The :class:`~.node.OscNode` sending the message
+            client_addresses: A sequence of ``(host, port)`` destinations
+            *args: The message arguments
+            when (float, optional): The timetag for the message. Defaults to
+                the current time
+
+        """
+        if not len(client_addresses):
+            return
+        when = kwargs.get('when', time.time())
+        msg = self.build_message(node, *args)
+        record_send = self.subscriber_registry.record_send
+        udp_addresses = client_addresses
+        if len(self.connections):
+            udp_addresses = []
+            framed = None
+            for client_address in client_addresses:
+                conn = self.connections.get(client_address)
+                if conn is None:
+                    udp_addresses.append(client_address)
+                    continue
+                if framed is None:
+                    framed = slip_encode(msg.dgram)
+                # A failing connection must not prevent delivery to others
+                try:
+                    conn.write(framed)
+                except Exception as exc:
+                    logger.exception(exc)
+        for client_address in client_addresses:
+            record_send(client_address, msg.size)
+        if len(udp_addresses):
+            await self.server.sendto_multi(msg, udp_addresses, when)
 
 async def _handle_callback(handler, osc_address, client_address, when=None, *messages):
     if when is not None:
@@ -33,11 +454,19 @@ async def _handle_callback(handler, osc_address, client_address, when=None, *mes
 
 async def _call_handlers_for_packet(data, client_address, dispatcher):
     coros = set()
+    scheduler = getattr(dispatcher, 'scheduler', None)
     try:
         packet = osc_packet.OscPacket(data)
+        now = time.time()
         for timed_msg in packet.messages:
             handlers = dispatcher.handlers_for_address(
                 timed_msg.message.address)
+            if scheduler is not None and timed_msg.time > now:
+                scheduler.schedule(timed_msg.time, (
+                    (handler, timed_msg.message.address, client_address, timed_msg.message)
+                    for handler in handlers
+                ))
+                continue
             for handler in handlers:
                 coros.add(_handle_callback(
                     handler,
@@ -54,37 +483,161 @@ async def _call_handlers_for_packet(data, client_address, dispatcher):
         if len(coros):
             await asyncio.gather(*coros)
 
+class OscScheduler(object):
+    """Runs handlers for messages with future timetags
+
+    Messages are grouped by their timetag and a single timer is kept for
+    the earliest one. When it fires, every message due at that timetag is
+    released together, so handlers that queue device writes (such as
+    :meth:`~vidhubcontrol.backends.base.VidhubBackendBase.queue_writes`)
+    have their changes merged into one command.
+
+    Attributes:
+        counters (dict): Counts of ``'scheduled'`` messages and
+            ``'released'`` batches
+
+    """
+    def __init__(self, loop=None):
+        self._loop = loop
+        self._heap = []
+        self._batches = {}
+        self._timer = None
+        self._timer_when = None
+        self._tasks = set()
+        self.counters = {'scheduled':0, 'released':0}
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+    def schedule(self, when, items):
+        """Add handlers to be called at the given time
+
+        Arguments:
+            when (float): The timetag (as returned by :func:`time.time`)
+            items: An iterable of ``(handler, osc_address, client_address, message)``
+
+        """
+        batch = self._batches.get(when)
+        if batch is None:
+            batch = self._batches[when] = []
+            heapq.heappush(self._heap, when)
+        for item in items:
+            batch.append(item)
+            self.counters['scheduled'] += 1
+        self._set_timer()
+    def _set_timer(self):
+        if not len(self._heap):
+            return
+        when = self._heap[0]
+        if self._timer is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        loop = self.loop
+        delay = max(0, when - time.time())
+        self._timer = loop.call_at(loop.time() + delay, self._on_timer)
+        self._timer_when = when
+    def _on_timer(self):
+        self._timer = None
+        now = time.time()
+        heap = self._heap
+        while len(heap) and heap[0] <= now:
+            when = heapq.heappop(heap)
+            batch = self._batches.pop(when)
+            self.counters['released'] += 1
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._set_timer()
+    async def _run_batch(self, batch):
+        coros = [
+            _handle_callback(handler, osc_address, client_address, None, *message)
+            for handler, osc_address, client_address, message in batch
+        ]
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                logger.exception(r)
+    async def stop(self):
+        """Discard any scheduled messages and wait for running handlers
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._heap.clear()
+        self._batches.clear()
+        if len(self._tasks):
+            await asyncio.gather(*self._tasks)
+
 class OSCUDPServer(osc_server.AsyncIOOSCUDPServer):
-    def __init__(self, server_address, dispatcher, loop=None):
+    """Asynchronous OSC server
+
+    Messages queued for a client by :meth:`sendto` are combined into bundles,
+    split as needed to stay within :attr:`max_datagram_size`.
+
+    Incoming packets are handled concurrently across clients, but in the
+    order received for each client. Messages in bundles with a future
+    timetag are passed to the dispatcher's :class:`OscScheduler` so they
+    don't delay later packets. Each client address has its own queue
+    and worker task (created as needed) so a slow handler only delays
+    packets from the client that sent it. Received datagrams are placed
+    directly in these bounded queues, so a flooding client cannot grow
+    memory use beyond its own limit.
+
+    Attributes:
+        max_datagram_size (int): Size limit (in bytes) for each datagram sent.
+            Defaults to :data:`MAX_DATAGRAM_SIZE`
+        max_concurrent_dispatch (int): The number of packets that may be
+            handled at once across all clients. Defaults to ``16``
+        max_client_queue (int): The number of packets that may be waiting
+            for each client. Packets received while a client's queue is full
+            are dropped. Defaults to ``256``
+        dispatch_counters (dict): Counts of ``'received'`` and ``'dropped'``
+            packets
+
+    """
+    def __init__(self, server_address, dispatcher, loop=None,
+                 max_datagram_size=MAX_DATAGRAM_SIZE,
+                 max_concurrent_dispatch=16, max_client_queue=256):
         if loop is None:
             loop = asyncio.get_event_loop()
         super().__init__(server_address, dispatcher, loop)
         self.dispatcher.server = self
+        self.max_datagram_size = max_datagram_size
+        self.max_concurrent_dispatch = max_concurrent_dispatch
+        self.max_client_queue = max_client_queue
+        self.dispatch_counters = {'received':0, 'dropped':0}
+        self.dispatch_semaphore = asyncio.Semaphore(max_concurrent_dispatch)
+        self.client_workers = {}
         self.tx_queue = asyncio.Queue()
         self.running = False
         self.transport = None
         self.protocol = None
 
     class _OSCProtocolFactory(asyncio.DatagramProtocol):
-        def __init__(self, dispatcher, loop):
-            self.dispatcher = dispatcher
+        def __init__(self, server, loop):
+            self.server = server
             self._loop = loop
             self.closed = asyncio.Event()
         def connection_lost(self, exc):
             self.closed.set()
         def datagram_received(self, data, client_address):
-            #asyncio.ensure_future(_call_handlers_for_packet(data, client_address, self.dispatcher))
-            self.dispatcher.dispatch_queue.put_nowait((data, client_address))
+            if metrics.REGISTRY.enabled:
+                PACKETS_RECEIVED.inc(transport='udp')
+                BYTES_RECEIVED.inc(len(data), transport='udp')
+            self.server.enqueue_packet(data, client_address)
 
     async def start(self):
         self.running = True
         fut = self._loop.create_datagram_endpoint(
-            lambda: self._OSCProtocolFactory(self.dispatcher, self._loop),
+            lambda: self._OSCProtocolFactory(self, self._loop),
             local_addr=self._server_address,
         )
         self.transport, self.protocol = await fut
         self.send_loop_future = asyncio.ensure_future(self.send_loop())
-        self.dispatch_loop_future = asyncio.ensure_future(self.dispatch_loop())
+        QUEUE_DEPTH.set_function(self.dispatch_queue_size, queue='dispatch')
+        QUEUE_DEPTH.set_function(self.tx_queue.qsize, queue='tx')
     async def send_loop(self):
         def get_tx_items():
             while True:
@@ -95,9 +648,11 @@ class OSCUDPServer(osc_server.AsyncIOOSCUDPServer):
                 self.tx_queue.task_done()
                 yield tx_item
         def bundle_item(items_by_addr, tx_item):
-            if tx_item['client_address'] not in items_by_addr:
-                items_by_addr[tx_item['client_address']] = {'timestamp':tx_item['when'], 'items':[]}
-            items_by_addr[tx_item['client_address']]['items'].append(tx_item['data'])
+            data, client_addresses, when = tx_item
+            for client_address in client_addresses:
+                if client_address not in items_by_addr:
+                    items_by_addr[client_address] = {'timestamp':when, 'items':[]}
+                items_by_addr[client_address]['items'].append(data)
         while self.running:
             items_by_addr = {}
             tx_item = await self.tx_queue.get()
@@ -106,28 +661,59 @@ class OSCUDPServer(osc_server.AsyncIOOSCUDPServer):
                 break
             bundle_item(items_by_addr, tx_item)
             for tx_item in get_tx_items():
-                data, client_address, when = tx_item
-                if data is None:
+                if tx_item is None:
                     break
                 bundle_item(items_by_addr, tx_item)
             for client_address, d in items_by_addr.items():
-                bundle = OscBundleBuilder(d['timestamp'])
-                for message in d['items']:
-                    bundle.add_content(message)
-                data = bundle.build()
-                self.transport.sendto(data.dgram, client_address)
-    async def dispatch_loop(self):
-        while self.running:
-            item = await self.dispatcher.dispatch_queue.get()
-            self.dispatcher.dispatch_queue.task_done()
-            if item is None:
-                break
-            data, client_address = item
-            await _call_handlers_for_packet(data, client_address, self.dispatcher)
+                bundles = build_bundles(d['timestamp'], d['items'], self.max_datagram_size)
+                for bundle in bundles:
+                    dgram = bundle.dgram
+                    self.transport.sendto(dgram, client_address)
+                    if metrics.REGISTRY.enabled:
+                        PACKETS_SENT.inc(transport='udp')
+                        BYTES_SENT.inc(len(dgram), transport='udp')
+    def enqueue_packet(self, data, client_address):
+        """Place a received packet in the queue for its client
+
+        A worker task is created for the client if needed. If the client's
+        queue is full, the packet is dropped (and counted in
+        :attr:`dispatch_counters`).
+        """
+        if not self.running:
+            return
+        self.dispatch_counters['received'] += 1
+        worker = self.client_workers.get(client_address)
+        if worker is None:
+            queue = asyncio.Queue(self.max_client_queue)
+            task = asyncio.ensure_future(self.client_dispatch_loop(client_address, queue))
+            worker = self.client_workers[client_address] = (queue, task)
+        try:
+            worker[0].put_nowait(data)
+        except asyncio.QueueFull:
+            self.dispatch_counters['dropped'] += 1
+            logger.warning('OSC dispatch queue full for {}, packet dropped'.format(client_address))
+    def dispatch_queue_size(self):
+        """Get the number of packets waiting across all client queues
+        """
+        return sum(queue.qsize() for queue, task in self.client_workers.values())
+    async def client_dispatch_loop(self, client_address, queue):
+        while not queue.empty():
+            data = queue.get_nowait()
+            async with self.dispatch_semaphore:
+                try:
+                    await _call_handlers_for_packet(data, client_address, self.dispatcher)
+                except Exception as exc:
+                    logger.exception(exc)
+            queue.task_done()
+        del self.client_workers[client_address]
     async def stop(self):
         self.running = False
-        await self.dispatcher.dispatch_queue.put(None)
-        await self.dispatch_loop_future
+        QUEUE_DEPTH.remove_function(self.dispatch_queue_size, queue='dispatch')
+        QUEUE_DEPTH.remove_function(self.tx_queue.qsize, queue='tx')
+        workers = [task for queue, task in self.client_workers.values()]
+        if len(workers):
+            await asyncio.gather(*workers)
+        await self.dispatcher.scheduler.stop()
         await self.tx_queue.put(None)
         await self.send_loop_future
         self.transport.close()
@@ -135,10 +721,187 @@ class OSCUDPServer(osc_server.AsyncIOOSCUDPServer):
         self.transport = None
         self.protocol = None
     async def sendto(self, data, client_address, when=None):
+        await self.sendto_multi(data, (client_address,), when)
+    async def sendto_multi(self, data, client_addresses, when=None):
+        """Queue a message to be sent to each of the given clients
+
+        A single queue item is used for all destinations
+        """
         if when is None:
             when = time.time()
-        await self.tx_queue.put({
-            'data':data,
-            'client_address':client_address,
-            'when':when,
-        })
+        await self.tx_queue.put((data, client_addresses, when))
+
+class OSCStreamConnection(object):
+    """A single client connection to :class:`OSCTCPServer`
+
+    Outgoing packets are placed in a bounded queue and written by a separate
+    task which waits for the transport to drain between writes. If the
+    queue is full (the client is not reading fast enough), the connection
+    is aborted (discarding any queued data) rather than letting it delay
+    other clients.
+
+    Attributes:
+        client_address: The ``(host, port)`` of the remote peer
+        max_write_queue (int): Number of packets that may be waiting to be
+            written
+
+    """
+    def __init__(self, server, reader, writer, max_write_queue=1024):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.client_address = writer.get_extra_info('peername')[:2]
+        self.max_write_queue = max_write_queue
+        self.write_queue = asyncio.Queue(max_write_queue)
+        self.closing = False
+        self.write_task = None
+        self.handler_task = None
+    def write(self, data):
+        """Queue SLIP-framed data to be sent
+        """
+        if self.closing:
+            return
+        try:
+            self.write_queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.warning('OSC write queue full for {}, closing connection'.format(self.client_address))
+            self.abort()
+    def close(self):
+        """Close the connection once any queued data has been written
+        """
+        if self.closing:
+            return
+        self.closing = True
+        try:
+            self.write_queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.abort()
+    def abort(self):
+        """Close the connection immediately, discarding any queued data
+        """
+        self.closing = True
+        if self.write_task is not None:
+            self.write_task.cancel()
+        self.writer.transport.abort()
+    async def write_loop(self):
+        try:
+            await self._write_loop()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.closing = True
+            self.writer.close()
+    async def _write_loop(self):
+        queue = self.write_queue
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            chunks = [data]
+            while not queue.empty():
+                data = queue.get_nowait()
+                if data is None:
+                    break
+                chunks.append(data)
+            buf = b''.join(chunks)
+            try:
+                self.writer.write(buf)
+                await self.writer.drain()
+            except OSError:
+                break
+            if metrics.REGISTRY.enabled:
+                PACKETS_SENT.inc(len(chunks), transport='tcp')
+                BYTES_SENT.inc(len(buf), transport='tcp')
+            if data is None:
+                break
+    async def read_loop(self):
+        decoder = SlipDecoder(self.server.max_packet_size)
+        dispatcher = self.server.dispatcher
+        while not self.closing:
+            try:
+                data = await self.reader.read(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            if metrics.REGISTRY.enabled:
+                BYTES_RECEIVED.inc(len(data), transport='tcp')
+            for packet in decoder.feed(data):
+                if metrics.REGISTRY.enabled:
+                    PACKETS_RECEIVED.inc(transport='tcp')
+                async with self.server.dispatch_semaphore:
+                    try:
+                        await _call_handlers_for_packet(packet, self.client_address, dispatcher)
+                    except Exception as exc:
+                        logger.exception(exc)
+
+class OSCTCPServer(object):
+    """OSC server using SLIP-framed streams over TCP (OSC 1.1)
+
+    Uses the same :class:`OscDispatcher` (and node tree) as
+    :class:`OSCUDPServer`. While a client is connected, messages sent to its
+    address by the dispatcher are written to its stream rather than sent
+    by UDP.
+
+    Packets from each connection are handled in the order received.
+
+    Attributes:
+        max_write_queue (int): Number of packets that may be waiting to be
+            written to each connection. Defaults to ``1024``
+        max_packet_size (int): Size limit (in bytes) for incoming packets.
+            Defaults to ``65536``
+        max_concurrent_dispatch (int): The number of packets that may be
+            handled at once across all connections. Defaults to ``16``
+        connections (dict): The active :class:`OSCStreamConnection` instances
+            stored by client address
+
+    """
+    def __init__(self, server_address, dispatcher, loop=None,
+                 max_write_queue=1024, max_packet_size=65536,
+                 max_concurrent_dispatch=16):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._server_address = server_address
+        self.dispatcher = dispatcher
+        self.max_write_queue = max_write_queue
+        self.max_packet_size = max_packet_size
+        self.max_concurrent_dispatch = max_concurrent_dispatch
+        self.dispatch_semaphore = asyncio.Semaphore(max_concurrent_dispatch)
+        self.connections = {}
+        self.running = False
+        self.server = None
+    async def start(self):
+        self.running = True
+        self.server = await asyncio.start_server(
+            self.handle_connection, *self._server_address,
+        )
+    async def handle_connection(self, reader, writer):
+        conn = OSCStreamConnection(self, reader, writer, self.max_write_queue)
+        client_address = conn.client_address
+        self.connections[client_address] = conn
+        self.dispatcher.connections[client_address] = conn
+        conn.handler_task = current_task()
+        conn.write_task = asyncio.ensure_future(conn.write_loop())
+        try:
+            await conn.read_loop()
+        finally:
+            if self.dispatcher.connections.get(client_address) is conn:
+                del self.dispatcher.connections[client_address]
+            del self.connections[client_address]
+            conn.close()
+            # Wait without raising if the task was cancelled by abort()
+            await asyncio.wait([conn.write_task])
+    async def stop(self):
+        self.running = False
+        if self.server is None:
+            return
+        self.server.close()
+        await self.server.wait_closed()
+        conns = list(self.connections.values())
+        for conn in conns:
+            conn.close()
+            conn.reader.feed_eof()
+        if len(conns):
+            await asyncio.gather(*[conn.handler_task for conn in conns])
+        self.server = None
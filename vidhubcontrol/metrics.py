@@ -0,0 +1,301 @@
+"""Lightweight metrics collection with Prometheus text exposition
+
+Metrics are created through the module-level :data:`REGISTRY` (using
+:func:`counter`, :func:`gauge` and :func:`histogram`) and are disabled by
+default. While :attr:`Registry.enabled` is ``False``, updating a metric
+returns immediately, and call sites that need extra work to measure
+something (such as reading the clock) check the flag first.
+
+The collected values can be served over HTTP by :class:`MetricsServer`
+(see the ``--metrics-port`` option of ``vidhubcontrol-server``).
+"""
+
+import asyncio
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+DEFAULT_BUCKETS = (
+    .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+)
+"""Default upper bounds (in seconds) for :class:`Histogram` buckets"""
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelKey = Tuple[str, ...]
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+class Metric(object):
+    """Base class for metrics
+
+    Arguments:
+        name (str): The metric name
+        help_text (str): Description of the metric
+        labelnames: Names of the labels used to separate values
+        registry: The :class:`Registry` the metric belongs to
+
+    """
+    type_name = 'untyped'
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._values = {}
+    def _key(self, labels: Dict) -> LabelKey:
+        if not len(self.labelnames):
+            return ()
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+    def _format_labels(self, key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not len(pairs):
+            return ''
+        s = ','.join('{}="{}"'.format(name, escape_label_value(value)) for name, value in pairs)
+        return '{' + s + '}'
+    def get(self, **labels) -> float:
+        """Get the current value for the given labels
+        """
+        return self._values.get(self._key(labels), 0)
+    def collect(self) -> List[str]:
+        lines = [
+            '# HELP {} {}'.format(self.name, self.help_text),
+            '# TYPE {} {}'.format(self.name, self.type_name),
+        ]
+        for key, value in sorted(self._iter_values()):
+            lines.append('{}{} {}'.format(self.name, self._format_labels(key), format_value(value)))
+        return lines
+    def _iter_values(self):
+        yield from self._values.items()
+
+class Counter(Metric):
+    """A value that only increases
+    """
+    type_name = 'counter'
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that may go up or down
+
+    The value may also be read from a function when collected
+    (see :meth:`set_function`).
+    """
+    type_name = 'gauge'
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._functions = {}
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        self._values[self._key(labels)] = value
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    def set_function(self, func: Callable[[], float], **labels):
+        """Use the return value of *func* as the value for the given labels
+        """
+        self._functions[self._key(labels)] = func
+    def remove_function(self, func: Callable[[], float], **labels):
+        """Remove a function added by :meth:`set_function` (if it is still in use)
+        """
+        key = self._key(labels)
+        if self._functions.get(key) == func:
+            del self._functions[key]
+    def get(self, **labels) -> float:
+        key = self._key(labels)
+        func = self._functions.get(key)
+        if func is not None:
+            return func()
+        return self._values.get(key, 0)
+    def _iter_values(self):
+        values = self._values.copy()
+        for key, func in self._functions.items():
+            try:
+                values[key] = func()
+            except Exception as e:
+                logger.exception(e)
+        yield from values.items()
+
+class Histogram(Metric):
+    """Counts observed values in buckets
+
+    Arguments:
+        buckets: Upper bounds for the buckets. Defaults to :data:`DEFAULT_BUCKETS`
+
+    """
+    type_name = 'histogram'
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        data = self._values.get(key)
+        if data is None:
+            # Per-bucket counts (including +Inf), sum, count
+            data = self._values[key] = [[0] * (len(self.buckets) + 1), 0., 0]
+        data[0][bisect.bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+    def get(self, **labels) -> Tuple[float, int]:
+        """Get the sum and count of observations for the given labels
+        """
+        data = self._values.get(self._key(labels))
+        if data is None:
+            return 0., 0
+        return data[1], data[2]
+    def collect(self) -> List[str]:
+        lines = [
+            '# HELP {} {}'.format(self.name, self.help_text),
+            '# TYPE {} {}'.format(self.name, self.type_name),
+        ]
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            bounds = list(self.buckets) + [math.inf]
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                labels = self._format_labels(key, ('le', format_value(bound)))
+                lines.append('{}_bucket{} {}'.format(self.name, labels, cumulative))
+            labels = self._format_labels(key)
+            lines.append('{}_sum{} {}'.format(self.name, labels, format_value(total)))
+            lines.append('{}_count{} {}'.format(self.name, labels, count))
+        return lines
+
+class Registry(object):
+    """Container for metrics
+
+    Attributes:
+        enabled (bool): Whether metrics are being collected
+        metrics (dict): All metrics stored by name
+
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.metrics = {}
+    def _get_or_create(self, cls, name, help_text, labelnames=(), **kwargs):
+        metric = self.metrics.get(name)
+        if metric is not None:
+            if not isinstance(metric, cls):
+                raise ValueError(f'Metric "{name}" already exists as {metric.type_name}')
+            return metric
+        metric = self.metrics[name] = cls(name, help_text, labelnames, registry=self, **kwargs)
+        return metric
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+    def reset(self):
+        """Clear all collected values (metric definitions are kept)
+        """
+        for metric in self.metrics.values():
+            metric._values.clear()
+    def exposition(self) -> str:
+        """Get all metrics in the Prometheus text format
+        """
+        lines = []
+        for name in sorted(self.metrics.keys()):
+            lines.extend(self.metrics[name].collect())
+        lines.append('')
+        return '\n'.join(lines)
+
+REGISTRY = Registry()
+"""The default :class:`Registry`"""
+
+def counter(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Get or create a :class:`Counter` in :data:`REGISTRY`"""
+    return REGISTRY.counter(name, help_text, labelnames)
+
+def gauge(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Get or create a :class:`Gauge` in :data:`REGISTRY`"""
+    return REGISTRY.gauge(name, help_text, labelnames)
+
+def histogram(name: str, help_text: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a :class:`Histogram` in :data:`REGISTRY`"""
+    return REGISTRY.histogram(name, help_text, labelnames, buckets)
+
+class MetricsServer(object):
+    """Minimal HTTP server for the metrics of a :class:`Registry`
+
+    Responds to ``GET /metrics`` (or ``/``) with
+    :meth:`Registry.exposition`.
+
+    Arguments:
+        hostaddr (str): Address to listen on. Defaults to ``"127.0.0.1"``
+        hostport (int): Port to listen on. Defaults to ``9100``
+        registry: The :class:`Registry` to serve. Defaults to :data:`REGISTRY`
+
+    """
+    def __init__(self, hostaddr: str = '127.0.0.1', hostport: int = 9100, registry: Optional[Registry] = None):
+        self.hostaddr = hostaddr
+        self.hostport = hostport
+        if registry is None:
+            registry = REGISTRY
+        self.registry = registry
+        self.server = None
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_request, self.hostaddr, self.hostport)
+        logger.info(f'Metrics available at http://{self.hostaddr}:{self.hostport}/metrics')
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+    async def handle_request(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if not line or line in (b'\r\n', b'\n'):
+                    break
+            method, _, path = request_line.decode('latin-1').partition(' ')
+            path = path.split(' ')[0].split('?')[0]
+            if method != 'GET':
+                status, body = '405 Method Not Allowed', ''
+            elif path in ('/', '/metrics'):
+                status, body = '200 OK', self.registry.exposition()
+            else:
+                status, body = '404 Not Found', ''
+            data = body.encode('UTF-8')
+            headers = [
+                f'HTTP/1.0 {status}',
+                f'Content-Type: {CONTENT_TYPE}',
+                f'Content-Length: {len(data)}',
+                'Connection: close',
+                '', '',
+            ]
+            writer.write('\r\n'.join(headers).encode('latin-1') + data)
+            await writer.drain()
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
@@ -18,6 +18,7 @@ except ImportError:
             pass
 
 
+from vidhubcontrol import metrics
 from vidhubcontrol.config import Config
 from vidhubcontrol.interfaces.osc import OscInterface
 
@@ -31,22 +32,55 @@ def parse_args():
         type=int, help='Host port for OSC server')
     p.add_argument('--osc-if-name', dest='osc_iface_name',
         help='Name of network interface to use for OSC server. If not specified, one will be detected.')
+    p.add_argument('--osc-tcp-port', dest='osc_tcp_port', type=int,
+        help='Host port for OSC over TCP (SLIP framed). Disabled if not specified')
+    p.add_argument('--osc-tcp-queue', dest='osc_tcp_queue', default=1024, type=int,
+        help='Number of outgoing packets buffered per OSC TCP connection')
     p.add_argument('--osc-disabled', dest='osc_disabled', action='store_true',
         help='Disable OSC server')
+    p.add_argument('--auto-reconnect', dest='auto_reconnect', action='store_true',
+        help='Reconnect to devices automatically when their connection is lost')
+    p.add_argument('--write-policy', dest='write_policy', default='queue',
+        choices=['queue', 'reject'],
+        help='Queue or reject writes made while a device is reconnecting')
+    p.add_argument('--sweep', dest='sweep_networks', action='append', default=[],
+        metavar='CIDR',
+        help='Search the given network for devices by connecting to them directly. '
+             'For use where Zeroconf is not available. May be given multiple times')
+    p.add_argument('--sweep-interval', dest='sweep_interval', default=300, type=float,
+        help='Time (in seconds) between network sweeps')
+    p.add_argument('--metrics-port', dest='metrics_port', type=int,
+        help='Serve metrics in the Prometheus text format on this port. '
+             'Metrics are not collected if not specified')
+    p.add_argument('--metrics-address', dest='metrics_address', default='127.0.0.1',
+        help='Host address for the metrics server')
     return p.parse_args()
 
 async def start(loop, opts):
+    interfaces = []
+    if opts.metrics_port is not None:
+        metrics.REGISTRY.enabled = True
+        metrics_server = metrics.MetricsServer(opts.metrics_address, opts.metrics_port)
+        await metrics_server.start()
+        interfaces.append(metrics_server)
     Config.loop = loop
-    config = await Config.load_async(opts.config_filename)
+    config = await Config.load_async(
+        opts.config_filename,
+        auto_reconnect=opts.auto_reconnect,
+        write_policy=opts.write_policy,
+        sweep_networks=opts.sweep_networks,
+        sweep_interval=opts.sweep_interval,
+    )
     await config.start()
     logger.debug('Config started')
-    interfaces = []
     if not opts.osc_disabled:
         logger.debug('Building OSC')
         osc = OscInterface(
             config=config,
             hostaddr=opts.osc_address,
             hostport=opts.osc_port,
+            tcp_hostport=opts.osc_tcp_port,
+            tcp_max_write_queue=opts.osc_tcp_queue,
             hostiface=opts.osc_iface_name,
             event_loop=loop,
         )
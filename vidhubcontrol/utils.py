@@ -1,3 +1,7 @@
+import os
+import stat
+import asyncio
+import tempfile
 import ipaddress
 try:
     import netifaces
@@ -6,6 +10,20 @@ except ImportError: # pragma: no cover
     netifaces = None
     NETIFACES_AVAILABLE = False
 
+# The umask can only be read by setting it. This is done once at import
+# since it affects the whole process (including other threads)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def current_task():
+    """Get the currently running :class:`asyncio.Task` (if any)
+
+    :func:`asyncio.current_task` is not available before Python 3.7
+    """
+    if hasattr(asyncio, 'current_task'):
+        return asyncio.current_task()
+    return asyncio.Task.current_task()
+
 def find_ip_addresses(iface_name=None, exclude_loopback=True):
     if not NETIFACES_AVAILABLE:
         yield 'lo', ipaddress.IPv4Interface('127.0.0.1/8')
@@ -26,3 +44,36 @@ def find_ip_addresses(iface_name=None, exclude_loopback=True):
             if iface.is_reserved:
                 continue
             yield iface_name, iface
+
+def atomic_write(filename: str, data: str):
+    """Write text to a file atomically
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and then moved into place. Readers will only ever see either the
+    previous contents or the new contents.
+
+    The permissions of an existing file are preserved. New files are created
+    using the default mode for the current umask.
+    """
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=dirname or None, prefix='.{}.'.format(os.path.basename(filename)),
+        suffix='.tmp',
+    )
+    try:
+        try:
+            mode = stat.S_IMODE(os.stat(filename).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        with os.fdopen(fd, 'w') as f:
+            os.chmod(tmp_filename, mode)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.unlink(tmp_filename)
+        raise